@@ -0,0 +1,177 @@
+"""
+Benchmark the catalog the map page loads: catalog_core.json (as published,
+indent=2, and its .gz variant) against catalog_core.parquet and the slim
+catalog_index.parquet from fim_viz/build_catalog.py.
+
+For each format:
+  - bytes: what is transferred (the .gz variant is what requests decodes)
+  - load: bytes -> CatalogIndex (utilis.catalog_index.load_catalog),
+    best of --repeat
+  - rss: peak resident memory of a fresh process loading the catalog once,
+    over the same process after its imports
+
+With the slim index the full records are fetched per details/{nn}.json
+shard; the mean gzipped shard size is printed after the formats.
+
+Synthetic records are shaped like build_catalog.normalize_record output;
+--catalog benchmarks a real catalog_core.json instead.
+
+USAGE:
+python benchmarks/bench_catalog_formats.py --n 10000 100000
+python benchmarks/bench_catalog_formats.py --catalog catalog_core.json
+"""
+
+from __future__ import annotations
+import argparse
+import gzip
+import io
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "fim_viz"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+import build_catalog  # noqa: E402
+from bench_map_payload import synthetic_records  # noqa: E402
+from utilis.catalog_index import load_catalog  # noqa: E402
+
+FORMATS = ("json", "json.gz", "parquet", "index")
+RETURN_PERIODS = (25, 50, 100, 500)
+BASINS = ("Neches", "Trinity", "Brazos", "Colorado", "Sabine")
+
+
+def core_records(n: int):
+    recs = synthetic_records(n)
+    for i, r in enumerate(recs):
+        lon, lat = r["centroid"]
+        synthetic = r["tier"] == "Tier_4"
+        r.update(
+            feature_id=r["id"],
+            site_id=r["site"],
+            date_of_flood=r["date_ymd"].replace("-", ""),
+            s3_prefix=f"FIM_Database/{r['tier']}/{r['site']}",
+            gpkg_url=r["tif_url"].replace(".tif", "_AOI.gpkg"),
+            s3_key=f"FIM_Database/{r['tier']}/{r['site']}/fim_{i}_metadata.json",
+            geom_version=1,
+            basin=BASINS[i % len(BASINS)],
+            access_rights="public",
+            huc2="12",
+            huc4="1209",
+            huc6="120903",
+            return_period=RETURN_PERIODS[i % len(RETURN_PERIODS)] if synthetic else None,
+            event_ts=None if synthetic else int(r["date_ymd"].replace("-", "")),
+            bbox=[lon - 0.01, lat - 0.01, lon + 0.01, lat + 0.01],
+        )
+        if synthetic:
+            r["date_ymd"] = None
+    return recs
+
+
+def encode(records, errors):
+    body = json.dumps(
+        {"schema_version": "1.1", "records": records, "errors": errors},
+        ensure_ascii=False,
+        indent=2,
+    ).encode("utf-8")
+    buf = io.BytesIO()
+    build_catalog.write_catalog_parquet(records, {"errors": errors}, buf)
+    slim = io.BytesIO()
+    build_catalog.write_catalog_index(records, {"errors": errors}, slim)
+    return {
+        "json": body,
+        "json.gz": gzip.compress(body, 9),
+        "parquet": buf.getvalue(),
+        "index": slim.getvalue(),
+    }
+
+
+def mean_shard_bytes(records) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        n = build_catalog.write_detail_shards(records, tmp)
+        total = sum(
+            len(gzip.compress(p.read_bytes(), 9)) for p in Path(tmp).glob("*.json")
+        )
+    return total / max(n, 1)
+
+
+def decode(fmt: str, body: bytes):
+    return load_catalog(gzip.decompress(body) if fmt == "json.gz" else body)
+
+
+def peak_rss_mb() -> float:
+    # VmHWM is per address space; ru_maxrss survives exec on Linux and would
+    # report the (larger) parent's peak
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1e3
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def child(fmt: str, path: str):
+    body = Path(path).read_bytes()
+    before = peak_rss_mb()
+    index = decode(fmt, body)
+    print(json.dumps({"rss_mb": peak_rss_mb() - before, "rows": len(index)}))
+
+
+def rss_in_fresh_process(fmt: str, body: bytes) -> float:
+    with tempfile.NamedTemporaryFile(suffix=f".{fmt}") as f:
+        f.write(body)
+        f.flush()
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", fmt, f.name],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+    return json.loads(out.strip().splitlines()[-1])["rss_mb"]
+
+
+def run(label: str, records, errors, repeat: int):
+    bodies = encode(records, errors)
+    for fmt in FORMATS:
+        body = bodies[fmt]
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            decode(fmt, body)
+            best = min(best, time.perf_counter() - t0)
+        rss = rss_in_fresh_process(fmt, body)
+        print(
+            f"{label:>10} {fmt:<8} bytes {len(body) / 1e6:8.2f} MB   "
+            f"load {best * 1e3:8.1f} ms   rss +{rss:7.1f} MB"
+        )
+    print(f"{label:>10} details  {mean_shard_bytes(records) / 1e3:8.1f} KB per shard (gzip)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--n", type=int, nargs="+", default=[10_000, 100_000])
+    ap.add_argument("--catalog", type=Path, help="real catalog_core.json to convert")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--child", nargs=2, metavar=("FORMAT", "PATH"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+    if args.catalog:
+        data = json.loads(args.catalog.read_bytes())
+        run(args.catalog.name, data.get("records", []), data.get("errors", []), args.repeat)
+        return
+    for n in args.n:
+        run(f"{n:,}", core_records(n), [], args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Benchmark the map page marker layer: Python build time and the bytes the
+browser receives through st_folium, on synthetic catalogs.
+
+Modes:
+  - legacy: one folium.CircleMarker + full popup HTML per filtered record
+    inside a MarkerCluster (the page before viewport culling/lazy popups)
+  - viewport: markers for one zoom-10 view, capped by feature_cap_by_zoom,
+    with id-only popups, plus count bubbles (FIM_MARKER_MODE=viewport)
+  - compact: one columnar array, markers built client-side
+    (FIM_MARKER_MODE=compact)
+
+"build" covers constructing the layer and rendering the map HTML; "bytes"
+is that HTML, raw and gzipped.
+
+USAGE:
+python benchmarks/bench_map_payload.py --n 10000 100000
+"""
+
+from __future__ import annotations
+import argparse
+import gzip
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import folium
+from folium.plugins import MarkerCluster
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from utilis.catalog_index import CatalogIndex  # noqa: E402
+from utilis.map_markers import (  # noqa: E402
+    CompactMarkers,
+    compact_payload,
+    popup_placeholder,
+)
+from utilis.viewport import (  # noqa: E402
+    aggregate,
+    default_viewport,
+    padded,
+    sample_rows,
+)
+
+TIER_COLORS = {
+    "Tier_1": "#D3143E",
+    "Tier_2": "#81f9a7",
+    "Tier_3": "#b5b0fd",
+    "Tier_4": "#0b5a90",
+}
+DEFAULT_TIER_COLOR = "#2687c8"
+VIEW_ZOOM = 10
+VIEW_CAP = 200  # feature_cap_by_zoom(10) in the page
+
+
+def synthetic_records(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    lon = rng.uniform(-125, -67, n)
+    lat = rng.uniform(25, 49, n)
+    tiers = rng.integers(1, 5, n)
+    days = rng.integers(0, 365 * 30, n)
+    dates = np.datetime64("1995-01-01") + days.astype("timedelta64[D]")
+    recs = []
+    for i in range(n):
+        d = str(dates[i])
+        recs.append(
+            {
+                "id": f"Tier_{tiers[i]}/site_{i}/fim_{i}",
+                "tier": f"Tier_{tiers[i]}",
+                "site": f"site_{i}",
+                "date_ymd": d,
+                "centroid": [float(lon[i]), float(lat[i])],
+                "file_name": f"fim_{i}.tif",
+                "state": "TX",
+                "resolution_m": 10,
+                "source": "synthetic",
+                "quality": "good",
+                "description": "synthetic benchmark record",
+                "huc8": "12090301",
+                "tif_url": f"https://example.org/fim_{i}.tif",
+                "json_url": f"https://example.org/fim_{i}.json",
+                "references": ["Synthetic et al. (2025)"],
+            }
+        )
+    return recs
+
+
+def base_map():
+    return folium.Map(location=[39.8, -98.6], zoom_start=VIEW_ZOOM, tiles=None)
+
+
+def legacy_popup_html(r: dict) -> str:
+    """The eager per-marker popup the page rendered before lazy popups."""
+    tif_url = r.get("tif_url")
+    gpkg_url = r.get("gpkg_url") or r.get("gpkgurl")
+    json_url = r.get("json_url") or r.get("metadata_url")
+
+    # Prefer new names
+    basin = r.get("basin") or r.get("river_basin")
+    date_disp = r.get("date_ymd") or r.get("date_of_flood")
+
+    # HUC ID preference (8→12→6→4→2)
+    hucid = (
+        r.get("huc8")
+        or r.get("huc12")
+        or r.get("huc6")
+        or r.get("huc4")
+        or r.get("huc2")
+    )
+
+    fields = [
+        ("File Name", r.get("file_name")),
+        ("Resolution (m)", r.get("resolution_m")),
+        ("State", r.get("state")),
+        ("Description", r.get("description")),
+        ("River Basin Name", basin),
+        ("Source", r.get("source")),
+        ("Date", date_disp),
+        (
+            "Return Period (years)",
+            r.get("return_period") if r.get("tier") == "Tier_4" else None,
+        ),
+        ("Quality", r.get("quality")),
+        ("HUC ID", hucid),  # NEW
+    ]
+    rows = "".join(
+        f"<tr><th style='text-align:left;vertical-align:top;padding-right:8px'>{k}</th>"
+        f"<td style='text-align:left'>{'' if v is None else v}</td></tr>"
+        for k, v in fields
+    )
+
+    refs = r.get("references") or []
+    refs_html = ""
+    if refs:
+        refs_html = "<div style='margin-top:6px'><b>References</b><div style='margin:4px 0;padding-left:12px'>"
+        for ref in refs:
+            refs_html += f"<div style='margin-bottom:6px'>{ref}</div>"
+        refs_html += "</div></div>"
+
+    # Two-column buttons: left (TIF + JSON), right (GPKG)
+    left_btns = ""
+    if tif_url:
+        left_btns += f"""
+        <a href="{tif_url}" target="_blank" rel="noopener"
+        style="text-decoration:none;display:block;background:#2563eb;color:#fff;
+                padding:8px 10px;border-radius:6px;font-weight:600;margin:0 0 8px;">
+        ⬇ Download Benchmark FIM (.tif)
+        </a>"""
+    if json_url:
+        left_btns += f"""
+        <a href="{json_url}" target="_blank" rel="noopener"
+        style="text-decoration:none;display:block;background:#059669;color:#fff;
+                padding:8px 10px;border-radius:6px;font-weight:600;">
+        ⬇ Download Metadata (.json)
+        </a>"""
+
+    right_btn = ""
+    if gpkg_url:
+        right_btn = f"""
+        <a href="{gpkg_url}" target="_blank" rel="noopener"
+        style="text-decoration:none;display:block;background:#374151;color:#fff;
+                padding:8px 10px;border-radius:6px;font-weight:600;">
+        ⬇ Download Benchmark FIM (.gpkg)
+        </a>"""
+
+    buttons_html = ""
+    if left_btns or right_btn:
+        buttons_html = f"""
+        <div style="display:flex;gap:10px;margin-top:6px;">
+        <div style="flex:1;min-width:0;">{left_btns}</div>
+        <div style="flex:1;min-width:0;">{right_btn}</div>
+        </div>
+        """
+
+    return f"""
+    <div style="font-family:system-ui,-apple-system,Segoe UI,Roboto,Arial,sans-serif; font-size:13px; max-width:520px">
+        <table>{rows}</table>
+        {'<hr style="margin:6px 0" />' if refs_html or buttons_html else ''}
+        {refs_html}
+        {buttons_html}
+    </div>
+    """
+
+
+def circle_marker(r, lat, lon, popup):
+    return folium.CircleMarker(
+        location=[lat, lon],
+        radius=8,
+        color="black",
+        weight=1.5,
+        fill=True,
+        fill_color=TIER_COLORS.get(r.get("tier"), DEFAULT_TIER_COLOR),
+        fill_opacity=0.9,
+        tooltip=f"{r.get('tier')} — {r.get('site')}",
+        popup=folium.Popup(popup, max_width=500),
+    )
+
+
+def build_legacy(index, rows):
+    m = base_map()
+    fg = MarkerCluster(name="Benchmark FIM Sites", disableClusteringAtZoom=10)
+    for i in rows.tolist():
+        r = index.records[i]
+        lat, lon = float(index.lat[i]), float(index.lon[i])
+        circle_marker(r, lat, lon, legacy_popup_html(r)).add_to(fg)
+    fg.add_to(m)
+    return m
+
+
+def build_viewport(index, rows):
+    m = base_map()
+    fg = folium.FeatureGroup(name="Benchmark FIM Sites")
+    box = padded(default_viewport((39.8, -98.6), VIEW_ZOOM))
+    mask = np.zeros(len(index), dtype=bool)
+    mask[rows] = True
+    in_box = index.grid.query(box)
+    in_box = in_box[mask[in_box]]
+    shown = sample_rows(in_box, VIEW_CAP)
+    for i in shown.tolist():
+        r = index.records[i]
+        lat, lon = float(index.lat[i]), float(index.lon[i])
+        circle_marker(r, lat, lon, popup_placeholder(index.ids[i])).add_to(fg)
+    grouped = np.setdiff1d(in_box, shown, assume_unique=True)
+    for lat, lon, count in aggregate(index.lon, index.lat, grouped, box):
+        folium.Marker(
+            location=[lat, lon],
+            icon=folium.DivIcon(html=f"<div>{count:,}</div>"),
+        ).add_to(fg)
+    fg.add_to(m)
+    return m
+
+
+def build_compact(index, rows):
+    m = base_map()
+    fg = folium.FeatureGroup(name="Benchmark FIM Sites")
+    payload = compact_payload(
+        index.ids,
+        index.lon,
+        index.lat,
+        index.tier_code,
+        index.tiers,
+        index.site_code,
+        index.sites,
+        rows,
+    )
+    CompactMarkers(payload, TIER_COLORS, DEFAULT_TIER_COLOR).add_to(fg)
+    fg.add_to(m)
+    return m
+
+
+MODES = {"legacy": build_legacy, "viewport": build_viewport, "compact": build_compact}
+
+
+def run(n: int, modes, legacy_max: int):
+    index = CatalogIndex(synthetic_records(n))
+    index.grid  # built once per catalog version in the page
+    rows = np.arange(n)
+    for name in modes:
+        if name == "legacy" and n > legacy_max:
+            print(f"{n:>8,} {name:<9} skipped (--legacy-max {legacy_max:,})")
+            continue
+        t0 = time.perf_counter()
+        m = MODES[name](index, rows)
+        html = m.get_root().render().encode("utf-8")
+        elapsed = time.perf_counter() - t0
+        gz = len(gzip.compress(html, 6))
+        print(
+            f"{n:>8,} {name:<9} build {elapsed * 1e3:9.1f} ms   "
+            f"html {len(html) / 1e6:8.2f} MB   gzip {gz / 1e6:7.2f} MB"
+        )
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--n", type=int, nargs="+", default=[10_000, 100_000])
+    ap.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    ap.add_argument(
+        "--legacy-max",
+        type=int,
+        default=100_000,
+        help="skip the legacy mode above this many records (it is slow)",
+    )
+    args = ap.parse_args()
+    for n in args.n:
+        run(n, args.modes, args.legacy_max)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark the tile property preparation in fim_viz/fim_tiles.py against the
+previous row-wise implementation, on synthetic extents.
+
+Measures wall time and peak Python allocations (tracemalloc) for:
+  - legacy: DataFrame merge + pandas string passes + list comprehensions
+  - columnar: prepare_properties (positional catalog take, Arrow date kernels,
+    vectorized shapely centroid/bounds)
+
+USAGE:
+python benchmarks/bench_prepare_properties.py --n 100000
+"""
+
+from __future__ import annotations
+import argparse
+import sys
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "fim_viz"))
+import fim_tiles  # noqa: E402
+
+
+def synthetic_extents(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(-125, -67, n)
+    y = rng.uniform(25, 49, n)
+    w = rng.uniform(0.001, 0.05, n)
+    geoms = shapely.box(x, y, x + w, y + w)
+
+    days = rng.integers(0, 365 * 30, n)
+    dates = pd.Timestamp("1995-01-01") + pd.to_timedelta(days, unit="D")
+    iso = dates.strftime("%Y-%m-%d").to_numpy(dtype=object)
+    compact = dates.strftime("%Y%m%d").to_numpy(dtype=object)
+    form = rng.integers(0, 10, n)
+    event = np.where(form < 6, iso, compact)
+    event[form == 9] = None
+
+    ids = np.array([f"Tier_{t}/site_{i}/fim_{i}" for i, t in enumerate(rng.integers(1, 5, n))])
+    gdf = gpd.GeoDataFrame(
+        {
+            "id": ids,
+            "tier": [s.split("/")[0] for s in ids],
+            "site": [s.split("/")[1] for s in ids],
+            "event_date": event,
+        },
+        geometry=geoms,
+        crs=4326,
+    )
+    cat_df = pd.DataFrame(
+        {
+            "id": ids[rng.permutation(n)],
+            "tif_url": [f"https://example.com/{i}.tif" for i in range(n)],
+            "json_url": [f"https://example.com/{i}.json" for i in range(n)],
+        }
+    )
+    return gdf, cat_df
+
+
+def legacy_prepare(gdf, cat_df, include_fields):
+    warnings.filterwarnings("ignore", message="Geometry is in a geographic CRS")
+    keep_cols = ["id"] + [c for c in include_fields if c in cat_df.columns]
+    cat_df = cat_df[keep_cols].drop_duplicates("id")
+    gdf = gdf.merge(cat_df, on="id", how="left")
+
+    gdf["feature_id"] = gdf["id"].astype(str)
+    gdf["site_id"] = gdf["site"].astype(str)
+    gdf["tier"] = gdf["tier"].fillna("Unknown_Tier").astype(str)
+
+    s = gdf["event_date"].astype("string").str.strip()
+    yy8 = s.str.len().eq(8) & s.str.isnumeric()
+    iso_try = pd.to_datetime(s.mask(yy8, pd.NA), errors="coerce", utc=False)
+    ymd_try = pd.to_datetime(s.where(yy8), format="%Y%m%d", errors="coerce", utc=False)
+    ed = iso_try.fillna(ymd_try)
+    gdf["event_date"] = ed.dt.date.astype("string")
+
+    gdf["event_ts"] = gdf["event_date"].str.replace("-", "", regex=False)
+    gdf.loc[gdf["event_ts"].isna(), "event_ts"] = pd.NA
+    gdf["event_ts"] = gdf["event_ts"].astype("Int64")
+
+    gdf = gdf[gdf.geometry.notnull() & ~gdf.geometry.is_empty]
+    cent = gdf.geometry.centroid
+    gdf["centroid"] = list(map(lambda x, y: [float(x), float(y)], cent.x, cent.y))
+    b = gdf.geometry.bounds
+    gdf["bbox"] = [
+        [float(xmin), float(ymin), float(xmax), float(ymax)]
+        for xmin, ymin, xmax, ymax in zip(b.minx, b.miny, b.maxx, b.maxy)
+    ]
+    return gdf
+
+
+def measure(label, fn, *args, repeat: int = 3):
+    # timing runs without tracemalloc (it inflates allocation-heavy code)
+    times = []
+    for _ in range(repeat):
+        frame = args[0].copy()
+        t0 = time.perf_counter()
+        out = fn(frame, *args[1:])
+        times.append(time.perf_counter() - t0)
+    elapsed = min(times)
+
+    frame = args[0].copy()
+    tracemalloc.start()
+    fn(frame, *args[1:])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<10} {elapsed:8.3f} s   peak {peak / 1e6:8.1f} MB")
+    return out, elapsed, peak
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--n", type=int, default=100_000)
+    args = ap.parse_args()
+
+    gdf, cat_df = synthetic_extents(args.n)
+    include = ["tif_url", "json_url"]
+    print(f"{args.n:,} synthetic features")
+
+    old, t_old, m_old = measure("legacy", legacy_prepare, gdf, cat_df, include)
+    new, t_new, m_new = measure(
+        "columnar", fim_tiles.prepare_properties, gdf, cat_df, include
+    )
+    print(f"speed-up   {t_old / t_new:8.1f}x   memory {m_old / max(m_new, 1):6.1f}x less")
+
+    # outputs must agree
+    old = old.set_index("id").sort_index()
+    new = new.set_index("id").sort_index()
+    for col in ("event_date", "event_ts", "tif_url", "json_url"):
+        a = old[col].astype("string").fillna("")
+        b = new[col].astype("string").fillna("")
+        assert a.equals(b), f"column {col} differs"
+    assert np.allclose(np.vstack(old["bbox"]), np.vstack(new["bbox"]))
+    assert np.allclose(np.vstack(old["centroid"]), np.vstack(new["centroid"]))
+    print("outputs match")
+
+
+if __name__ == "__main__":
+    main()
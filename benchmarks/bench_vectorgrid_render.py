@@ -0,0 +1,176 @@
+"""
+Benchmark the map page's FIM extent layer (Leaflet.VectorGrid) render and
+restyle work on a recorded tile set, without a browser.
+
+Every tile is decoded with fim_viz/mvt.py and projected to tile pixels the
+way VectorGrid does (extent -> 256 px), then prepared for each renderer:
+  - svg: one <path> element per feature with its "d" string
+    (L.svg.tile; what the page used before)
+  - canvas: one flat coordinate array per feature and moveTo/lineTo calls
+    into a single canvas per tile (L.canvas.tile; the page default)
+
+A filter change is replayed against the loaded tiles: --flip of the
+features (picked by a stable hash of feature_id) change visibility.
+  - tile: restyle every feature of every loaded tile (the previous
+    _updateStyles walk)
+  - feature: setFeatureStyle only for the features that flipped
+
+Times are Python proxies for the client work and are meant to be compared
+with each other; DOM nodes, path bytes, draw calls and restyled features
+are exact counts for the tile set.
+
+USAGE:
+python benchmarks/bench_vectorgrid_render.py --mbtiles fim_extents.mbtiles
+python benchmarks/bench_vectorgrid_render.py --tiles-dir tiles/ --zooms 8 10
+"""
+
+from __future__ import annotations
+import argparse
+import sqlite3
+import sys
+import time
+import zlib
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "fim_viz"))
+import mvt  # noqa: E402
+
+TILE_PX = 256
+# mvt.Layer does not keep the extent field; every FIM tileset uses the default
+SCALE = TILE_PX / 4096.0
+
+
+def iter_mbtiles(path: Path) -> Iterator[Tuple[int, bytes]]:
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        yield from con.execute("SELECT zoom_level, tile_data FROM tiles")
+    finally:
+        con.close()
+
+
+def iter_tiles_dir(root: Path) -> Iterator[Tuple[int, bytes]]:
+    """{z}/{x}/{y}.pbf (or .mvt) files under root."""
+    for p in sorted(root.glob("*/*/*")):
+        if p.suffix in (".pbf", ".mvt") and p.parts[-3].isdigit():
+            yield int(p.parts[-3]), p.read_bytes()
+
+
+def svg_path(parts: List[List[Tuple[int, int]]], scale: float, closed: bool) -> str:
+    """The "d" attribute L.SVG builds for a feature (pointsToPath)."""
+    out = []
+    for ring in parts:
+        out.append(
+            "M"
+            + "L".join(f"{round(x * scale)} {round(y * scale)}" for x, y in ring)
+            + ("z" if closed else "")
+        )
+    return "".join(out)
+
+
+def canvas_ops(parts: List[List[Tuple[int, int]]], scale: float) -> Tuple[List[float], int]:
+    """Flat pixel coordinates and the number of 2D context calls to draw them."""
+    flat: List[float] = []
+    calls = 2  # beginPath + fill/stroke
+    for ring in parts:
+        for x, y in ring:
+            flat.append(x * scale)
+            flat.append(y * scale)
+        calls += len(ring) + 1  # moveTo + lineTo... + closePath
+    return flat, calls
+
+
+def flips(props: Dict, frac: float) -> bool:
+    key = str(props.get("feature_id", "")).encode("utf-8")
+    return (zlib.crc32(key) % 10_000) < frac * 10_000
+
+
+class ZoomStats:
+    def __init__(self):
+        self.tiles = 0
+        self.features = 0
+        self.vertices = 0
+        self.decode_s = 0.0
+        self.svg_s = 0.0
+        self.svg_nodes = 0
+        self.svg_bytes = 0
+        self.canvas_s = 0.0
+        self.canvas_calls = 0
+        self.restyle_tile = 0
+        self.restyle_feature = 0
+
+
+def measure(tiles: Iterator[Tuple[int, bytes]], zooms: Optional[Sequence[int]], flip: float):
+    stats: Dict[int, ZoomStats] = defaultdict(ZoomStats)
+    for z, data in tiles:
+        if zooms and z not in zooms:
+            continue
+        st = stats[z]
+        st.tiles += 1
+
+        t0 = time.perf_counter()
+        _, layers = mvt.read_tile(data)
+        feats = []
+        for layer in layers:
+            for f in layer.features:
+                feats.append((layer.properties(f), f.type, mvt.decode_geometry(f.geometry)))
+        st.decode_s += time.perf_counter() - t0
+
+        for _, _, parts in feats:
+            st.features += 1
+            st.vertices += sum(len(r) for r in parts)
+
+        t0 = time.perf_counter()
+        for _, gtype, parts in feats:
+            d = svg_path(parts, SCALE, closed=gtype == 3)
+            st.svg_nodes += 1
+            st.svg_bytes += len(d)
+        st.svg_s += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for _, _, parts in feats:
+            _, calls = canvas_ops(parts, SCALE)
+            st.canvas_calls += calls
+        st.canvas_s += time.perf_counter() - t0
+
+        st.restyle_tile += len(feats)
+        st.restyle_feature += sum(1 for props, _, _ in feats if flips(props, flip))
+    return stats
+
+
+def report(stats: Dict[int, ZoomStats]):
+    print(
+        f"{'z':>3} {'tiles':>6} {'feats':>8} {'verts':>10} {'decode':>9} "
+        f"{'svg':>9} {'nodes':>8} {'path KB':>9} {'canvas':>9} {'calls':>10} "
+        f"{'restyle tile':>13} {'feature':>8}"
+    )
+    for z in sorted(stats):
+        s = stats[z]
+        print(
+            f"{z:>3} {s.tiles:>6,} {s.features:>8,} {s.vertices:>10,} "
+            f"{s.decode_s * 1e3:>7.1f}ms {s.svg_s * 1e3:>7.1f}ms {s.svg_nodes:>8,} "
+            f"{s.svg_bytes / 1e3:>9.1f} {s.canvas_s * 1e3:>7.1f}ms {s.canvas_calls:>10,} "
+            f"{s.restyle_tile:>13,} {s.restyle_feature:>8,}"
+        )
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--mbtiles", type=Path, help="recorded tileset (.mbtiles)")
+    src.add_argument("--tiles-dir", type=Path, help="directory of {z}/{x}/{y}.pbf")
+    ap.add_argument("--zooms", type=int, nargs="+", help="only these zoom levels")
+    ap.add_argument(
+        "--flip",
+        type=float,
+        default=0.1,
+        help="fraction of features whose visibility a filter change flips",
+    )
+    args = ap.parse_args()
+    tiles = iter_mbtiles(args.mbtiles) if args.mbtiles else iter_tiles_dir(args.tiles_dir)
+    report(measure(tiles, args.zooms, args.flip))
+
+
+if __name__ == "__main__":
+    main()
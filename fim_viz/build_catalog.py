@@ -1,5 +1,5 @@
 from __future__ import annotations
-import os, sys, json, re, argparse, datetime as dt
+import os, sys, json, re, argparse, hashlib, datetime as dt
 from typing import Any, Dict, List, Tuple, Optional
 
 import boto3
@@ -7,6 +7,8 @@ from botocore.exceptions import ClientError
 
 import pandas as pd
 import geopandas as gpd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from shapely.geometry import shape, mapping
 from shapely.ops import transform
 from shapely.errors import GEOSException
@@ -363,10 +365,167 @@ def normalize_record(
     return core, geom
 
 
+# ARROW / PARQUET CATALOG
+# Same records as catalog_core.json, typed; low-cardinality text is
+# dictionary-encoded. The app reads it straight into its columnar index.
+CATALOG_DICT_COLUMNS = ("tier", "state", "basin", "source")
+CATALOG_TEXT_COLUMNS = (
+    "id",
+    "feature_id",
+    "site_id",
+    "site",
+    "date_ymd",
+    "date_of_flood",
+    "json_url",
+    "s3_prefix",
+    "tif_url",
+    "gpkg_url",
+    "access_rights",
+    "quality",
+    "huc2",
+    "huc4",
+    "huc6",
+    "huc8",
+    "huc10",
+    "huc12",
+    "file_name",
+    "s3_key",
+)
+CATALOG_INT_COLUMNS = ("geom_version", "return_period", "event_ts")
+CATALOG_FLOAT_LIST_COLUMNS = ("centroid", "bbox")
+
+
+def _text(v: Any) -> Optional[str]:
+    if v is None or isinstance(v, str):
+        return v
+    return json.dumps(v, ensure_ascii=False)
+
+
+def _number(v: Any) -> Optional[float]:
+    if isinstance(v, bool) or not isinstance(v, (int, float)):
+        return None
+    return float(v)
+
+
+def _integer(v: Any) -> Optional[int]:
+    if isinstance(v, bool) or not isinstance(v, (int, float)):
+        return None
+    return int(v)
+
+
+def catalog_table(
+    core_rows: List[Dict[str, Any]], meta: Dict[str, Any]
+) -> pa.Table:
+    """core_rows as an Arrow table; `meta` goes into the schema metadata as JSON."""
+    cols: Dict[str, pa.Array] = {}
+    for name in CATALOG_TEXT_COLUMNS:
+        cols[name] = pa.array([_text(r.get(name)) for r in core_rows], pa.string())
+    for name in CATALOG_DICT_COLUMNS:
+        cols[name] = pa.array(
+            [_text(r.get(name)) for r in core_rows], pa.string()
+        ).dictionary_encode()
+    for name in CATALOG_INT_COLUMNS:
+        cols[name] = pa.array([_integer(r.get(name)) for r in core_rows], pa.int32())
+    cols["resolution_m"] = pa.array(
+        [_number(r.get("resolution_m")) for r in core_rows], pa.float64()
+    )
+    for name in CATALOG_FLOAT_LIST_COLUMNS:
+        cols[name] = pa.array(
+            [
+                [_number(v) for v in r[name]] if r.get(name) else None
+                for r in core_rows
+            ],
+            pa.list_(pa.float64()),
+        )
+    cols["references"] = pa.array(
+        [[_text(v) for v in (r.get("references") or [])] for r in core_rows],
+        pa.list_(pa.string()),
+    )
+    table = pa.table(cols)
+    return table.replace_schema_metadata(
+        {k: json.dumps(v, ensure_ascii=False) for k, v in meta.items()}
+    )
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def write_catalog_parquet(
+    core_rows: List[Dict[str, Any]], meta: Dict[str, Any], where: Any
+):
+    """`where`: a path or a writable binary file."""
+    pq.write_table(catalog_table(core_rows, meta), where, compression="zstd")
+
+
+# HOT / COLD SPLIT
+# catalog_index.parquet: only what the map markers and filters read;
+# details/{nn}.json: the full records, fetched per shard by the app/popups
+CATALOG_INDEX_COLUMNS = (
+    "id",
+    "tier",
+    "site",
+    "centroid",
+    "event_ts",
+    "return_period",
+    "bbox",
+)
+DETAIL_SHARDS = 256
+_FNV_OFFSET = 0x811C9DC5
+_FNV_PRIME = 0x01000193
+
+
+def detail_shard(record_id: Any, shards: int = DETAIL_SHARDS) -> str:
+    """FNV-1a of the UTF-8 id mod shards, as hex (utilis/catalog_details.py matches)."""
+    h = _FNV_OFFSET
+    for b in str(record_id).encode("utf-8"):
+        h = ((h ^ b) * _FNV_PRIME) & 0xFFFFFFFF
+    return f"{h % shards:02x}"
+
+
+def write_catalog_index(
+    core_rows: List[Dict[str, Any]], meta: Dict[str, Any], where: Any
+):
+    meta = {**meta, "detail_shards": DETAIL_SHARDS}
+    table = catalog_table(core_rows, meta).select(list(CATALOG_INDEX_COLUMNS))
+    pq.write_table(table, where, compression="zstd")
+
+
+# written next to the shards: the catalog_sha256 they were built with
+DETAILS_STAMP = "catalog_sha256.txt"
+
+
+def write_detail_shards(
+    core_rows: List[Dict[str, Any]], out_dir: str, catalog_sha256: Optional[str] = None
+) -> int:
+    """details/{nn}.json: {id: record}, compact JSON. Returns the file count."""
+    shards: Dict[str, Dict[str, Any]] = {}
+    for r in core_rows:
+        shards.setdefault(detail_shard(r["id"]), {})[r["id"]] = r
+    os.makedirs(out_dir, exist_ok=True)
+    for fname in os.listdir(out_dir):  # shards left empty by this build
+        if fname.endswith(".json") and fname[:-5] not in shards:
+            os.remove(os.path.join(out_dir, fname))
+    for name, recs in shards.items():
+        with open(os.path.join(out_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(recs, f, ensure_ascii=False, separators=(",", ":"))
+    stamp = os.path.join(out_dir, DETAILS_STAMP)
+    if catalog_sha256:
+        with open(stamp, "w", encoding="utf-8") as f:
+            f.write(catalog_sha256)
+    elif os.path.exists(stamp):
+        os.remove(stamp)
+    return len(shards)
+
+
 # MAIN
 def main():
     ap = argparse.ArgumentParser(
-        description="Build catalog_core.json + FIM_extents.geojson (lean, tile-ready)"
+        description="Build catalog_core.json (+ .parquet) + FIM_extents.geojson (lean, tile-ready)"
     )
     ap.add_argument("--bucket", default=DEFAULT_BUCKET)
     ap.add_argument("--prefix", default=DEFAULT_PREFIX)
@@ -376,6 +535,21 @@ def main():
     )
     ap.add_argument("--profile", default=None, help="AWS profile (optional)")
     ap.add_argument("--out-core", default="catalog_core.json")
+    ap.add_argument(
+        "--out-parquet",
+        default="catalog_core.parquet",
+        help="Typed copy of the catalog for the app ('' to skip)",
+    )
+    ap.add_argument(
+        "--out-index",
+        default="catalog_index.parquet",
+        help="Slim index (map/filter columns) for the app ('' to skip)",
+    )
+    ap.add_argument(
+        "--out-details",
+        default="details",
+        help="Folder for the per-record detail shards ('' to skip)",
+    )
     ap.add_argument("--out-geojson", default="FIM_extents.geojson")
     args = ap.parse_args()
 
@@ -469,6 +643,28 @@ def main():
         json.dump(catalog_core, f, ensure_ascii=False, indent=2)
     print(f"[write] {args.out_core} ({len(core_rows)} records, {len(errors)} error(s))")
 
+    # write catalog_core.parquet; stamped with the JSON's digest so the
+    # publisher and the app only pair binary copies with the JSON they match
+    catalog_meta = {
+        "schema_version": catalog_core["schema_version"],
+        "updated_at": catalog_core["updated_at"],
+        "catalog_sha256": file_sha256(args.out_core),
+        "errors": errors,
+    }
+    if args.out_parquet:
+        write_catalog_parquet(core_rows, catalog_meta, args.out_parquet)
+        print(f"[write] {args.out_parquet} ({len(core_rows)} records)")
+
+    # write catalog_index.parquet + details/{nn}.json
+    if args.out_index:
+        write_catalog_index(core_rows, catalog_meta, args.out_index)
+        print(f"[write] {args.out_index} ({len(core_rows)} records)")
+    if args.out_details:
+        n_files = write_detail_shards(
+            core_rows, args.out_details, catalog_meta["catalog_sha256"]
+        )
+        print(f"[write] {args.out_details}/ ({n_files} detail shard(s))")
+
     # write FIM_extents.geojson
     if not args.skip_geometry and ext_rows:
         gdf = gpd.GeoDataFrame(
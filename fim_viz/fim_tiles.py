@@ -3,10 +3,12 @@ One-stop utility to:
 - Read FIM extents from Parquet (or GeoJSON)
 - (Optionally) merge extra fields from catalog_core.json keyed by 'id'
 - Export a minimized GeoJSON (WGS84) with just the needed fields
-- Build vector tiles (.mbtiles) with tippecanoe
+- Build vector tiles (.mbtiles) with tippecanoe (lean attributes below --full-attrs-zoom)
 - Explode to {z}/{x}/{y}.pbf with mb-util
-- Upload tiles to S3 with correct headers (boto3)
+- Upload tiles to S3 with correct headers (boto3) under a content-hashed,
+  immutable tiles/v/{hash}/ prefix + a mutable tiles/manifest.json pointer
 - Emit a manifest + ready-to-paste Streamlit/Folium VectorGrid snippet
+- `stats` mode: per-zoom size/feature/vertex report and regression gate
 
 USAGE (example):
 upload tiles only
@@ -30,6 +32,14 @@ python fim_tiles.py \
   --min-zoom 3 --max-zoom 14 \
   --upload-json --json-target both
 
+upload tiles with one extra tileset per tier (tiles/{tier}/{z}/{x}/{y}.pbf)
+python fim_tiles.py \
+  --geojson-in FIM_extents.geojson \
+  --out-dir out_tiles \
+  --s3-bucket sdmlab \
+  --s3-prefix FIM_Database/FIM_Viz \
+  --split-tiers
+
 upload json (catalog + extents) only
 python fim_tiles.py \
   --catalog catalog_core.json \
@@ -39,7 +49,13 @@ python fim_tiles.py \
   --s3-prefix FIM_Database/FIM_Viz \
   --upload-json-only
 
-upload catalog core json only
+tileset stats (optionally gate against a baseline .mbtiles or stats .json)
+python fim_tiles.py stats out_tiles/fim_extents.mbtiles \
+  --compare baseline.mbtiles --max-size-regress 5 --json stats.json
+
+upload catalog core json only (+ catalog_core.parquet, catalog_index.parquet
+and details/ from the same folder, if built from that JSON; stale remote
+copies are deleted)
 python fim_tiles.py \
   --catalog catalog_core.json \
   --out-dir out_tiles \
@@ -49,24 +65,41 @@ python fim_tiles.py \
 
 
 Requirements:
-  - Python: geopandas, shapely, pandas, boto3, pyogrio (recommended), pyarrow
+  - Python: geopandas, shapely, pandas, boto3, pyogrio (recommended), pyarrow,
+    brotli (optional, for .br JSON variants)
   - System: tippecanoe (https://github.com/mapbox/tippecanoe) in PATH
   - Python package 'mbutil' (provides `mb-util` script) in PATH, or use --skip-extract and serve mbtiles via a tile server.
 """
 
 from __future__ import annotations
 import argparse
+import contextlib
+import datetime as dt
+import gzip
+import hashlib
 import json
 import os
 import subprocess
 import sys
 import shutil
+import sqlite3
+import tempfile
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import geopandas as gpd
+import pyarrow as pa
+import pyarrow.compute as pc
+import shapely
 import boto3
+from botocore.exceptions import ClientError
+
+try:  # optional: brotli variants of the published JSON
+    import brotli
+except ImportError:
+    brotli = None
 
 
 def info(msg: str):
@@ -117,12 +150,24 @@ def parse_args():
     p.add_argument("--layer-name", default="fim_extents", help="Vector tile layer name")
     p.add_argument("--min-zoom", type=int, default=3)
     p.add_argument("--max-zoom", type=int, default=14)
+    p.add_argument(
+        "--full-attrs-zoom",
+        type=int,
+        default=10,
+        help="Zoom from which tiles carry all attributes; lower zooms keep only "
+        "feature_id/tier/event_ts (<= --min-zoom disables pruning)",
+    )
     p.add_argument(
         "--skip-extract",
         action="store_true",
         help="Do not explode MBTiles; serve with a tile server instead",
     )
     p.add_argument("--keep-temp", action="store_true", help="Keep fimextent.geojson")
+    p.add_argument(
+        "--split-tiers",
+        action="store_true",
+        help="Also build one tileset per tier (tiles/{tier}/{z}/{x}/{y}.pbf)",
+    )
 
     # NEW: flexible JSON upload controls
     p.add_argument(
@@ -142,6 +187,13 @@ def parse_args():
         help="Which JSONs to upload (default: both)",
     )
 
+    p.add_argument(
+        "--gc-grace-days",
+        type=float,
+        default=7.0,
+        help="Delete tile versions retired longer ago than this (default: 7)",
+    )
+
     p.add_argument("--s3-bucket", type=str, help="S3 bucket to upload to")
     p.add_argument(
         "--s3-prefix", type=str, help="S3 prefix/folder (e.g., FIM_Database/FIM_Viz)"
@@ -149,22 +201,314 @@ def parse_args():
     return p.parse_args()
 
 
+def parse_stats_args(argv: List[str]):
+    p = argparse.ArgumentParser(
+        prog="fim_tiles.py stats",
+        description="Per-zoom statistics for an MBTiles tileset, with optional regression gate.",
+    )
+    p.add_argument("mbtiles", type=Path, help="Tileset to inspect")
+    p.add_argument(
+        "--compare",
+        type=Path,
+        default=None,
+        help="Baseline .mbtiles (or stats .json) to compare against",
+    )
+    p.add_argument("--top", type=int, default=10, help="Heaviest tiles to list")
+    p.add_argument("--json", type=Path, default=None, help="Write stats to this JSON file")
+    p.add_argument(
+        "--max-size-regress",
+        type=float,
+        default=10.0,
+        help="Fail if total or p95 bytes of any zoom grow more than this %% vs baseline",
+    )
+    p.add_argument(
+        "--max-latency-regress",
+        type=float,
+        default=25.0,
+        help="Fail if p95 decode time of any zoom grows more than this %% vs baseline",
+    )
+    p.add_argument("--budget-max-tile-kb", type=float, default=None)
+    p.add_argument("--budget-p95-tile-kb", type=float, default=None)
+    p.add_argument("--budget-p95-ms", type=float, default=None)
+    return p.parse_args(argv)
+
+
+def stats_main(argv: List[str]) -> int:
+    import tile_stats
+
+    args = parse_stats_args(argv)
+    if not args.mbtiles.exists():
+        err(f"{args.mbtiles} not found.")
+        return 2
+
+    stats = tile_stats.tileset_stats(args.mbtiles, top=args.top)
+    tile_stats.print_stats(stats, log=info)
+    if args.json:
+        tile_stats.write_json(stats, args.json)
+        info(f"Wrote {args.json}")
+
+    failures = tile_stats.check_budgets(
+        stats,
+        max_tile_kb=args.budget_max_tile_kb,
+        p95_tile_kb=args.budget_p95_tile_kb,
+        p95_decode_ms=args.budget_p95_ms,
+    )
+    if args.compare:
+        if not args.compare.exists():
+            err(f"{args.compare} not found.")
+            return 2
+        baseline = tile_stats.load_stats(args.compare, top=args.top)
+        failures += tile_stats.compare_stats(
+            stats,
+            baseline,
+            max_size_regress_pct=args.max_size_regress,
+            max_latency_regress_pct=args.max_latency_regress,
+            log=info,
+        )
+
+    for f in failures:
+        err(f"Budget exceeded — {f}")
+    return 1 if failures else 0
+
+
 # upload helpers
-def upload_json_file(path: Path, bucket: str, prefix: str, key_name: str):
+JSON_MANIFEST_NAME = "json_manifest.json"
+COMPRESS_CHUNK = 1 << 20
+
+
+def stream_compress(path: Path, out_dir: Path) -> Dict[str, Any]:
+    """
+    Compress `path` chunk by chunk into gzip (and brotli, when the optional
+    `brotli` package is installed) files in out_dir; memory stays ~1 chunk.
+    Returns sizes, sha256 and {encoding: compressed_path}.
+    """
+    h = hashlib.sha256()
+    raw_bytes = 0
+    gz_path = out_dir / f"{path.name}.gz"
+    br_path = out_dir / f"{path.name}.br"
+    br = brotli.Compressor(mode=brotli.MODE_TEXT, quality=11) if brotli else None
+
+    with open(path, "rb") as src, open(gz_path, "wb") as gz_out, (
+        open(br_path, "wb") if br else contextlib.nullcontext()
+    ) as br_out:
+        with gzip.GzipFile(fileobj=gz_out, mode="wb", compresslevel=9, mtime=0) as gz:
+            for chunk in iter(lambda: src.read(COMPRESS_CHUNK), b""):
+                raw_bytes += len(chunk)
+                h.update(chunk)
+                gz.write(chunk)
+                if br:
+                    br_out.write(br.process(chunk))
+        if br:
+            br_out.write(br.finish())
+
+    files = {"gzip": gz_path}
+    if br:
+        files["br"] = br_path
+    else:
+        warn("Python package 'brotli' not installed — publishing gzip variant only.")
+    return {"raw_bytes": raw_bytes, "sha256": h.hexdigest(), "files": files}
+
+
+def update_json_manifest(
+    s3, bucket: str, prefix: str, key_name: str, entry: Optional[Dict]
+):
+    """Set (or, with entry=None, drop) key_name's entry in json_manifest.json."""
+    key = f"{prefix}/{JSON_MANIFEST_NAME}"
+    manifest = read_s3_json(s3, bucket, key)
+    if entry is None:
+        manifest.pop(key_name, None)
+    else:
+        manifest[key_name] = entry
+    s3.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps(manifest, indent=2).encode("utf-8"),
+        ContentType="application/json",
+        CacheControl=MANIFEST_CACHE,
+    )
+
+
+def upload_json_file(
+    path: Path, bucket: str, prefix: str, key_name: str
+) -> Optional[str]:
+    """
+    Upload the raw JSON plus pre-compressed {key_name}.gz / {key_name}.br
+    variants carrying Content-Encoding, and record all sizes in
+    json_manifest.json. Everything is streamed from disk. Returns the
+    sha256 of the JSON (None if nothing was uploaded).
+    """
     if not path or not path.exists():
         warn(f"File {path} not found — skipping upload for {key_name}")
-        return
+        return None
     s3 = boto3.client("s3")
     ct = (
         "application/geo+json"
         if path.suffix.lower() == ".geojson"
         else "application/json"
     )
-    with open(path, "rb") as fh:
+    key = f"{prefix}/{key_name}"
+    s3.upload_file(str(path), bucket, key, ExtraArgs={"ContentType": ct})
+    info(f"Uploaded {path} → s3://{bucket}/{key}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        comp = stream_compress(path, Path(tmp))
+        variants: Dict[str, Dict[str, Any]] = {}
+        for enc, fpath in comp["files"].items():
+            suffix = ".gz" if enc == "gzip" else ".br"
+            vkey = f"{key}{suffix}"
+            s3.upload_file(
+                str(fpath),
+                bucket,
+                vkey,
+                ExtraArgs={"ContentType": ct, "ContentEncoding": enc},
+            )
+            size = fpath.stat().st_size
+            variants[enc] = {"key": f"{key_name}{suffix}", "bytes": size}
+            ratio = comp["raw_bytes"] / size if size else 0.0
+            info(
+                f"Uploaded {enc} variant → s3://{bucket}/{vkey} "
+                f"({comp['raw_bytes']:,} → {size:,} bytes, {ratio:.1f}x smaller)"
+            )
+        if "br" not in variants:
+            # the app tries .br first: a copy from an earlier publish would
+            # keep serving the old JSON
+            s3.delete_object(Bucket=bucket, Key=f"{key}.br")
+            info(f"Removed stale br variant s3://{bucket}/{key}.br (if any)")
+
+    update_json_manifest(
+        s3,
+        bucket,
+        prefix,
+        key_name,
+        {
+            "raw_bytes": comp["raw_bytes"],
+            "sha256": comp["sha256"],
+            "content_type": ct,
+            "variants": variants,
+            "updated_at": utc_now_iso(),
+        },
+    )
+    return comp["sha256"]
+
+
+def parquet_catalog_digest(path: Path) -> Optional[str]:
+    """The catalog_sha256 stamp build_catalog.py writes into its Parquet copies."""
+    import pyarrow.parquet as pq
+
+    meta = pq.read_schema(str(path)).metadata or {}
+    value = meta.get(b"catalog_sha256")
+    return json.loads(value) if value else None
+
+
+def details_catalog_digest(folder: Path) -> Optional[str]:
+    """The catalog_sha256 build_catalog.py stamped a details/ folder with."""
+    stamp = folder / "catalog_sha256.txt"
+    return stamp.read_text(encoding="utf-8").strip() if stamp.exists() else None
+
+
+def remove_published(bucket: str, prefix: str, key_name: str):
+    """Delete {prefix}/{key_name} and its json_manifest.json entry."""
+    s3 = boto3.client("s3")
+    s3.delete_object(Bucket=bucket, Key=f"{prefix}/{key_name}")
+    update_json_manifest(s3, bucket, prefix, key_name, None)
+    info(f"Removed s3://{bucket}/{prefix}/{key_name} (if any)")
+
+
+def publish_catalog_copy(
+    path: Optional[Path],
+    catalog_sha256: str,
+    bucket: str,
+    prefix: str,
+    key_name: str,
+) -> bool:
+    """
+    Upload a Parquet copy of the catalog only if it was built from the JSON
+    just published (same catalog_sha256); otherwise delete the remote copy,
+    so the app never pairs an old binary with a new JSON.
+    """
+    if path and path.exists():
+        if parquet_catalog_digest(path) == catalog_sha256:
+            upload_parquet_file(path, bucket, prefix, key_name)
+            return True
+        warn(f"{path} was not built from the published catalog JSON — not uploading it")
+    remove_published(bucket, prefix, key_name)
+    return False
+
+
+def upload_parquet_file(path: Path, bucket: str, prefix: str, key_name: str):
+    """
+    Upload a Parquet file as-is (its pages are already compressed) and record
+    its size in json_manifest.json next to the JSON entries.
+    """
+    if not path or not path.exists():
+        warn(f"File {path} not found — skipping upload for {key_name}")
+        return
+    s3 = boto3.client("s3")
+    key = f"{prefix}/{key_name}"
+    ct = "application/vnd.apache.parquet"
+    s3.upload_file(str(path), bucket, key, ExtraArgs={"ContentType": ct})
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COMPRESS_CHUNK), b""):
+            h.update(chunk)
+    size = path.stat().st_size
+    info(f"Uploaded {path} → s3://{bucket}/{key} ({size:,} bytes)")
+    update_json_manifest(
+        s3,
+        bucket,
+        prefix,
+        key_name,
+        {
+            "raw_bytes": size,
+            "sha256": h.hexdigest(),
+            "content_type": ct,
+            "variants": {},
+            "updated_at": utc_now_iso(),
+        },
+    )
+
+
+def upload_detail_shards(folder: Path, bucket: str, prefix: str, key_name: str):
+    """
+    Upload build_catalog's details/{nn}.json shards gzip-encoded (one object
+    each, Content-Encoding: gzip) under {prefix}/{key_name}/ and record the
+    totals in json_manifest.json.
+    """
+    files = sorted(folder.glob("*.json")) if folder and folder.is_dir() else []
+    if not files:
+        warn(f"No detail shards in {folder} — skipping upload for {key_name}")
+        return
+    s3 = boto3.client("s3")
+    raw_bytes = gz_bytes = 0
+    for path in files:
+        raw = path.read_bytes()
+        body = gzip.compress(raw, compresslevel=9, mtime=0)
         s3.put_object(
-            Bucket=bucket, Key=f"{prefix}/{key_name}", Body=fh.read(), ContentType=ct
+            Bucket=bucket,
+            Key=f"{prefix}/{key_name}/{path.name}",
+            Body=body,
+            ContentType="application/json",
+            ContentEncoding="gzip",
         )
-    info(f"Uploaded {path} → s3://{bucket}/{prefix}/{key_name}")
+        raw_bytes += len(raw)
+        gz_bytes += len(body)
+    info(
+        f"Uploaded {len(files)} detail shards → s3://{bucket}/{prefix}/{key_name}/ "
+        f"({raw_bytes:,} → {gz_bytes:,} bytes)"
+    )
+    update_json_manifest(
+        s3,
+        bucket,
+        prefix,
+        key_name,
+        {
+            "files": len(files),
+            "raw_bytes": raw_bytes,
+            "bytes": gz_bytes,
+            "content_type": "application/json",
+            "updated_at": utc_now_iso(),
+        },
+    )
 
 
 def upload_selected_jsons(args, extents_path: Optional[Path]):
@@ -175,10 +519,41 @@ def upload_selected_jsons(args, extents_path: Optional[Path]):
     want_catalog = args.json_target in ("catalog", "both")
     want_extents = args.json_target in ("extents", "both")
 
+    catalog_sha256 = None
     if want_catalog:
-        upload_json_file(
+        catalog_sha256 = upload_json_file(
             args.catalog, args.s3_bucket, args.s3_prefix, "catalog_core.json"
         )
+    if catalog_sha256:
+        # typed copy, slim index and detail shards written next to it by
+        # build_catalog.py (read by the app); copies of another build are
+        # removed instead
+        publish_catalog_copy(
+            args.catalog.with_suffix(".parquet"),
+            catalog_sha256,
+            args.s3_bucket,
+            args.s3_prefix,
+            "catalog_core.parquet",
+        )
+        index_path = args.catalog.parent / "catalog_index.parquet"
+        details_dir = args.catalog.parent / "details"
+        if (
+            index_path.exists()
+            and parquet_catalog_digest(index_path) == catalog_sha256
+            and details_catalog_digest(details_dir) == catalog_sha256
+        ):
+            # shards first: an index is only published once its details are
+            upload_detail_shards(details_dir, args.s3_bucket, args.s3_prefix, "details")
+            upload_parquet_file(
+                index_path, args.s3_bucket, args.s3_prefix, "catalog_index.parquet"
+            )
+        else:
+            if index_path.exists():
+                warn(
+                    f"{index_path} or {details_dir} was not built from the published "
+                    "catalog JSON — not uploading them"
+                )
+            remove_published(args.s3_bucket, args.s3_prefix, "catalog_index.parquet")
     if want_extents:
         # prefer the minimized tmp extents if we built it; else fall back to user-provided --geojson-in
         if extents_path:
@@ -194,6 +569,179 @@ def upload_selected_jsons(args, extents_path: Optional[Path]):
 # rest of your original code
 
 
+# tile schema
+TILE_FIELDS = [
+    "feature_id",
+    "site_id",
+    "tier",
+    "event_date",
+    "event_ts",
+    "metadata_url",
+    "s3_prefix",
+    "geom_version",
+    "resolution_m",
+    "huc8",
+    "state",
+    "basin",
+    "source",
+    "access_rights",
+    "centroid",
+    "bbox",
+]
+# below --full-attrs-zoom only what the map filters/styles on is kept;
+# the popup looks the rest up in the catalog by feature_id
+LOW_ZOOM_FIELDS = ["feature_id", "tier", "event_ts"]
+
+
+def tile_fields(include_fields: Optional[List[str]]) -> List[str]:
+    keep, seen = [], set()
+    for f in TILE_FIELDS + (include_fields or []):
+        if f not in seen:
+            keep.append(f)
+            seen.add(f)
+    return keep
+
+
+# columnar property preparation
+DATE_SOURCE_COLS = [
+    "event_date",
+    "date",
+    "eventDate",
+    "flood_date",
+    "Date of Flood /Synthetic Flooding Event (return period (years))",
+]
+
+
+def join_catalog_fields(
+    gdf: gpd.GeoDataFrame, cat_df: Optional[pd.DataFrame], include_fields: List[str]
+) -> gpd.GeoDataFrame:
+    """
+    Attach `include_fields` from the catalog by 'id' with a positional take
+    instead of a DataFrame merge, so the geometry column is never copied.
+    Unmatched rows get NA (or keep an existing value of the same name).
+    """
+    if cat_df is None or not include_fields:
+        return gdf
+    if "id" not in cat_df.columns:
+        warn("Catalog has no 'id' column; skipping merge.")
+        return gdf
+
+    fields = [c for c in include_fields if c in cat_df.columns and c != "id"]
+    if not fields:
+        return gdf
+    cat_df = cat_df.drop_duplicates("id")
+    pos = pd.Index(cat_df["id"].astype(str)).get_indexer(gdf["id"].astype(str))
+    hit = pos >= 0
+    safe_pos = np.where(hit, pos, 0)
+
+    for col in fields:
+        vals = cat_df[col].to_numpy(dtype=object)[safe_pos]
+        if col in gdf.columns:
+            fallback = gdf[col].to_numpy(dtype=object)
+        else:
+            fallback = np.full(len(gdf), pd.NA, dtype=object)
+        gdf[col] = pd.Series(np.where(hit, vals, fallback), index=gdf.index)
+    return gdf
+
+
+def normalize_event_dates(values: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    Parse ISO (YYYY-MM-DD[...]) and compact YYYYMMDD dates with Arrow compute
+    kernels. Returns (event_date as 'YYYY-MM-DD' string, event_ts as Int64).
+    Values matching neither form fall back to pandas parsing.
+    """
+    s = pc.utf8_trim_whitespace(pa.array(values.astype("string")))
+    yy8 = pc.and_(pc.equal(pc.utf8_length(s), 8), pc.utf8_is_digit(s))
+    null_str = pa.scalar(None, pa.string())
+
+    ymd_try = pc.strptime(
+        pc.if_else(yy8, s, null_str), format="%Y%m%d", unit="s", error_is_null=True
+    )
+    iso_try = pc.strptime(
+        pc.utf8_slice_codeunits(pc.if_else(yy8, null_str, s), 0, 10),
+        format="%Y-%m-%d",
+        unit="s",
+        error_is_null=True,
+    )
+    ts = pc.coalesce(iso_try, ymd_try)
+
+    # rare non-ISO spellings (e.g. 05/01/2019): let pandas handle just those
+    leftover = pc.and_(pc.is_null(ts), pc.is_valid(s)).to_numpy(zero_copy_only=False)
+    if leftover.any():
+        s_np = s.to_pandas()
+        extra = pd.to_datetime(s_np[leftover], errors="coerce", utc=False)
+        filled = pd.Series(ts.to_pandas(), dtype="datetime64[s]")
+        filled[leftover] = extra.to_numpy(dtype="datetime64[s]")
+        ts = pa.array(filled, type=pa.timestamp("s"), from_pandas=True)
+
+    ymd_int = pc.add(
+        pc.add(
+            pc.multiply(pc.year(ts), 10000), pc.multiply(pc.month(ts), 100)
+        ),
+        pc.day(ts),
+    )
+    event_date = pc.strftime(ts, format="%Y-%m-%d").to_pandas(
+        types_mapper={pa.string(): pd.StringDtype()}.get
+    )
+    event_ts = pc.cast(ymd_int, pa.int64()).to_pandas(
+        types_mapper={pa.int64(): pd.Int64Dtype()}.get
+    )
+    event_date.index = values.index
+    event_ts.index = values.index
+    return event_date, event_ts
+
+
+def prepare_properties(
+    gdf: gpd.GeoDataFrame, cat_df: Optional[pd.DataFrame], include_fields: List[str]
+) -> gpd.GeoDataFrame:
+    """
+    Build the normalized tile properties on whole columns (catalog join,
+    dates, centroid, bbox) — no per-row Python loops.
+    """
+    # geometry cleanup first so every column below is computed once, on kept rows
+    keep = gdf.geometry.notnull() & ~gdf.geometry.is_empty
+    if not keep.all():
+        gdf = gdf.loc[keep].copy(deep=False)
+
+    gdf = join_catalog_fields(gdf, cat_df, include_fields)
+
+    # required, normalized properties for tiles/filters
+    gdf["feature_id"] = gdf["id"].astype(str)
+    gdf["site_id"] = gdf["site"].astype(str)
+    gdf["tier"] = gdf["tier"].fillna("Unknown_Tier").astype(str)
+
+    # event_date: prefer ISO; handle YYYYMMDD compact
+    src = next((c for c in DATE_SOURCE_COLS if c in gdf.columns), None)
+    if src is None:
+        gdf["event_date"] = pd.Series(pd.NA, index=gdf.index, dtype="string")
+        gdf["event_ts"] = pd.Series(pd.NA, index=gdf.index, dtype="Int64")
+    else:
+        gdf["event_date"], gdf["event_ts"] = normalize_event_dates(gdf[src])
+
+    # metadata pointers
+    if "metadata_url" not in gdf.columns:
+        gdf["metadata_url"] = pd.NA
+    if "s3_prefix" not in gdf.columns:
+        gdf["s3_prefix"] = pd.NA
+
+    # version + compact context
+    if "geom_version" not in gdf.columns:
+        gdf["geom_version"] = 1
+
+    for col in ("resolution_m", "huc8", "state", "basin", "source", "access_rights"):
+        if col not in gdf.columns:
+            gdf[col] = pd.NA
+
+    # centroid + bounds from vectorized shapely kernels
+    geoms = gdf.geometry.values
+    cent = shapely.get_coordinates(shapely.centroid(geoms))
+    bounds = shapely.bounds(geoms)
+    gdf["centroid"] = pd.Series(cent.tolist(), index=gdf.index, dtype=object)
+    gdf["bbox"] = pd.Series(bounds.tolist(), index=gdf.index, dtype=object)
+
+    return gdf
+
+
 def prepare_input_geojson(
     parquet_path: Path | None,
     geojson_in: Path | None,
@@ -201,7 +749,8 @@ def prepare_input_geojson(
     catalog_json: Path | None,
     include_fields: List[str],
     keep_temp: bool,
-) -> Path:
+) -> Tuple[Path, List[str]]:
+    """Write the lean tippecanoe GeoJSON; returns (path, sorted tier values)."""
     if parquet_path is None and geojson_in is None:
         err(
             "Provide either --parquet or --geojson-in (unless using --upload-json-only)."
@@ -239,6 +788,7 @@ def prepare_input_geojson(
         gdf["site"] = gdf["id"]
 
     # optional catalog merge (for tiles only)
+    cat_df = None
     if catalog_json and include_fields:
         info(f"Merging catalog: {catalog_json} for fields {include_fields}")
         with open(catalog_json, "r", encoding="utf-8") as f:
@@ -246,101 +796,21 @@ def prepare_input_geojson(
         records = core.get("records", core)
         cat_df = pd.DataFrame(records if isinstance(records, list) else [records])
 
-        if "id" not in cat_df.columns:
-            warn("Catalog has no 'id' column; skipping merge.")
-        else:
-            keep_cols = ["id"] + [c for c in include_fields if c in cat_df.columns]
-            cat_df = cat_df[keep_cols].drop_duplicates("id")
-            gdf = gdf.merge(cat_df, on="id", how="left")
-
-    # required, normalized properties for tiles/filters
-    gdf["feature_id"] = gdf["id"].astype(str)
-    gdf["site_id"] = gdf["site"].astype(str)
-    gdf["tier"] = gdf["tier"].fillna("Unknown_Tier").astype(str)
-
-    # event_date: prefer ISO; handle YYYYMMDD compact
-    date_source_cols = [
-        "event_date",
-        "date",
-        "eventDate",
-        "flood_date",
-        "Date of Flood /Synthetic Flooding Event (return period (years))",
-    ]
-    src = next((c for c in date_source_cols if c in gdf.columns), None)
-    if src is None:
-        gdf["event_date"] = pd.Series([pd.NA] * len(gdf), dtype="string")
-    else:
-        s = gdf[src].astype("string").str.strip()
-        yy8 = s.str.len().eq(8) & s.str.isnumeric()
-        iso_try = pd.to_datetime(s.mask(yy8, pd.NA), errors="coerce", utc=False)
-        ymd_try = pd.to_datetime(
-            s.where(yy8), format="%Y%m%d", errors="coerce", utc=False
-        )
-        ed = iso_try.fillna(ymd_try)
-        gdf["event_date"] = ed.dt.date.astype("string")
-
-    gdf["event_ts"] = gdf["event_date"].str.replace("-", "", regex=False)
-    gdf.loc[gdf["event_ts"].isna(), "event_ts"] = pd.NA
-    gdf["event_ts"] = gdf["event_ts"].astype("Int64")
-
-    # metadata pointers
-    if "metadata_url" not in gdf.columns:
-        gdf["metadata_url"] = pd.NA
-    if "s3_prefix" not in gdf.columns:
-        gdf["s3_prefix"] = pd.NA
-
-    # version + compact context
-    if "geom_version" not in gdf.columns:
-        gdf["geom_version"] = 1
-
-    for col in ("resolution_m", "huc8", "state", "basin", "source", "access_rights"):
-        if col not in gdf.columns:
-            gdf[col] = pd.NA
-
-    # geometry cleanup
-    gdf = gdf[gdf.geometry.notnull() & ~gdf.geometry.is_empty]
-
-    # centroid
-    cent = gdf.geometry.centroid
-    gdf["centroid"] = list(map(lambda x, y: [float(x), float(y)], cent.x, cent.y))
-
-    # bounds
-    b = gdf.geometry.bounds
-    gdf["bbox"] = [
-        [float(xmin), float(ymin), float(xmax), float(ymax)]
-        for xmin, ymin, xmax, ymax in zip(b.minx, b.miny, b.maxx, b.maxy)
-    ]
+    gdf = prepare_properties(gdf, cat_df, include_fields)
 
     # write lean GeoJSON for tippecanoe
     tmp_geojson = out_dir / "fimextent.geojson"
     tmp_geojson.parent.mkdir(parents=True, exist_ok=True)
     info(f"Writing GeoJSON for tippecanoe: {tmp_geojson}")
 
-    keep_props = [
-        "feature_id",
-        "site_id",
-        "tier",
-        "event_date",
-        "event_ts",
-        "metadata_url",
-        "s3_prefix",
-        "geom_version",
-        "resolution_m",
-        "huc8",
-        "state",
-        "basin",
-        "source",
-        "access_rights",
-        "centroid",
-        "bbox",
-    ]
+    keep_props = list(TILE_FIELDS)
     extra = [
         c for c in (include_fields or []) if c in gdf.columns and c not in keep_props
     ]
     cols = ["geometry"] + keep_props + extra
     gdf[cols].to_file(tmp_geojson, driver="GeoJSON")
 
-    return tmp_geojson
+    return tmp_geojson, sorted(gdf["tier"].unique().tolist())
 
 
 # tiling helpers unchanged…
@@ -352,6 +822,7 @@ def build_mbtiles(
     max_z: int,
     include_fields: List[str],
     extra_flags: Optional[List[str]] = None,
+    fields: Optional[List[str]] = None,
 ):
     tippecanoe = which_or_die(
         "tippecanoe", "Install tippecanoe and ensure it is in PATH."
@@ -359,28 +830,7 @@ def build_mbtiles(
     out_mbtiles.parent.mkdir(parents=True, exist_ok=True)
     info(f"Building MBTiles with tippecanoe → {out_mbtiles}")
 
-    keep, seen = [], set()
-    for f in [
-        "feature_id",
-        "site_id",
-        "tier",
-        "event_date",
-        "event_ts",
-        "metadata_url",
-        "s3_prefix",
-        "geom_version",
-        "resolution_m",
-        "huc8",
-        "state",
-        "basin",
-        "source",
-        "access_rights",
-        "centroid",
-        "bbox",
-    ] + (include_fields or []):
-        if f not in seen:
-            keep.append(f)
-            seen.add(f)
+    keep = fields if fields is not None else tile_fields(include_fields)
 
     include_args = []
     for fld in keep:
@@ -418,6 +868,152 @@ def build_mbtiles(
     info("MBTiles built.")
 
 
+def mbtiles_zoom_bytes(mbtiles: Path) -> Dict[int, Tuple[int, int]]:
+    """{zoom: (tile_count, total_bytes)} straight from the tiles table."""
+    con = sqlite3.connect(f"file:{mbtiles}?mode=ro", uri=True)
+    try:
+        rows = con.execute(
+            "SELECT zoom_level, COUNT(*), SUM(LENGTH(tile_data)) FROM tiles GROUP BY zoom_level"
+        ).fetchall()
+    finally:
+        con.close()
+    return {int(z): (int(n), int(b or 0)) for z, n, b in rows}
+
+
+def splice_low_zooms(full_mbtiles: Path, low_mbtiles: Path, below_zoom: int) -> bool:
+    """Replace tiles with zoom < below_zoom in full_mbtiles by those of low_mbtiles."""
+    con = sqlite3.connect(full_mbtiles)
+    try:
+        kind = con.execute(
+            "SELECT type FROM sqlite_master WHERE name = 'tiles'"
+        ).fetchone()
+        if not kind or kind[0] != "table":
+            warn(f"{full_mbtiles} has no plain 'tiles' table; keeping full attributes.")
+            return False
+        con.execute("ATTACH DATABASE ? AS low", (str(low_mbtiles),))
+        with con:
+            con.execute("DELETE FROM tiles WHERE zoom_level < ?", (below_zoom,))
+            con.execute(
+                "INSERT INTO tiles (zoom_level, tile_column, tile_row, tile_data) "
+                "SELECT zoom_level, tile_column, tile_row, tile_data FROM low.tiles "
+                "WHERE zoom_level < ?",
+                (below_zoom,),
+            )
+        con.execute("DETACH DATABASE low")
+        con.execute("VACUUM")
+    finally:
+        con.close()
+    return True
+
+
+def report_pruning_savings(
+    before: Dict[int, Tuple[int, int]], after: Dict[int, Tuple[int, int]]
+):
+    info("Attribute pruning savings (low zooms):")
+    info(f"{'zoom':>6} {'tiles':>8} {'full KB':>10} {'pruned KB':>10} {'saved':>7}")
+    tot_before = tot_after = 0
+    for z in sorted(after):
+        n, b_after = after[z]
+        b_before = before.get(z, (0, 0))[1]
+        tot_before += b_before
+        tot_after += b_after
+        pct = (1 - b_after / b_before) * 100 if b_before else 0.0
+        info(
+            f"{z:>6} {n:>8} {b_before / 1024:>10.1f} {b_after / 1024:>10.1f} {pct:>6.1f}%"
+        )
+    if tot_before:
+        info(
+            f"{'all':>6} {'':>8} {tot_before / 1024:>10.1f} {tot_after / 1024:>10.1f} "
+            f"{(1 - tot_after / tot_before) * 100:>6.1f}%"
+        )
+
+
+def build_pruned_mbtiles(
+    in_geojson: Path,
+    out_mbtiles: Path,
+    layer_name: str,
+    min_z: int,
+    max_z: int,
+    include_fields: List[str],
+    full_attrs_zoom: int,
+    extra_flags: Optional[List[str]] = None,
+):
+    """
+    Build MBTiles whose zooms below `full_attrs_zoom` carry only LOW_ZOOM_FIELDS.
+    tippecanoe has no per-zoom attribute list, so a second low-zoom pass with
+    the lean schema is spliced over the low zooms of the full tileset.
+    """
+    build_mbtiles(
+        in_geojson=in_geojson,
+        out_mbtiles=out_mbtiles,
+        layer_name=layer_name,
+        min_z=min_z,
+        max_z=max_z,
+        include_fields=include_fields,
+        extra_flags=extra_flags,
+    )
+    if full_attrs_zoom <= min_z:
+        return
+
+    low_mbtiles = out_mbtiles.with_name(f"{out_mbtiles.stem}.lowzoom.mbtiles")
+    build_mbtiles(
+        in_geojson=in_geojson,
+        out_mbtiles=low_mbtiles,
+        layer_name=layer_name,
+        min_z=min_z,
+        max_z=min(full_attrs_zoom - 1, max_z),
+        include_fields=[],
+        extra_flags=extra_flags,
+        fields=LOW_ZOOM_FIELDS,
+    )
+    try:
+        before = mbtiles_zoom_bytes(out_mbtiles)
+        if splice_low_zooms(out_mbtiles, low_mbtiles, full_attrs_zoom):
+            after = mbtiles_zoom_bytes(out_mbtiles)
+            report_pruning_savings(
+                before, {z: v for z, v in after.items() if z < full_attrs_zoom}
+            )
+    finally:
+        low_mbtiles.unlink(missing_ok=True)
+
+
+def tier_filter_flags(tier: str) -> List[str]:
+    """tippecanoe feature filter keeping a single tier (applies to every layer)."""
+    return ["-j", json.dumps({"*": ["==", "tier", tier]})]
+
+
+def build_tier_mbtiles(
+    in_geojson: Path,
+    out_dir: Path,
+    tiers: List[str],
+    layer_name: str,
+    min_z: int,
+    max_z: int,
+    include_fields: List[str],
+    full_attrs_zoom: int,
+) -> Dict[str, Path]:
+    """
+    One tileset per tier, same layer name and schema as the combined one,
+    so the map can request only the tiers a user selected.
+    """
+    out: Dict[str, Path] = {}
+    for tier in tiers:
+        tier_mbtiles = out_dir / f"{layer_name}.{tier}.mbtiles"
+        info(f"Per-tier tileset: {tier}")
+        build_pruned_mbtiles(
+            in_geojson=in_geojson,
+            out_mbtiles=tier_mbtiles,
+            layer_name=layer_name,
+            min_z=min_z,
+            max_z=max_z,
+            include_fields=include_fields,
+            full_attrs_zoom=full_attrs_zoom,
+            extra_flags=tier_filter_flags(tier),
+        )
+        out[tier] = tier_mbtiles
+    return out
+
+
 def extract_mbtiles_to_dir(mbtiles: Path, out_dir: Path):
     mbutil = shutil.which("mb-util")
     if not mbutil:
@@ -437,8 +1033,85 @@ def extract_mbtiles_to_dir(mbtiles: Path, out_dir: Path):
         info("Extraction complete.")
 
 
-def upload_to_s3(local_tiles: Path, bucket: str, prefix: str):
+# versioned tile publishing
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+MANIFEST_CACHE = "public, max-age=60, must-revalidate"
+TILE_MANIFEST_NAME = "manifest.json"
+
+
+def utc_now_iso() -> str:
+    return dt.datetime.now(dt.timezone.utc).replace(microsecond=0).isoformat()
+
+
+def tileset_version(local_tiles: Path) -> str:
+    """Content hash over every (relative path, bytes) in the tile tree."""
+    h = hashlib.sha256()
+    for fpath in sorted(p for p in local_tiles.rglob("*") if p.is_file()):
+        h.update(fpath.relative_to(local_tiles).as_posix().encode("utf-8") + b"\0")
+        with open(fpath, "rb") as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def read_s3_json(s3, bucket: str, key: str) -> Dict[str, Any]:
+    try:
+        body = s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+        return json.loads(body)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return {}
+        raise
+
+
+def gc_tile_versions(
+    s3, bucket: str, prefix: str, manifest: Dict[str, Any], grace_days: float
+):
+    """
+    Delete versions retired more than `grace_days` ago. Versions the manifest
+    does not know about are left alone.
+    """
+    now = dt.datetime.now(dt.timezone.utc)
+    keep_history = []
+    for h in manifest.get("history", []):
+        retired = dt.datetime.fromisoformat(h["retired_at"])
+        if h["version"] == manifest.get("version") or now - retired < dt.timedelta(
+            days=grace_days
+        ):
+            keep_history.append(h)
+            continue
+        vprefix = f"{prefix}/tiles/v/{h['version']}/"
+        info(f"GC tile version {h['version']} (retired {h['retired_at']})")
+        paginator = s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket, Prefix=vprefix):
+            objs = [{"Key": o["Key"]} for o in page.get("Contents", [])]
+            for i in range(0, len(objs), 1000):
+                s3.delete_objects(
+                    Bucket=bucket, Delete={"Objects": objs[i : i + 1000], "Quiet": True}
+                )
+    manifest["history"] = keep_history
+
+
+def upload_to_s3(
+    local_tiles: Path,
+    bucket: str,
+    prefix: str,
+    layer_name: str = "fim_extents",
+    min_z: Optional[int] = None,
+    max_z: Optional[int] = None,
+    tiers: Optional[List[str]] = None,
+    gc_grace_days: float = 7.0,
+):
+    """
+    Publish the tile tree under tiles/v/{content-hash}/ with immutable
+    caching, then repoint the small mutable tiles/manifest.json at it.
+    Re-publishing identical tiles is a no-op apart from the manifest.
+    """
     s3 = boto3.client("s3")
+    version = tileset_version(local_tiles)
+    base_key = f"{prefix}/tiles/v/{version}"
+    base_url = f"https://{bucket}.s3.amazonaws.com/{base_key}"
+    manifest_key = f"{prefix}/tiles/{TILE_MANIFEST_NAME}"
 
     def guess_headers(p: Path) -> Dict[str, str]:
         if p.suffix == ".pbf":
@@ -448,20 +1121,66 @@ def upload_to_s3(local_tiles: Path, bucket: str, prefix: str):
         else:
             return {"ContentType": "application/octet-stream"}
 
-    for root, _, files in os.walk(local_tiles):
-        for fname in files:
-            fpath = Path(root) / fname
-            key = f"{prefix}/tiles/{fpath.relative_to(local_tiles).as_posix()}"
-            info(f"Uploading {fpath} → s3://{bucket}/{key}")
-            with open(fpath, "rb") as fh:
-                s3.put_object(
-                    Bucket=bucket, Key=key, Body=fh.read(), **guess_headers(fpath)
+    manifest = read_s3_json(s3, bucket, manifest_key)
+    already = manifest.get("version") == version or any(
+        h.get("version") == version for h in manifest.get("history", [])
+    )
+    if already:
+        info(f"Tile version {version} already published — skipping tile upload.")
+    else:
+        for root, _, files in os.walk(local_tiles):
+            for fname in files:
+                fpath = Path(root) / fname
+                key = f"{base_key}/{fpath.relative_to(local_tiles).as_posix()}"
+                info(f"Uploading {fpath} → s3://{bucket}/{key}")
+                s3.upload_file(
+                    str(fpath),
+                    bucket,
+                    key,
+                    ExtraArgs={**guess_headers(fpath), "CacheControl": IMMUTABLE_CACHE},
                 )
-    return f"https://{bucket}.s3.amazonaws.com/{prefix}/tiles/{{z}}/{{x}}/{{y}}.pbf"
+
+    # retire the previous version (kept for the grace period)
+    now = utc_now_iso()
+    history = [h for h in manifest.get("history", []) if h.get("version") != version]
+    prev = manifest.get("version")
+    if prev and prev != version:
+        history.append(
+            {
+                "version": prev,
+                "published_at": manifest.get("published_at"),
+                "retired_at": now,
+            }
+        )
+    manifest = {
+        "version": version,
+        "published_at": now if prev != version else manifest.get("published_at", now),
+        "layer_name": layer_name,
+        "min_zoom": min_z,
+        "max_zoom": max_z,
+        "url_template": f"{base_url}/{{z}}/{{x}}/{{y}}.pbf",
+        "tiers": sorted(tiers or []),
+        "tier_url_template": (f"{base_url}/{{tier}}/{{z}}/{{x}}/{{y}}.pbf" if tiers else None),
+        "history": history,
+    }
+    gc_tile_versions(s3, bucket, prefix, manifest, gc_grace_days)
+
+    s3.put_object(
+        Bucket=bucket,
+        Key=manifest_key,
+        Body=json.dumps(manifest, indent=2).encode("utf-8"),
+        ContentType="application/json",
+        CacheControl=MANIFEST_CACHE,
+    )
+    info(f"Tile manifest → s3://{bucket}/{manifest_key} (version {version})")
+    return manifest["url_template"]
 
 
 # main
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "stats":
+        sys.exit(stats_main(sys.argv[2:]))
+
     args = parse_args()
 
     # JSON-only mode (no sources required)
@@ -482,7 +1201,7 @@ def main():
     out_dir.mkdir(parents=True, exist_ok=True)
 
     # build minimized extents geojson for tippecanoe
-    tmp_geojson = prepare_input_geojson(
+    tmp_geojson, tiers = prepare_input_geojson(
         parquet_path=args.parquet,
         geojson_in=args.geojson_in,
         out_dir=out_dir,
@@ -495,29 +1214,54 @@ def main():
     tiles_dir = out_dir / "tiles"
 
     # tiles
-    build_mbtiles(
+    build_pruned_mbtiles(
         in_geojson=tmp_geojson,
         out_mbtiles=out_mbtiles,
         layer_name=args.layer_name,
         min_z=args.min_zoom,
         max_z=args.max_zoom,
         include_fields=args.include,
+        full_attrs_zoom=args.full_attrs_zoom,
     )
+    tier_mbtiles: Dict[str, Path] = {}
+    if args.split_tiers:
+        tier_mbtiles = build_tier_mbtiles(
+            in_geojson=tmp_geojson,
+            out_dir=out_dir,
+            tiers=tiers,
+            layer_name=args.layer_name,
+            min_z=args.min_zoom,
+            max_z=args.max_zoom,
+            include_fields=args.include,
+            full_attrs_zoom=args.full_attrs_zoom,
+        )
 
     if not args.skip_extract:
         extract_mbtiles_to_dir(out_mbtiles, tiles_dir)
+        # per-tier trees live next to the z folders: tiles/{tier}/{z}/{x}/{y}.pbf
+        for tier, mbt in tier_mbtiles.items():
+            extract_mbtiles_to_dir(mbt, tiles_dir / tier)
 
         if args.s3_bucket and args.s3_prefix:
             url_tpl = upload_to_s3(
-                local_tiles=tiles_dir, bucket=args.s3_bucket, prefix=args.s3_prefix
+                local_tiles=tiles_dir,
+                bucket=args.s3_bucket,
+                prefix=args.s3_prefix,
+                layer_name=args.layer_name,
+                min_z=args.min_zoom,
+                max_z=args.max_zoom,
+                tiers=list(tier_mbtiles),
+                gc_grace_days=args.gc_grace_days,
             )
-            info(f"Tiles ready at: {url_tpl}")
         else:
-            info(
-                f"Tiles ready at: {tiles_dir.resolve().as_uri()}/{{z}}/{{x}}/{{y}}.pbf"
-            )
+            url_tpl = f"{tiles_dir.resolve().as_uri()}/{{z}}/{{x}}/{{y}}.pbf"
+        info(f"Tiles ready at: {url_tpl}")
+        if tier_mbtiles:
+            info(f"Per-tier tiles at: {url_tpl.replace('{z}', '{tier}/{z}', 1)}")
     else:
         info(f"Serve {out_mbtiles} via a tileserver")
+        for mbt in tier_mbtiles.values():
+            info(f"Serve {mbt} via a tileserver")
 
     # Optionally upload JSONs in the same run
     if args.upload_json:
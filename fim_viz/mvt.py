@@ -0,0 +1,310 @@
+"""
+Minimal Mapbox Vector Tile (protobuf) reader for the tile tooling.
+
+Only what the FIM scripts need, with no third-party dependency:
+- walk layers and features of a (gzipped) .pbf tile
+- read feature properties, count or decode geometry vertices
+- keep the byte span of every message so callers can measure sizes
+- re-encode a tile keeping only some features (subset_tile), copying the
+  untouched messages byte-for-byte
+
+Spec: https://github.com/mapbox/vector-tile-spec/tree/master/2.1
+"""
+
+from __future__ import annotations
+import gzip
+import struct
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# wire types
+VARINT, FIXED64, LEN, FIXED32 = 0, 1, 2, 5
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def read_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    result = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+
+
+def iter_fields(
+    buf: bytes, start: int = 0, end: Optional[int] = None
+) -> Iterator[Tuple[int, int, Any, int, int]]:
+    """
+    Yield (field_number, wire_type, value, msg_start, msg_end) for each field.
+    LEN values are (offset, length) into `buf`; msg_start/msg_end span the
+    whole field including its key.
+    """
+    pos = start
+    end = len(buf) if end is None else end
+    while pos < end:
+        field_start = pos
+        key, pos = read_varint(buf, pos)
+        field, wt = key >> 3, key & 7
+        if wt == VARINT:
+            val, pos = read_varint(buf, pos)
+        elif wt == LEN:
+            n, pos = read_varint(buf, pos)
+            val = (pos, n)
+            pos += n
+        elif wt == FIXED64:
+            val = buf[pos : pos + 8]
+            pos += 8
+        elif wt == FIXED32:
+            val = buf[pos : pos + 4]
+            pos += 4
+        else:
+            raise ValueError(f"Unsupported wire type {wt} at byte {field_start}")
+        yield field, wt, val, field_start, pos
+
+
+def read_packed(buf: bytes, offset: int, length: int) -> List[int]:
+    out: List[int] = []
+    pos, end = offset, offset + length
+    while pos < end:
+        v, pos = read_varint(buf, pos)
+        out.append(v)
+    return out
+
+
+def zigzag(n: int) -> int:
+    return (n >> 1) ^ -(n & 1)
+
+
+def count_vertices(geometry: List[int]) -> int:
+    """Number of MoveTo/LineTo points in an encoded geometry command stream."""
+    i = n_vertices = 0
+    while i < len(geometry):
+        cmd = geometry[i]
+        cmd_id, count = cmd & 7, cmd >> 3
+        i += 1
+        if cmd_id in (1, 2):
+            n_vertices += count
+            i += 2 * count
+    return n_vertices
+
+
+def decode_geometry(geometry: List[int]) -> List[List[Tuple[int, int]]]:
+    """
+    Rings/lines of an encoded geometry as lists of tile-space (x, y) points.
+    A MoveTo starts a new part; ClosePath does not repeat the first point.
+    """
+    parts: List[List[Tuple[int, int]]] = []
+    x = y = i = 0
+    while i < len(geometry):
+        cmd = geometry[i]
+        cmd_id, count = cmd & 7, cmd >> 3
+        i += 1
+        if cmd_id not in (1, 2):
+            continue
+        for _ in range(count):
+            x += zigzag(geometry[i])
+            y += zigzag(geometry[i + 1])
+            i += 2
+            if cmd_id == 1:
+                parts.append([])
+            parts[-1].append((x, y))
+    return parts
+
+
+def decode_value(buf: bytes, offset: int, length: int) -> Any:
+    for field, wt, val, _, _ in iter_fields(buf, offset, offset + length):
+        if field == 1:
+            return bytes(buf[val[0] : val[0] + val[1]]).decode("utf-8", "replace")
+        if field == 2:
+            return struct.unpack("<f", val)[0]
+        if field == 3:
+            return struct.unpack("<d", val)[0]
+        if field == 4:
+            return val - (1 << 64) if val >= (1 << 63) else val
+        if field == 5:
+            return val
+        if field == 6:
+            return zigzag(val)
+        if field == 7:
+            return bool(val)
+    return None
+
+
+class Feature:
+    __slots__ = ("id", "tags", "type", "geometry", "span")
+
+    def __init__(self):
+        self.id: Optional[int] = None
+        self.tags: List[int] = []
+        self.type: int = 0
+        self.geometry: List[int] = []
+        self.span: Tuple[int, int] = (0, 0)  # whole field, key included
+
+    @property
+    def size(self) -> int:
+        return self.span[1] - self.span[0]
+
+
+class Layer:
+    __slots__ = ("name", "keys", "values", "features", "span", "attr_bytes")
+
+    def __init__(self):
+        self.name = ""
+        self.keys: List[str] = []
+        self.values: List[Any] = []
+        self.features: List[Feature] = []
+        self.span: Tuple[int, int] = (0, 0)
+        # keys + values tables and the per-feature tag arrays
+        self.attr_bytes = 0
+
+    def properties(self, feature: Feature) -> Dict[str, Any]:
+        t = feature.tags
+        return {self.keys[t[i]]: self.values[t[i + 1]] for i in range(0, len(t) - 1, 2)}
+
+
+def _read_feature(buf: bytes, offset: int, length: int) -> Tuple[Feature, int]:
+    f = Feature()
+    tag_bytes = 0
+    for field, _, val, fs, fe in iter_fields(buf, offset, offset + length):
+        if field == 1:
+            f.id = val
+        elif field == 2:
+            f.tags = read_packed(buf, *val)
+            tag_bytes += fe - fs
+        elif field == 3:
+            f.type = val
+        elif field == 4:
+            f.geometry = read_packed(buf, *val)
+    return f, tag_bytes
+
+
+def read_layer(buf: bytes, offset: int, length: int) -> Layer:
+    layer = Layer()
+    for field, _, val, fs, fe in iter_fields(buf, offset, offset + length):
+        if field == 1:
+            layer.name = bytes(buf[val[0] : val[0] + val[1]]).decode("utf-8")
+        elif field == 2:
+            feat, tag_bytes = _read_feature(buf, *val)
+            feat.span = (fs, fe)
+            layer.features.append(feat)
+            layer.attr_bytes += tag_bytes
+        elif field == 3:
+            layer.keys.append(bytes(buf[val[0] : val[0] + val[1]]).decode("utf-8"))
+            layer.attr_bytes += fe - fs
+        elif field == 4:
+            layer.values.append(decode_value(buf, *val))
+            layer.attr_bytes += fe - fs
+    return layer
+
+
+def decompress(data: bytes) -> bytes:
+    return gzip.decompress(data) if data[:2] == GZIP_MAGIC else data
+
+
+def read_tile(data: bytes) -> Tuple[bytes, List[Layer]]:
+    """Return (uncompressed protobuf bytes, layers)."""
+    buf = decompress(data)
+    layers: List[Layer] = []
+    for field, wt, val, fs, fe in iter_fields(buf):
+        if field == 3 and wt == LEN:
+            layer = read_layer(buf, *val)
+            layer.span = (fs, fe)
+            layers.append(layer)
+    return buf, layers
+
+
+# encoding
+
+
+def write_varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def encode_len_field(field: int, payload: bytes) -> bytes:
+    return write_varint((field << 3) | LEN) + write_varint(len(payload)) + payload
+
+
+def encode_packed(field: int, values: Sequence[int]) -> bytes:
+    return encode_len_field(field, b"".join(write_varint(v) for v in values))
+
+
+def subset_layer(buf: bytes, offset: int, length: int, keep: Sequence[int]) -> bytes:
+    """
+    Layer message (field 3, key included) holding only the features at
+    indices `keep`. The keys/values tables are compacted to the entries the
+    kept features reference and their tags renumbered; everything else
+    (name, version, extent, feature ids and geometries) is copied as-is.
+    """
+    head: List[bytes] = []
+    tail: List[bytes] = []
+    features: List[Tuple[int, int]] = []
+    keys: List[bytes] = []
+    values: List[bytes] = []
+    for field, _, val, fs, fe in iter_fields(buf, offset, offset + length):
+        if field == 2:
+            features.append(val)
+        elif field == 3:
+            keys.append(buf[fs:fe])
+        elif field == 4:
+            values.append(buf[fs:fe])
+        elif field == 5:
+            tail.append(buf[fs:fe])
+        else:
+            head.append(buf[fs:fe])
+
+    key_map: Dict[int, int] = {}
+    val_map: Dict[int, int] = {}
+    out_features: List[bytes] = []
+    for i in keep:
+        parts: List[bytes] = []
+        f_off, f_len = features[i]
+        for field, _, val, fs, fe in iter_fields(buf, f_off, f_off + f_len):
+            if field == 2:
+                tags = read_packed(buf, *val)
+                remapped: List[int] = []
+                for k in range(0, len(tags) - 1, 2):
+                    remapped.append(key_map.setdefault(tags[k], len(key_map)))
+                    remapped.append(val_map.setdefault(tags[k + 1], len(val_map)))
+                parts.append(encode_packed(2, remapped))
+            else:
+                parts.append(buf[fs:fe])
+        out_features.append(encode_len_field(2, b"".join(parts)))
+
+    payload = b"".join(
+        head
+        + out_features
+        + [keys[k] for k in key_map]  # dicts keep first-use order = new index
+        + [values[v] for v in val_map]
+        + tail
+    )
+    return encode_len_field(3, payload)
+
+
+def subset_tile(buf: bytes, keep: Dict[int, Sequence[int]]) -> bytes:
+    """
+    Uncompressed tile with, for each layer index in `keep`, only the listed
+    features. Layers not in `keep` are copied unchanged; layers left with no
+    features are dropped.
+    """
+    out: List[bytes] = []
+    layer_idx = 0
+    for field, wt, val, fs, fe in iter_fields(buf):
+        if field != 3 or wt != LEN:
+            out.append(buf[fs:fe])
+            continue
+        if layer_idx not in keep:
+            out.append(buf[fs:fe])
+        elif keep[layer_idx]:
+            out.append(subset_layer(buf, val[0], val[1], keep[layer_idx]))
+        layer_idx += 1
+    return b"".join(out)
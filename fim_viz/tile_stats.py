@@ -0,0 +1,243 @@
+"""
+Per-zoom statistics for an MBTiles vector tileset, and a size/latency
+regression check between two tilesets. Used by `fim_tiles.py stats`.
+
+Sizes are the stored (gzip-compressed) tile bytes, i.e. what a browser
+downloads. Decode latency is the time to gunzip + parse each tile in
+Python; it is a relative proxy for client cost, not an absolute number.
+"""
+
+from __future__ import annotations
+import json
+import math
+import sqlite3
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import mvt
+
+
+def _pct(sorted_vals: List[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = max(0, math.ceil(q * len(sorted_vals)) - 1)
+    return float(sorted_vals[k])
+
+
+def _iter_tiles(mbtiles: Path):
+    con = sqlite3.connect(f"file:{mbtiles}?mode=ro", uri=True)
+    try:
+        yield from con.execute(
+            "SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles"
+        )
+    finally:
+        con.close()
+
+
+# decode timings below this absolute difference are treated as noise
+LATENCY_NOISE_MS = 0.25
+
+
+def _decode_ms(data: bytes, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        mvt.read_tile(data)
+        best = min(best, (time.perf_counter() - t0) * 1000.0)
+    return best
+
+
+def tileset_stats(mbtiles: Path, top: int = 10, repeat: int = 3) -> Dict[str, Any]:
+    """
+    Returns {"zooms": {z: {...}}, "heaviest": [...], "totals": {...}}.
+    Tile y in "heaviest" is XYZ (flipped from the TMS rows MBTiles stores).
+    Decode time per tile is the best of `repeat` runs.
+    """
+    per_zoom: Dict[int, Dict[str, List[float]]] = {}
+    heaviest: List[Tuple[int, Dict[str, Any]]] = []
+
+    for z, x, tms_y, data in _iter_tiles(mbtiles):
+        buf, layers = mvt.read_tile(data)
+        decode_ms = _decode_ms(data, repeat)
+
+        n_feat = n_vert = attr_bytes = 0
+        fid_bytes: Counter = Counter()
+        for layer in layers:
+            n_feat += len(layer.features)
+            attr_bytes += layer.attr_bytes
+            for f in layer.features:
+                n_vert += mvt.count_vertices(f.geometry)
+                fid = layer.properties(f).get("feature_id", f.id)
+                fid_bytes[str(fid)] += f.size
+
+        acc = per_zoom.setdefault(
+            z,
+            {"bytes": [], "raw": [], "features": [], "vertices": [], "attr": [], "ms": []},
+        )
+        acc["bytes"].append(len(data))
+        acc["raw"].append(len(buf))
+        acc["features"].append(n_feat)
+        acc["vertices"].append(n_vert)
+        acc["attr"].append(attr_bytes)
+        acc["ms"].append(decode_ms)
+
+        entry = {
+            "z": z,
+            "x": x,
+            "y": (1 << z) - 1 - tms_y,
+            "bytes": len(data),
+            "features": n_feat,
+            "vertices": n_vert,
+            "dominant": [
+                {"feature_id": k, "share": round(v / max(len(buf), 1), 3)}
+                for k, v in fid_bytes.most_common(3)
+            ],
+        }
+        heaviest.append((len(data), entry))
+        if len(heaviest) > top * 4:
+            heaviest.sort(key=lambda t: t[0], reverse=True)
+            del heaviest[top:]
+
+    heaviest.sort(key=lambda t: t[0], reverse=True)
+
+    zooms: Dict[int, Dict[str, Any]] = {}
+    for z in sorted(per_zoom):
+        acc = per_zoom[z]
+        sizes = sorted(acc["bytes"])
+        ms = sorted(acc["ms"])
+        raw_total = sum(acc["raw"])
+        zooms[z] = {
+            "tiles": len(sizes),
+            "total_bytes": int(sum(sizes)),
+            "mean_bytes": sum(sizes) / len(sizes),
+            "p95_bytes": _pct(sizes, 0.95),
+            "max_bytes": int(sizes[-1]),
+            "mean_features": sum(acc["features"]) / len(sizes),
+            "max_features": int(max(acc["features"])),
+            "mean_vertices": sum(acc["vertices"]) / len(sizes),
+            "max_vertices": int(max(acc["vertices"])),
+            "attr_share": sum(acc["attr"]) / raw_total if raw_total else 0.0,
+            "p95_decode_ms": _pct(ms, 0.95),
+        }
+
+    totals = {
+        "tiles": sum(v["tiles"] for v in zooms.values()),
+        "total_bytes": sum(v["total_bytes"] for v in zooms.values()),
+    }
+    return {
+        "mbtiles": str(mbtiles),
+        "zooms": zooms,
+        "heaviest": [e for _, e in heaviest[:top]],
+        "totals": totals,
+    }
+
+
+def print_stats(stats: Dict[str, Any], log=print):
+    log(f"Tileset: {stats['mbtiles']}")
+    log(
+        f"{'z':>3} {'tiles':>7} {'total KB':>10} {'mean KB':>8} {'p95 KB':>8} {'max KB':>8} "
+        f"{'feat/t':>7} {'maxfeat':>7} {'vert/t':>8} {'maxvert':>8} {'attr%':>6} {'p95 ms':>7}"
+    )
+    for z, s in stats["zooms"].items():
+        log(
+            f"{z:>3} {s['tiles']:>7} {s['total_bytes'] / 1024:>10.1f} "
+            f"{s['mean_bytes'] / 1024:>8.2f} {s['p95_bytes'] / 1024:>8.2f} "
+            f"{s['max_bytes'] / 1024:>8.2f} {s['mean_features']:>7.1f} {s['max_features']:>7} "
+            f"{s['mean_vertices']:>8.0f} {s['max_vertices']:>8} "
+            f"{s['attr_share'] * 100:>5.1f}% {s['p95_decode_ms']:>7.2f}"
+        )
+    t = stats["totals"]
+    log(f"all {t['tiles']:>7} {t['total_bytes'] / 1024:>10.1f}")
+
+    if stats["heaviest"]:
+        log("Heaviest tiles:")
+        for e in stats["heaviest"]:
+            dom = ", ".join(
+                f"{d['feature_id']} ({d['share'] * 100:.0f}%)" for d in e["dominant"]
+            )
+            log(
+                f"  {e['z']}/{e['x']}/{e['y']}  {e['bytes'] / 1024:.1f} KB  "
+                f"{e['features']} feat  {e['vertices']} vert  — {dom}"
+            )
+
+
+def compare_stats(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    max_size_regress_pct: float,
+    max_latency_regress_pct: float,
+    log=print,
+) -> List[str]:
+    """Log a per-zoom delta table; return the list of budget violations."""
+
+    def delta(a: float, b: float) -> float:
+        return (a - b) / b * 100.0 if b else (0.0 if not a else float("inf"))
+
+    failures: List[str] = []
+    log(f"Compare {current['mbtiles']} against {baseline['mbtiles']}")
+    log(f"{'z':>3} {'total Δ%':>9} {'p95 Δ%':>8} {'max Δ%':>8} {'p95 ms Δ%':>10}")
+    zooms = sorted(set(current["zooms"]) | set(baseline["zooms"]))
+    for z in zooms:
+        c = current["zooms"].get(z)
+        b = baseline["zooms"].get(z)
+        if c is None or b is None:
+            log(f"{z:>3} {'only in ' + ('baseline' if c is None else 'current'):>30}")
+            continue
+        d_total = delta(c["total_bytes"], b["total_bytes"])
+        d_p95 = delta(c["p95_bytes"], b["p95_bytes"])
+        d_max = delta(c["max_bytes"], b["max_bytes"])
+        d_ms = delta(c["p95_decode_ms"], b["p95_decode_ms"])
+        log(f"{z:>3} {d_total:>+9.1f} {d_p95:>+8.1f} {d_max:>+8.1f} {d_ms:>+10.1f}")
+        if d_total > max_size_regress_pct or d_p95 > max_size_regress_pct:
+            failures.append(
+                f"z{z}: size grew (total {d_total:+.1f}%, p95 {d_p95:+.1f}%) "
+                f"> {max_size_regress_pct}%"
+            )
+        slower_ms = c["p95_decode_ms"] - b["p95_decode_ms"]
+        if d_ms > max_latency_regress_pct and slower_ms > LATENCY_NOISE_MS:
+            failures.append(
+                f"z{z}: p95 decode latency grew {d_ms:+.1f}% > {max_latency_regress_pct}%"
+            )
+
+    d_all = delta(current["totals"]["total_bytes"], baseline["totals"]["total_bytes"])
+    log(f"all {d_all:>+9.1f}")
+    if d_all > max_size_regress_pct:
+        failures.append(f"tileset grew {d_all:+.1f}% > {max_size_regress_pct}%")
+    return failures
+
+
+def check_budgets(
+    stats: Dict[str, Any],
+    max_tile_kb: Optional[float] = None,
+    p95_tile_kb: Optional[float] = None,
+    p95_decode_ms: Optional[float] = None,
+) -> List[str]:
+    """Absolute budgets, independent of any baseline."""
+    failures: List[str] = []
+    for z, s in stats["zooms"].items():
+        if max_tile_kb is not None and s["max_bytes"] / 1024 > max_tile_kb:
+            failures.append(f"z{z}: max tile {s['max_bytes'] / 1024:.1f} KB > {max_tile_kb} KB")
+        if p95_tile_kb is not None and s["p95_bytes"] / 1024 > p95_tile_kb:
+            failures.append(f"z{z}: p95 tile {s['p95_bytes'] / 1024:.1f} KB > {p95_tile_kb} KB")
+        if p95_decode_ms is not None and s["p95_decode_ms"] > p95_decode_ms:
+            failures.append(
+                f"z{z}: p95 decode {s['p95_decode_ms']:.2f} ms > {p95_decode_ms} ms"
+            )
+    return failures
+
+
+def write_json(stats: Dict[str, Any], path: Path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+
+
+def load_stats(path: Path, top: int = 10) -> Dict[str, Any]:
+    """Stats for an .mbtiles, or a previously written stats .json (baseline)."""
+    if path.suffix.lower() == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            stats = json.load(f)
+        stats["zooms"] = {int(z): v for z, v in stats["zooms"].items()}
+        return stats
+    return tileset_stats(path, top=top)
@@ -0,0 +1,417 @@
+"""
+asyncio tile server used by `serve_tiles.py --async`.
+
+One event loop instead of one OS thread per connection:
+- files (exploded .pbf trees, .pmtiles/.mbtiles archives, view.html) go out
+  with loop.sendfile → os.sendfile, no copy through Python buffers
+- HTTP/1.1 keep-alive, GET and HEAD, single-range `Range: bytes=a-b`
+  requests (206/416) as needed by PMTiles clients
+- --mbtiles tiles are read through MBTilesSource in the default executor
+  (SQLite blobs cannot be sendfile'd); cache hits are answered on the loop
+  without touching the executor. Exploded .pbf files are sendfile'd and
+  left to the OS page cache.
+- /filtered/{z}/{x}/{y}.pbf (filtered_tiles.py) is built in the executor
+- every request is timed into /metrics and the optional access log
+
+Only the small subset of HTTP the tile viewers need is implemented.
+"""
+
+from __future__ import annotations
+import asyncio
+import email.utils
+import json
+import mimetypes
+import os
+import re
+import time
+import traceback
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from filtered_tiles import FilteredTiles, TileFilter
+from tile_cache import TileCache, mbtiles_key
+from tile_metrics import AccessLog, Metrics
+from tile_sources import GZIP_MAGIC, MBTilesSource
+
+TILE_RE = re.compile(r"^/(\d+)/(\d+)/(\d+)\.pbf$")
+FILTERED_RE = re.compile(r"^/filtered/(\d+)/(\d+)/(\d+)\.pbf$")
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+KEEPALIVE_TIMEOUT = 15.0
+MAX_HEADER_LINES = 100
+MAX_DISCARD_BODY = 64 * 1024
+
+REASONS = {
+    200: "OK",
+    206: "Partial Content",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    416: "Range Not Satisfiable",
+    500: "Internal Server Error",
+}
+
+CONTENT_TYPES = {
+    ".pbf": "application/x-protobuf",
+    ".pmtiles": "application/octet-stream",
+    ".mbtiles": "application/octet-stream",
+    ".geojson": "application/geo+json",
+}
+
+
+def content_type(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    return CONTENT_TYPES.get(ext) or mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def file_etag(st: os.stat_result) -> str:
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [t.strip() for t in header.split(",")]
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    (start, end_inclusive) for a single satisfiable byte range, None when
+    there is no usable Range header. Raises ValueError if unsatisfiable.
+    Multi-range requests are ignored (full 200 response).
+    """
+    if not header:
+        return None
+    m = RANGE_RE.match(header.strip())
+    if not m:
+        return None
+    first, last = m.groups()
+    if first == "" and last == "":
+        return None
+    if first == "":  # suffix range: last N bytes
+        n = int(last)
+        if n == 0 or size == 0:
+            raise ValueError("unsatisfiable suffix range")
+        return max(0, size - n), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("unsatisfiable range")
+    return start, min(end, size - 1)
+
+
+class TileServer:
+    def __init__(
+        self,
+        root: str,
+        mbtiles: Optional[MBTilesSource] = None,
+        cache: Optional[TileCache] = None,
+        filtered: Optional[FilteredTiles] = None,
+        metrics: Optional[Metrics] = None,
+        access_log: Optional[AccessLog] = None,
+    ):
+        self.root = os.path.realpath(root)
+        self.mbtiles = mbtiles
+        self.cache = cache
+        self.filtered = filtered
+        self.metrics = metrics or Metrics()
+        self.access_log = access_log
+
+    async def get_mbtiles_tile(self, req: Dict, z: int, x: int, y: int):
+        key = mbtiles_key(z, x, y)
+        tile = None
+        if self.cache is not None:
+            tile = self.cache.get(key)
+            req["cache_hit"] = tile is not None
+        if tile is None:
+            loop = asyncio.get_running_loop()
+            tile = await loop.run_in_executor(None, self.mbtiles.get, z, x, y)
+            if tile is not None and self.cache is not None:
+                self.cache.put(key, tile)
+        return tile
+
+    async def send_body(
+        self, writer, req: Dict, body: bytes, ctype: str, keep_alive: bool
+    ):
+        head = [("Content-Type", ctype), ("Content-Length", str(len(body)))]
+        await self.write_head(writer, req, 200, head, keep_alive)
+        if req["method"] != "HEAD":
+            writer.write(body)
+            await writer.drain()
+
+    def resolve(self, path: str) -> Optional[str]:
+        """Filesystem path under root, refusing anything that escapes it."""
+        full = os.path.realpath(os.path.join(self.root, path.lstrip("/")))
+        if full != self.root and not full.startswith(self.root + os.sep):
+            return None
+        if os.path.isdir(full):
+            full = os.path.join(full, "index.html")
+        return full if os.path.isfile(full) else None
+
+    async def write_head(
+        self,
+        writer: asyncio.StreamWriter,
+        req: Optional[Dict],
+        status: int,
+        headers: List[Tuple[str, str]],
+        keep_alive: bool,
+    ):
+        if req is not None:
+            # what /metrics and the access log report for this request
+            req["status"] = status
+            if status != 304 and req["method"] != "HEAD":
+                req["bytes"] = next(
+                    (int(v) for k, v in headers if k == "Content-Length"), 0
+                )
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+        lines.append(f"Date: {email.utils.formatdate(usegmt=True)}")
+        lines.append("Access-Control-Allow-Origin: *")
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        lines += [f"{k}: {v}" for k, v in headers]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+    async def send_error(
+        self, writer, req: Optional[Dict], status: int, keep_alive: bool, head: bool = False
+    ):
+        body = f"{status} {REASONS.get(status, '')}\n".encode()
+        await self.write_head(
+            writer,
+            req,
+            status,
+            [("Content-Type", "text/plain"), ("Content-Length", str(len(body)))],
+            keep_alive,
+        )
+        if not head:
+            writer.write(body)
+            await writer.drain()
+
+    async def send_tile_bytes(self, writer, req: Dict, tile, keep_alive: bool):
+        head = req["method"] == "HEAD"
+        if tile is None:
+            await self.send_error(writer, req, 404, keep_alive, head)
+            return
+        if etag_matches(req["headers"].get("if-none-match"), tile.etag):
+            not_modified = [("ETag", tile.etag), ("Cache-Control", "no-cache")]
+            await self.write_head(writer, req, 304, not_modified, keep_alive)
+            return
+        headers = [
+            ("Content-Type", "application/x-protobuf"),
+            ("Content-Length", str(len(tile.data))),
+            ("ETag", tile.etag),
+            ("Cache-Control", "no-cache"),
+        ]
+        if tile.gzipped:
+            headers.append(("Content-Encoding", "gzip"))
+        await self.write_head(writer, req, 200, headers, keep_alive)
+        if not head:
+            writer.write(tile.data)
+            await writer.drain()
+
+    async def send_file(self, writer, req: Dict, full: str, keep_alive: bool):
+        head = req["method"] == "HEAD"
+        loop = asyncio.get_running_loop()
+        with open(full, "rb") as f:
+            st = os.fstat(f.fileno())
+            size = st.st_size
+            etag = file_etag(st)
+            if etag_matches(req["headers"].get("if-none-match"), etag):
+                not_modified = [("ETag", etag), ("Cache-Control", "no-cache")]
+                await self.write_head(writer, req, 304, not_modified, keep_alive)
+                return
+
+            headers = [
+                ("Content-Type", content_type(full)),
+                ("ETag", etag),
+                ("Accept-Ranges", "bytes"),
+                ("Cache-Control", "no-cache"),
+            ]
+            # exploded .pbf tiles are stored gzipped
+            if full.endswith(".pbf") and f.read(2) == GZIP_MAGIC:
+                headers.append(("Content-Encoding", "gzip"))
+
+            status, offset, count = 200, 0, size
+            if_range = req["headers"].get("if-range")
+            try:
+                rng = parse_range(req["headers"].get("range"), size)
+            except ValueError:
+                await self.write_head(
+                    writer,
+                    req,
+                    416,
+                    [("Content-Range", f"bytes */{size}"), ("Content-Length", "0")],
+                    keep_alive,
+                )
+                return
+            if rng and (not if_range or if_range.strip() == etag):
+                status, offset, count = 206, rng[0], rng[1] - rng[0] + 1
+                headers.append(("Content-Range", f"bytes {rng[0]}-{rng[1]}/{size}"))
+            headers.append(("Content-Length", str(count)))
+
+            await self.write_head(writer, req, status, headers, keep_alive)
+            if not head and count:
+                await loop.sendfile(writer.transport, f, offset, count)
+
+    async def read_request(self, reader: asyncio.StreamReader) -> Optional[Dict]:
+        line = await asyncio.wait_for(reader.readline(), timeout=KEEPALIVE_TIMEOUT)
+        if not line:
+            return None
+        parts = line.decode("latin-1").strip().split()
+        if len(parts) != 3:
+            raise ValueError("bad request line")
+        headers: Dict[str, str] = {}
+        for _ in range(MAX_HEADER_LINES):
+            h = await reader.readline()
+            if h in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = h.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+        # no handler takes a body, but one left on the socket would be parsed
+        # as the next request: drain small ones, otherwise close after replying
+        drop = "transfer-encoding" in headers
+        n = int(headers.get("content-length") or 0)
+        if n < 0:
+            raise ValueError("bad Content-Length")
+        if n > MAX_DISCARD_BODY:
+            drop = True
+        elif n and not drop:
+            await asyncio.wait_for(reader.readexactly(n), timeout=KEEPALIVE_TIMEOUT)
+        return {
+            "method": parts[0],
+            "target": parts[1],
+            "version": parts[2],
+            "headers": headers,
+            "close": drop,
+        }
+
+    def record(self, writer, req: Dict, elapsed_ms: float):
+        path = unquote(urlsplit(req["target"]).path)
+        self.metrics.record(path, req["status"], req["bytes"], elapsed_ms, req["cache_hit"])
+        if self.access_log is not None:
+            peer = writer.get_extra_info("peername") or ("-",)
+            self.access_log.write(
+                peer[0],
+                req["method"],
+                path,
+                req["status"],
+                req["bytes"],
+                elapsed_ms,
+                req["cache_hit"],
+            )
+
+    async def respond(self, writer, req: Dict, keep_alive: bool):
+        loop = asyncio.get_running_loop()
+        head = req["method"] == "HEAD"
+        if req["method"] not in ("GET", "HEAD"):
+            await self.send_error(writer, req, 405, keep_alive)
+            return
+
+        url = urlsplit(req["target"])
+        path = unquote(url.path)
+        m = TILE_RE.match(path)
+        fm = FILTERED_RE.match(path)
+        if self.filtered is not None and fm:
+            try:
+                flt = TileFilter.from_query(url.query)
+            except ValueError:
+                await self.send_error(writer, req, 400, keep_alive, head)
+                return
+            z, x, y = (int(v) for v in fm.groups())
+            tile, req["cache_hit"] = await loop.run_in_executor(
+                None, self.filtered.lookup, z, x, y, flt
+            )
+            await self.send_tile_bytes(writer, req, tile, keep_alive)
+        elif self.mbtiles is not None and m:
+            z, x, y = (int(v) for v in m.groups())
+            tile = await self.get_mbtiles_tile(req, z, x, y)
+            await self.send_tile_bytes(writer, req, tile, keep_alive)
+        elif self.mbtiles is not None and path == "/metadata.json":
+            body = await loop.run_in_executor(None, self.mbtiles.metadata_json)
+            await self.send_body(writer, req, body, "application/json", keep_alive)
+        elif path == "/cache.json":
+            stats = self.cache.stats() if self.cache is not None else {}
+            body = json.dumps(stats).encode()
+            await self.send_body(writer, req, body, "application/json", keep_alive)
+        elif path == "/metrics":
+            stats = self.cache.stats() if self.cache is not None else None
+            body, ctype = self.metrics.render(url.query, stats)
+            await self.send_body(writer, req, body, ctype, keep_alive)
+        else:
+            full = self.resolve(path)
+            if full is None:
+                await self.send_error(writer, req, 404, keep_alive, head)
+            else:
+                await self.send_file(writer, req, full, keep_alive)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    req = await self.read_request(reader)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except ValueError:
+                    await self.send_error(writer, None, 400, keep_alive=False)
+                    break
+                if req is None:
+                    break
+
+                conn = req["headers"].get("connection", "").lower()
+                keep_alive = not req["close"] and (
+                    conn != "close" if req["version"] == "HTTP/1.1" else conn == "keep-alive"
+                )
+                req.update(status=0, bytes=0, cache_hit=None)
+                t0 = time.perf_counter()
+                try:
+                    await self.respond(writer, req, keep_alive)
+                except (ConnectionError, asyncio.CancelledError):
+                    raise
+                except Exception:
+                    traceback.print_exc()
+                    keep_alive = False
+                    if req["status"] == 0:
+                        await self.send_error(writer, req, 500, keep_alive=False)
+                finally:
+                    self.record(writer, req, (time.perf_counter() - t0) * 1000.0)
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+
+async def serve(
+    root: str,
+    port: int,
+    mbtiles: Optional[MBTilesSource] = None,
+    cache: Optional[TileCache] = None,
+    filtered: Optional[FilteredTiles] = None,
+    metrics: Optional[Metrics] = None,
+    access_log: Optional[AccessLog] = None,
+):
+    app = TileServer(root, mbtiles, cache, filtered, metrics, access_log)
+    server = await asyncio.start_server(app.handle, "0.0.0.0", port, backlog=1024)
+    print(f"Serving (asyncio) on http://localhost:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def run(
+    root: str,
+    port: int,
+    mbtiles: Optional[MBTilesSource] = None,
+    cache: Optional[TileCache] = None,
+    filtered: Optional[FilteredTiles] = None,
+    metrics: Optional[Metrics] = None,
+    access_log: Optional[AccessLog] = None,
+):
+    try:
+        asyncio.run(serve(root, port, mbtiles, cache, filtered, metrics, access_log))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,206 @@
+"""
+Server-side filtered vector tiles for the local tile server.
+
+GET /filtered/{z}/{x}/{y}.pbf?tiers=Tier_1,Tier_2&date_min=20190101&date_max=20201231&rp=100,500
+
+returns the tile re-encoded with only the matching features, so the browser
+downloads just what the current filters show instead of filtering full
+tiles in VectorGridProtobuf.matches(). Semantics follow the Interactive Map
+filters:
+- tiers: comma list; empty or missing means every tier
+- non-Tier_4 features: event_ts (YYYYMMDD) within [date_min, date_max];
+  features without a date are kept, as in the browser filter
+- Tier_4 features: return_period in rp when rp is given (an empty rp
+  matches none, missing rp means no filter)
+
+Per tile, the decoded protobuf and a (tier, event_ts, return_period) row
+per feature are kept in an LRU index bounded by INDEX_MAX_BYTES, so each
+new filter combination only costs a scan and a re-encode; re-encoded tiles
+are stored in the shared TileCache. return_period is read from the tile
+when present, otherwise from the catalog JSON given with --filter-catalog
+(feature_id → return_period).
+"""
+
+from __future__ import annotations
+import gzip
+import json
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs
+
+from tile_cache import ENTRY_OVERHEAD, TileCache
+from tile_sources import Tile, make_etag
+
+# mvt.py lives in fim_viz/, one level up
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import mvt  # noqa: E402
+
+RP_TIER = "Tier_4"
+INDEX_MAX_BYTES = 64 * 1024 * 1024
+
+FeatureRow = Tuple[str, Optional[int], Optional[float]]  # tier, event_ts, return_period
+
+
+class TileFilter(NamedTuple):
+    tiers: FrozenSet[str]
+    date_min: int
+    date_max: int
+    rps: Optional[FrozenSet[float]]
+
+    @classmethod
+    def from_query(cls, query: str) -> "TileFilter":
+        q = parse_qs(query, keep_blank_values=True)
+
+        def one(name: str, default: str) -> str:
+            return (q.get(name) or [default])[0]
+
+        def csv(value: str) -> List[str]:
+            return [v for v in (s.strip() for s in value.split(",")) if v]
+
+        rps = None
+        if "rp" in q:
+            rps = frozenset(float(v) for v in csv(one("rp", "")))
+        return cls(
+            tiers=frozenset(csv(one("tiers", ""))),
+            date_min=int(one("date_min", "0") or 0),
+            date_max=int(one("date_max", "99999999") or 99999999),
+            rps=rps,
+        )
+
+    def matches(self, row: FeatureRow) -> bool:
+        tier, ets, rp = row
+        if self.tiers and tier not in self.tiers:
+            return False
+        if tier == RP_TIER:
+            if self.rps is None:
+                return True
+            return rp is not None and rp in self.rps
+        return ets is None or self.date_min <= ets <= self.date_max
+
+
+class IndexedTile(NamedTuple):
+    tile: Tile
+    buf: bytes
+    rows: Dict[int, List[FeatureRow]]  # layer index → one row per feature
+
+    @property
+    def cost(self) -> int:
+        return len(self.tile.data) + len(self.buf) + 100 * sum(map(len, self.rows.values()))
+
+
+def _as_int(v: Any) -> Optional[int]:
+    try:
+        return int(v) if v is not None and v != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_float(v: Any) -> Optional[float]:
+    try:
+        return float(v) if v is not None and v != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _index_cost(entry: Optional[IndexedTile]) -> int:
+    # misses (None) are cached too: charge the slot so requests for random
+    # nonexistent tiles cannot grow the index without bound
+    return ENTRY_OVERHEAD + (entry.cost if entry is not None else 0)
+
+
+def load_return_periods(catalog_json: str) -> Dict[str, float]:
+    """feature_id → return_period from a catalog_core.json."""
+    with open(catalog_json, "r", encoding="utf-8") as f:
+        core = json.load(f)
+    out: Dict[str, float] = {}
+    for r in core.get("records", []):
+        rp = _as_float(r.get("return_period"))
+        fid = r.get("feature_id") or r.get("id")
+        if rp is not None and fid is not None:
+            out[str(fid)] = rp
+    return out
+
+
+class FilteredTiles:
+    """`source` is anything with get(z, x, y) -> Optional[Tile]."""
+
+    def __init__(
+        self,
+        source,
+        cache: Optional[TileCache] = None,
+        return_periods: Optional[Dict[str, float]] = None,
+        index_max_bytes: int = INDEX_MAX_BYTES,
+    ):
+        self.source = source
+        self.cache = cache
+        self.return_periods = return_periods or {}
+        self.index_max_bytes = index_max_bytes
+        self.index_bytes = 0
+        self._index: "OrderedDict[Tuple[int, int, int], Optional[IndexedTile]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _build_index(self, z: int, x: int, y: int) -> Optional[IndexedTile]:
+        tile = self.source.get(z, x, y)
+        if tile is None:
+            return None
+        buf, layers = mvt.read_tile(tile.data)
+        rows: Dict[int, List[FeatureRow]] = {}
+        for li, layer in enumerate(layers):
+            layer_rows: List[FeatureRow] = []
+            for f in layer.features:
+                p = layer.properties(f)
+                rp = _as_float(p.get("return_period"))
+                if rp is None:
+                    rp = self.return_periods.get(str(p.get("feature_id")))
+                layer_rows.append((str(p.get("tier") or ""), _as_int(p.get("event_ts")), rp))
+            rows[li] = layer_rows
+        return IndexedTile(tile, buf, rows)
+
+    def index(self, z: int, x: int, y: int) -> Optional[IndexedTile]:
+        key = (z, x, y)
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+                return self._index[key]
+        entry = self._build_index(z, x, y)
+        with self._lock:
+            if key not in self._index:
+                self._index[key] = entry
+                self.index_bytes += _index_cost(entry)
+            while self.index_bytes > self.index_max_bytes and len(self._index) > 1:
+                _, old = self._index.popitem(last=False)
+                self.index_bytes -= _index_cost(old)
+        return entry
+
+    def _filter(self, z: int, x: int, y: int, flt: TileFilter) -> Optional[Tile]:
+        entry = self.index(z, x, y)
+        if entry is None:
+            return None
+        keep: Dict[int, List[int]] = {}
+        dropped = False
+        for li, rows in entry.rows.items():
+            kept = [i for i, row in enumerate(rows) if flt.matches(row)]
+            dropped = dropped or len(kept) < len(rows)
+            keep[li] = kept
+        if not dropped:
+            return entry.tile  # same bytes and ETag as the unfiltered tile
+        data = mvt.subset_tile(entry.buf, keep)
+        if data and entry.tile.gzipped:
+            data = gzip.compress(data, compresslevel=6, mtime=0)
+        return Tile(data, make_etag(data))
+
+    def lookup(
+        self, z: int, x: int, y: int, flt: TileFilter
+    ) -> Tuple[Optional[Tile], Optional[bool]]:
+        """(tile, cache_hit); cache_hit is None without a cache."""
+        if self.cache is None:
+            return self._filter(z, x, y, flt), None
+        return self.cache.lookup(
+            ("filtered", z, x, y, flt), lambda: self._filter(z, x, y, flt)
+        )
+
+    def get(self, z: int, x: int, y: int, flt: TileFilter) -> Optional[Tile]:
+        return self.lookup(z, x, y, flt)[0]
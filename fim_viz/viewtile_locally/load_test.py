@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Load test for the local tile server (threaded or --async).
+
+N concurrent keep-alive clients request tiles for a fixed duration and the
+script reports requests/s, throughput and p50/p90/p99 latency. Stdlib only.
+
+Tile paths come from an .mbtiles file (--mbtiles, served at /{z}/{x}/{y}.pbf)
+or an exploded tile directory (--tiles-dir, served at --prefix/{z}/{x}/{y}.pbf).
+
+USAGE:
+python serve_tiles.py --async --mbtiles ../out_tiles/fim_extents.mbtiles &
+python load_test.py --mbtiles ../out_tiles/fim_extents.mbtiles -c 300 -d 15
+python load_test.py --tiles-dir ../out_tiles/tiles --prefix /out_tiles/tiles -c 300
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import math
+import random
+import sqlite3
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+def tile_paths_from_mbtiles(path: str, limit: int) -> List[str]:
+    con = sqlite3.connect(f"file:{Path(path).resolve()}?mode=ro", uri=True)
+    try:
+        rows = con.execute(
+            "SELECT zoom_level, tile_column, tile_row FROM tiles LIMIT ?", (limit,)
+        ).fetchall()
+    finally:
+        con.close()
+    return [f"/{z}/{x}/{(1 << z) - 1 - y}.pbf" for z, x, y in rows]
+
+
+def tile_paths_from_dir(root: str, prefix: str, limit: int) -> List[str]:
+    base = Path(root)
+    out: List[str] = []
+    for p in base.rglob("*.pbf"):
+        out.append(prefix.rstrip("/") + "/" + p.relative_to(base).as_posix())
+        if len(out) >= limit:
+            break
+    return out
+
+
+def percentile(sorted_vals: List[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = max(0, math.ceil(q * len(sorted_vals)) - 1)
+    return sorted_vals[k]
+
+
+async def read_response(reader: asyncio.StreamReader) -> Tuple[int, int, bool]:
+    """(status, body bytes, keep_alive) — bodies must carry Content-Length."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("server closed connection")
+    status = int(status_line.split()[1])
+    length, keep_alive = 0, True
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        k, _, v = line.decode("latin-1").partition(":")
+        k = k.strip().lower()
+        if k == "content-length":
+            length = int(v.strip())
+        elif k == "connection" and v.strip().lower() == "close":
+            keep_alive = False
+    if length:
+        await reader.readexactly(length)
+    return status, length, keep_alive
+
+
+async def client(
+    host: str,
+    port: int,
+    paths: List[str],
+    deadline: float,
+    latencies: List[float],
+    statuses: Counter,
+    totals: List[int],
+    seed: int,
+):
+    rnd = random.Random(seed)
+    reader: Optional[asyncio.StreamReader] = None
+    writer: Optional[asyncio.StreamWriter] = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+                totals[1] += 1
+            path = rnd.choice(paths)
+            req = (
+                f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+                "Accept-Encoding: gzip\r\nConnection: keep-alive\r\n\r\n"
+            )
+            t0 = time.perf_counter()
+            writer.write(req.encode("latin-1"))
+            status, nbytes, keep_alive = await read_response(reader)
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+            statuses[status] += 1
+            totals[0] += nbytes
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (ConnectionError, asyncio.IncompleteReadError, OSError, ValueError):
+            statuses["error"] += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+async def run(url: str, paths: List[str], concurrency: int, duration: float):
+    u = urlsplit(url)
+    host, port = u.hostname or "localhost", u.port or 80
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    totals = [0, 0]  # body bytes, connections opened
+    t0 = time.perf_counter()
+    deadline = t0 + duration
+    await asyncio.gather(
+        *(
+            client(host, port, paths, deadline, latencies, statuses, totals, seed=i)
+            for i in range(concurrency)
+        )
+    )
+    elapsed = time.perf_counter() - t0
+    return latencies, statuses, totals, elapsed
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Load test the local FIM tile server.")
+    p.add_argument("--url", default="http://localhost:8000", help="Server base URL")
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--mbtiles", help="Take tile paths from this .mbtiles file")
+    src.add_argument("--tiles-dir", help="Take tile paths from an exploded tile directory")
+    p.add_argument(
+        "--prefix",
+        default="/out_tiles/tiles",
+        help="URL prefix of --tiles-dir on the server (default: /out_tiles/tiles)",
+    )
+    p.add_argument("-c", "--concurrency", type=int, default=200)
+    p.add_argument("-d", "--duration", type=float, default=10.0, help="Seconds")
+    p.add_argument("--max-paths", type=int, default=5000, help="Tile paths to sample from")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.mbtiles:
+        paths = tile_paths_from_mbtiles(args.mbtiles, args.max_paths)
+    else:
+        paths = tile_paths_from_dir(args.tiles_dir, args.prefix, args.max_paths)
+    if not paths:
+        print("No tiles found.", file=sys.stderr)
+        sys.exit(2)
+
+    print(
+        f"{args.concurrency} clients, {args.duration:.0f}s, {len(paths)} distinct tiles "
+        f"→ {args.url}"
+    )
+    latencies, statuses, totals, elapsed = asyncio.run(
+        run(args.url, paths, args.concurrency, args.duration)
+    )
+    latencies.sort()
+    n = len(latencies)
+    print(f"requests     {n}  ({n / elapsed:.0f} req/s)")
+    print(f"throughput   {totals[0] / elapsed / 1e6:.1f} MB/s")
+    print(f"connections  {totals[1]}")
+    print(
+        f"latency ms   p50 {percentile(latencies, 0.50):.2f}  "
+        f"p90 {percentile(latencies, 0.90):.2f}  "
+        f"p99 {percentile(latencies, 0.99):.2f}  "
+        f"max {latencies[-1] if latencies else 0.0:.2f}"
+    )
+    print("status       " + "  ".join(f"{k}: {v}" for k, v in sorted(statuses.items(), key=str)))
+    if statuses.get("error") or not n:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
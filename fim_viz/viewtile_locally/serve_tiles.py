@@ -1,16 +1,77 @@
 #!/usr/bin/env python3
+"""
+Local tile server for previewing FIM vector tiles.
+
+Serves the fim_viz folder (view.html, exploded out_tiles/tiles/{z}/{x}/{y}.pbf)
+and, with --mbtiles, tiles straight from a .mbtiles file at /{z}/{x}/{y}.pbf
+(plus /metadata.json) — no mb-util step needed.
+
+Tiles carry strong ETags; If-None-Match revalidation answers 304. Connections
+are HTTP/1.1 keep-alive.
+
+--async switches to the asyncio server in aio_serve.py: one event loop for
+hundreds of keep-alive clients, zero-copy sendfile for files and HTTP Range
+support (PMTiles archives). Measure either mode with load_test.py.
+
+Tiles are kept in an in-memory LRU cache (--cache-mb, 0 disables) so panning
+over the same tiles does not re-read them; --warm-zooms N preloads zooms
+0..N at startup. Hit/miss/eviction counters are at /cache.json. The --async
+server sendfiles exploded .pbf files instead (OS page cache), so there the
+cache only holds --mbtiles and /filtered tiles.
+
+/filtered/{z}/{x}/{y}.pbf?tiers=&date_min=&date_max=&rp= serves the same
+tiles re-encoded with only the features matching the map filters (see
+filtered_tiles.py); set FIM_FILTERED_TILES_URL for the Streamlit page to use it.
+
+/metrics (JSON, or ?format=prom) reports per-zoom request counts, latency
+histograms, bytes, cache hit ratio, 304 ratio and 404s, plus the hottest and
+largest tiles. --access-log FILE writes one JSON line per request.
+
+USAGE:
+python serve_tiles.py                                  # directory mode
+python serve_tiles.py --mbtiles ../out_tiles/fim_extents.mbtiles
+python serve_tiles.py --async                          # asyncio + sendfile + Range
+python serve_tiles.py --mbtiles fim.mbtiles --cache-mb 512 --warm-zooms 8
+python serve_tiles.py --async --access-log access.jsonl   # then GET /metrics
+  then open http://localhost:8000/viewtile_locally/view.html?tiles=/{z}/{x}/{y}.pbf&meta=/metadata.json
+"""
 from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
 import os
-import mimetypes
 import pathlib
+import re
+import time
+from urllib.parse import urlsplit
+
+from filtered_tiles import FilteredTiles, TileFilter, load_return_periods
+from tile_cache import TileCache, mbtiles_key, warm_directory, warm_mbtiles
+from tile_metrics import AccessLog, Metrics
+from tile_sources import DirectorySource, MBTilesSource
 
 ROOT = str(pathlib.Path(__file__).resolve().parents[1])
 
+TILE_RE = re.compile(r"^/(\d+)/(\d+)/(\d+)\.pbf$")
+FILTERED_RE = re.compile(r"^/filtered/(\d+)/(\d+)/(\d+)\.pbf$")
+
 
 class GzipPbfHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive; every response sets Content-Length
+    # headers and body are separate writes; without TCP_NODELAY a keep-alive
+    # client waits out the delayed-ACK timer (~40 ms) on every tile
+    disable_nagle_algorithm = True
+
+    # set by main()
+    directory_source: DirectorySource = None
+    mbtiles_source: MBTilesSource = None
+    tile_cache: TileCache = None
+    filtered_tiles: FilteredTiles = None
+    metrics: Metrics = None
+    access_log: AccessLog = None
+
     def translate_path(self, path):
         # Serve from this folder (fim_viz)
-        full = os.path.join(ROOT, path.lstrip("/"))
+        full = os.path.join(ROOT, urlsplit(path).path.lstrip("/"))
         return full
 
     def end_headers(self):
@@ -24,28 +85,229 @@ class GzipPbfHandler(SimpleHTTPRequestHandler):
             return "application/x-protobuf"
         return super().guess_type(path)
 
-    def do_GET(self):
-        # Let the parent build headers, then add gzip for .pbf
-        supercls = super(GzipPbfHandler, self)
-        path = self.translate_path(self.path)
-        if path.endswith(".pbf") and os.path.exists(path):
-            # Make sure browser treats it as gzip (mb-util exports gzipped PBFs)
-            self.send_response(200)
-            self.send_header("Content-Type", "application/x-protobuf")
-            self.send_header("Content-Encoding", "gzip")
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def send_header(self, keyword, value):
+        if keyword.lower() == "content-length":
+            self._length = int(value)
+        super().send_header(keyword, value)
+
+    def log_request(self, code="-", size="-"):
+        if self.access_log is None:
+            super().log_request(code, size)
+
+    def cached(self, key, load):
+        if key is None:
+            return None
+        if self.tile_cache is None:
+            return load()
+        tile, self._cache_hit = self.tile_cache.lookup(key, load)
+        return tile
+
+    def lookup_tile(self, path: str):
+        """(handled, tile) — handled is False for non-tile paths."""
+        m = TILE_RE.match(path)
+        if self.mbtiles_source is not None and m:
+            z, x, y = (int(v) for v in m.groups())
+            return True, self.cached(
+                mbtiles_key(z, x, y), lambda: self.mbtiles_source.get(z, x, y)
+            )
+        if path.endswith(".pbf"):
+            full = self.translate_path(path)
+            return True, self.cached(
+                self.directory_source.cache_key(full),
+                lambda: self.directory_source.get_file(full),
+            )
+        return False, None
+
+    def send_tile(self, tile, head: bool):
+        if tile is None:
+            self.send_error(404, "Tile not found")
+            return
+        inm = self.headers.get("If-None-Match")
+        if inm and (inm.strip() == "*" or tile.etag in [t.strip() for t in inm.split(",")]):
+            self.send_response(304)
+            self.send_header("ETag", tile.etag)
             self.send_header("Cache-Control", "no-cache")
             self.end_headers()
-            with open(path, "rb") as f:
-                self.wfile.write(f.read())
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-protobuf")
+        # mb-util exports / tippecanoe stores gzipped PBFs
+        if tile.gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(tile.data)))
+        self.send_header("ETag", tile.etag)
+        # revalidate every time; unchanged tiles cost a 304
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if not head:
+            self.wfile.write(tile.data)
+
+    def send_bytes(self, body: bytes, content_type: str, head: bool):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def handle_request(self, head: bool):
+        self._status, self._length, self._cache_hit = 0, 0, None
+        t0 = time.perf_counter()
+        try:
+            self.dispatch(head)
+        finally:
+            elapsed_ms = (time.perf_counter() - t0) * 1000.0
+            path = urlsplit(self.path).path
+            nbytes = 0 if head or self._status == 304 else self._length
+            self.metrics.record(path, self._status, nbytes, elapsed_ms, self._cache_hit)
+            if self.access_log is not None:
+                self.access_log.write(
+                    self.client_address[0],
+                    self.command,
+                    path,
+                    self._status,
+                    nbytes,
+                    elapsed_ms,
+                    self._cache_hit,
+                )
+
+    def dispatch(self, head: bool):
+        url = urlsplit(self.path)
+        path = url.path
+        m = FILTERED_RE.match(path)
+        if m:
+            try:
+                flt = TileFilter.from_query(url.query)
+            except ValueError:
+                self.send_error(400, "Bad filter")
+                return
+            z, x, y = (int(v) for v in m.groups())
+            tile, self._cache_hit = self.filtered_tiles.lookup(z, x, y, flt)
+            self.send_tile(tile, head)
+            return
+        if path == "/metrics":
+            stats = self.tile_cache.stats() if self.tile_cache is not None else None
+            self.send_bytes(*self.metrics.render(url.query, stats), head)
+            return
+        if self.mbtiles_source is not None and path == "/metadata.json":
+            self.send_bytes(self.mbtiles_source.metadata_json(), "application/json", head)
+            return
+        if path == "/cache.json":
+            stats = self.tile_cache.stats() if self.tile_cache is not None else {}
+            self.send_bytes(json.dumps(stats).encode("utf-8"), "application/json", head)
+            return
+        handled, tile = self.lookup_tile(path)
+        if handled:
+            self.send_tile(tile, head)
+        elif head:
+            super().do_HEAD()
         else:
             super().do_GET()
 
+    def do_GET(self):
+        self.handle_request(head=False)
+
+    def do_HEAD(self):
+        self.handle_request(head=True)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Serve FIM vector tiles locally.")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument(
+        "--mbtiles",
+        default=None,
+        help="Serve /{z}/{x}/{y}.pbf and /metadata.json from this .mbtiles file",
+    )
+    p.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Use the asyncio server (sendfile, Range requests) instead of threads",
+    )
+    p.add_argument(
+        "--cache-mb",
+        type=float,
+        default=128,
+        help="In-memory tile cache budget in MB (0 disables; default: 128)",
+    )
+    p.add_argument(
+        "--warm-zooms",
+        type=int,
+        default=None,
+        help="Preload zooms 0..N into the cache at startup",
+    )
+    p.add_argument(
+        "--filter-catalog",
+        default=None,
+        help="catalog_core.json giving return_period per feature_id for /filtered/ "
+        "(only needed when the tiles do not carry return_period)",
+    )
+    p.add_argument(
+        "--access-log",
+        default=None,
+        help="Write a JSON line per request to this file ('-' for stdout) "
+        "instead of the default stderr log",
+    )
+    p.add_argument(
+        "--tiles-dir",
+        default="out_tiles/tiles",
+        help="Exploded tile folder to warm in directory mode (relative to fim_viz)",
+    )
+    return p.parse_args()
+
 
 def main():
+    args = parse_args()
     os.chdir(ROOT)
-    port = 8000
-    with ThreadingHTTPServer(("0.0.0.0", port), GzipPbfHandler) as httpd:
-        print(f"Serving on http://localhost:{port}")
+    GzipPbfHandler.directory_source = DirectorySource(ROOT)
+    if args.mbtiles:
+        GzipPbfHandler.mbtiles_source = MBTilesSource(args.mbtiles)
+        print(f"Serving tiles from {args.mbtiles} at /{{z}}/{{x}}/{{y}}.pbf")
+    if args.cache_mb > 0:
+        cache = TileCache(int(args.cache_mb * 1024 * 1024))
+        GzipPbfHandler.tile_cache = cache
+        if args.warm_zooms is not None:
+            if GzipPbfHandler.mbtiles_source is not None:
+                n = warm_mbtiles(cache, GzipPbfHandler.mbtiles_source, args.warm_zooms)
+                print(f"Warmed {n} tiles (z0–{args.warm_zooms}, {cache.bytes / 1e6:.1f} MB)")
+            elif args.use_async:
+                # aio_serve sendfiles exploded tiles and never reads this cache
+                print("--warm-zooms ignored: --async serves tile files from the OS page cache")
+            else:
+                tiles_dir = os.path.join(ROOT, args.tiles_dir)
+                n = warm_directory(
+                    cache, GzipPbfHandler.directory_source, tiles_dir, args.warm_zooms
+                )
+                print(f"Warmed {n} tiles (z0–{args.warm_zooms}, {cache.bytes / 1e6:.1f} MB)")
+    GzipPbfHandler.metrics = Metrics()
+    if args.access_log:
+        GzipPbfHandler.access_log = AccessLog(args.access_log)
+    GzipPbfHandler.filtered_tiles = FilteredTiles(
+        GzipPbfHandler.mbtiles_source or DirectorySource(os.path.join(ROOT, args.tiles_dir)),
+        GzipPbfHandler.tile_cache,
+        load_return_periods(args.filter_catalog) if args.filter_catalog else None,
+    )
+    if args.use_async:
+        import aio_serve
+
+        aio_serve.run(
+            ROOT,
+            args.port,
+            GzipPbfHandler.mbtiles_source,
+            GzipPbfHandler.tile_cache,
+            GzipPbfHandler.filtered_tiles,
+            GzipPbfHandler.metrics,
+            GzipPbfHandler.access_log,
+        )
+        return
+    with ThreadingHTTPServer(("0.0.0.0", args.port), GzipPbfHandler) as httpd:
+        print(f"Serving on http://localhost:{args.port}")
         httpd.serve_forever()
 
 
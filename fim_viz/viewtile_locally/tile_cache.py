@@ -0,0 +1,140 @@
+"""
+In-process LRU cache of tile bytes for the local tile server.
+
+- bounded by a byte budget (tile bytes + a small per-entry overhead),
+  least-recently-used tiles are evicted first
+- thread-safe: the threaded server shares one cache across handler threads
+- hit / miss / eviction counters for /cache.json and /metrics
+- warm_mbtiles / warm_directory preload the low zooms at startup
+
+Cached values are tile_sources.Tile, so hits also skip re-hashing the ETag.
+Misses (404s) are not cached.
+"""
+
+from __future__ import annotations
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from tile_sources import DirectorySource, MBTilesSource, Tile
+
+# rough cost of the key, Tile tuple, etag string and OrderedDict slot
+ENTRY_OVERHEAD = 200
+
+
+class TileCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = int(max_bytes)
+        self._tiles: "OrderedDict[Hashable, Tile]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def cost(tile: Tile) -> int:
+        return len(tile.data) + ENTRY_OVERHEAD
+
+    def get(self, key: Hashable) -> Optional[Tile]:
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is None:
+                self.misses += 1
+                return None
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return tile
+
+    def put(self, key: Hashable, tile: Tile) -> bool:
+        """Insert (or refresh) a tile; False if it alone exceeds the budget."""
+        size = self.cost(tile)
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            old = self._tiles.pop(key, None)
+            if old is not None:
+                self.bytes -= self.cost(old)
+            self._tiles[key] = tile
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._tiles.popitem(last=False)
+                self.bytes -= self.cost(evicted)
+                self.evictions += 1
+        return True
+
+    def lookup(
+        self, key: Hashable, load: Callable[[], Optional[Tile]]
+    ) -> Tuple[Optional[Tile], bool]:
+        """(tile, cache_hit); misses are loaded and inserted."""
+        tile = self.get(key)
+        if tile is not None:
+            return tile, True
+        # loaded outside the lock; two threads may load the same tile once
+        tile = load()
+        if tile is not None:
+            self.put(key, tile)
+        return tile, False
+
+    def get_or_load(self, key: Hashable, load: Callable[[], Optional[Tile]]) -> Optional[Tile]:
+        return self.lookup(key, load)[0]
+
+    def has_room(self, tile: Tile) -> bool:
+        return self.bytes + self.cost(tile) <= self.max_bytes
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._tiles),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def mbtiles_key(z: int, x: int, y: int) -> Hashable:
+    return ("mbtiles", z, x, y)
+
+
+def warm_mbtiles(cache: TileCache, source: MBTilesSource, max_zoom: int) -> int:
+    """Preload zooms 0..max_zoom (lowest first) until the budget is full."""
+    n = 0
+    for z, x, y, tile in source.iter_tiles(max_zoom):
+        if not cache.has_room(tile):
+            break
+        cache.put(mbtiles_key(z, x, y), tile)
+        n += 1
+    return n
+
+
+def warm_directory(
+    cache: TileCache, source: DirectorySource, tiles_dir: str, max_zoom: int
+) -> int:
+    """Same as warm_mbtiles for an exploded {z}/{x}/{y}.pbf tree."""
+    n = 0
+    for z in range(max_zoom + 1):
+        zdir = os.path.join(tiles_dir, str(z))
+        if not os.path.isdir(zdir):
+            continue
+        for x in sorted(os.listdir(zdir)):
+            xdir = os.path.join(zdir, x)
+            if not os.path.isdir(xdir):
+                continue
+            for name in sorted(os.listdir(xdir)):
+                if not name.endswith(".pbf"):
+                    continue
+                path = os.path.join(xdir, name)
+                key = source.cache_key(path)
+                tile = source.get_file(path) if key is not None else None
+                if tile is None:
+                    continue
+                if not cache.has_room(tile):
+                    return n
+                cache.put(key, tile)
+                n += 1
+    return n
@@ -0,0 +1,205 @@
+"""
+Request metrics and structured access log for the local tile server.
+
+Metrics.record() is called once per request. Per zoom it keeps request
+counts by status, a latency histogram, bytes served and cache hits/misses;
+non-tile requests (view.html, metadata, archives) are grouped under "other".
+It also tracks the most requested and the largest tiles served.
+
+GET /metrics              JSON (latency in ms)
+GET /metrics?format=prom  Prometheus text exposition (latency in seconds)
+
+AccessLog writes one JSON object per request (--access-log FILE, "-" for
+stdout) instead of the default stderr log line.
+"""
+
+from __future__ import annotations
+import json
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+# upper bounds in ms; the last bucket is +Inf
+LATENCY_BUCKETS_MS = [0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000]
+TOP_TILES = 10
+
+ZOOM_RE = re.compile(r"/(\d+)/\d+/\d+\.pbf$")
+
+
+def tile_zoom(path: str) -> Optional[int]:
+    m = ZOOM_RE.search(path)
+    return int(m.group(1)) if m else None
+
+
+class _ZoomStats:
+    __slots__ = (
+        "status",
+        "buckets",
+        "latency_sum_ms",
+        "bytes",
+        "cache_hits",
+        "cache_misses",
+    )
+
+    def __init__(self):
+        self.status: Counter = Counter()
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.latency_sum_ms = 0.0
+        self.bytes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        requests = sum(self.status.values())
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "requests": requests,
+            "status": {str(k): v for k, v in sorted(self.status.items())},
+            "bytes": self.bytes,
+            "mean_ms": self.latency_sum_ms / requests if requests else 0.0,
+            "latency_ms_buckets": dict(
+                zip([str(b) for b in LATENCY_BUCKETS_MS] + ["+Inf"], self.buckets)
+            ),
+            "cache_hit_ratio": self.cache_hits / lookups if lookups else None,
+            "not_modified_ratio": self.status[304] / requests if requests else 0.0,
+            "not_found": self.status[404],
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._zooms: Dict[Any, _ZoomStats] = {}
+        self._hot: Counter = Counter()
+        self._sizes: Dict[str, int] = {}
+        self.started = time.time()
+
+    def record(
+        self,
+        path: str,
+        status: int,
+        nbytes: int,
+        elapsed_ms: float,
+        cache_hit: Optional[bool] = None,
+    ):
+        z = tile_zoom(path)
+        with self._lock:
+            key = z if z is not None else "other"
+            zs = self._zooms.get(key)
+            if zs is None:
+                zs = self._zooms[key] = _ZoomStats()
+            zs.status[status] += 1
+            zs.buckets[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+            zs.latency_sum_ms += elapsed_ms
+            zs.bytes += nbytes
+            if cache_hit is True:
+                zs.cache_hits += 1
+            elif cache_hit is False:
+                zs.cache_misses += 1
+            if z is not None and status == 200:
+                self._hot[path] += 1
+                if nbytes > self._sizes.get(path, 0):
+                    self._sizes[path] = nbytes
+
+    def snapshot(self, cache_stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        with self._lock:
+            keys = sorted(k for k in self._zooms if k != "other")
+            if "other" in self._zooms:
+                keys.append("other")
+            zooms = {str(k): self._zooms[k].as_dict() for k in keys}
+            hot = [{"path": p, "requests": n} for p, n in self._hot.most_common(TOP_TILES)]
+            largest = sorted(self._sizes.items(), key=lambda kv: kv[1], reverse=True)
+            largest = largest[:TOP_TILES]
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "zooms": zooms,
+            "hot_tiles": hot,
+            "largest_tiles": [{"path": p, "bytes": b} for p, b in largest],
+            "cache": cache_stats or {},
+        }
+
+    def prometheus(self, cache_stats: Optional[Dict[str, Any]] = None) -> str:
+        snap = self.snapshot(cache_stats)
+        out: List[str] = []
+        with self._lock:
+            zooms = [(f'zoom="{z}"', zs) for z, zs in self._zooms.items()]
+            # each family's samples must be contiguous in the exposition format
+            out.append("# TYPE fim_tile_requests_total counter")
+            for lbl, zs in zooms:
+                for status, n in sorted(zs.status.items()):
+                    out.append(f'fim_tile_requests_total{{{lbl},status="{status}"}} {n}')
+            out.append("# TYPE fim_tile_request_duration_seconds histogram")
+            for lbl, zs in zooms:
+                cum = 0
+                for bound, n in zip(LATENCY_BUCKETS_MS + [float("inf")], zs.buckets):
+                    cum += n
+                    le = "+Inf" if bound == float("inf") else repr(bound / 1000.0)
+                    out.append(
+                        f'fim_tile_request_duration_seconds_bucket{{{lbl},le="{le}"}} {cum}'
+                    )
+                out.append(
+                    f"fim_tile_request_duration_seconds_sum{{{lbl}}} "
+                    f"{zs.latency_sum_ms / 1000.0}"
+                )
+                out.append(f"fim_tile_request_duration_seconds_count{{{lbl}}} {cum}")
+            out.append("# TYPE fim_tile_bytes_total counter")
+            for lbl, zs in zooms:
+                out.append(f"fim_tile_bytes_total{{{lbl}}} {zs.bytes}")
+            out.append("# TYPE fim_tile_cache_hits_total counter")
+            for lbl, zs in zooms:
+                out.append(f"fim_tile_cache_hits_total{{{lbl}}} {zs.cache_hits}")
+            out.append("# TYPE fim_tile_cache_misses_total counter")
+            for lbl, zs in zooms:
+                out.append(f"fim_tile_cache_misses_total{{{lbl}}} {zs.cache_misses}")
+        for k in ("bytes", "entries", "evictions"):
+            if k in snap["cache"]:
+                kind = "counter" if k == "evictions" else "gauge"
+                out.append(f"# TYPE fim_tile_cache_{k} {kind}")
+                out.append(f"fim_tile_cache_{k} {snap['cache'][k]}")
+        return "\n".join(out) + "\n"
+
+    def render(self, query: str, cache_stats: Optional[Dict[str, Any]] = None):
+        """(body, content_type) for GET /metrics[?format=prom]."""
+        if "format=prom" in query:
+            body = self.prometheus(cache_stats).encode("utf-8")
+            return body, "text/plain; version=0.0.4"
+        body = json.dumps(self.snapshot(cache_stats), indent=2).encode("utf-8")
+        return body, "application/json"
+
+
+class AccessLog:
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        if path == "-":
+            self._f = sys.stdout
+        else:
+            self._f = open(path, "a", encoding="utf-8", buffering=1)
+
+    def write(
+        self,
+        client: str,
+        method: str,
+        path: str,
+        status: int,
+        nbytes: int,
+        elapsed_ms: float,
+        cache_hit: Optional[bool] = None,
+    ):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()),
+            "client": client,
+            "method": method,
+            "path": path,
+            "zoom": tile_zoom(path),
+            "status": status,
+            "bytes": nbytes,
+            "ms": round(elapsed_ms, 3),
+            "cache": None if cache_hit is None else ("hit" if cache_hit else "miss"),
+        }
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            self._f.write(line)
@@ -0,0 +1,119 @@
+"""
+Tile sources for the local tile server.
+
+- DirectorySource: exploded {z}/{x}/{y}.pbf files (mb-util output)
+- MBTilesSource: tiles read straight from a .mbtiles (SQLite) file through
+  read-only connections pooled per thread
+
+Both return Tile(data, etag) with a strong ETag derived from the tile bytes.
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+import sqlite3
+import stat
+import threading
+from typing import Any, Dict, Iterator, NamedTuple, Optional, Tuple
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class Tile(NamedTuple):
+    data: bytes
+    etag: str
+
+    @property
+    def gzipped(self) -> bool:
+        return self.data[:2] == GZIP_MAGIC
+
+
+def make_etag(data: bytes) -> str:
+    return '"' + hashlib.blake2b(data, digest_size=16).hexdigest() + '"'
+
+
+class DirectorySource:
+    def __init__(self, root: str):
+        self.root = root
+
+    @staticmethod
+    def cache_key(path: str) -> Optional[Tuple[str, str, int, int]]:
+        """Key that changes when the file is rewritten; None if missing."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        return ("file", os.path.normpath(path), st.st_mtime_ns, st.st_size)
+
+    def get_file(self, path: str) -> Optional[Tile]:
+        """Tile at an absolute filesystem path (already resolved by the handler)."""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            return None
+        return Tile(data, make_etag(data))
+
+    def get(self, z: int, x: int, y: int) -> Optional[Tile]:
+        return self.get_file(os.path.join(self.root, str(z), str(x), f"{y}.pbf"))
+
+
+class MBTilesSource:
+    """
+    Serves XYZ tiles from an MBTiles file (rows are stored TMS, so y is flipped).
+    sqlite3 connections cannot be shared across threads, so each server
+    thread lazily opens its own read-only connection and keeps it.
+    """
+
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.path = os.path.abspath(path)
+        self._local = threading.local()
+        self._uri = f"file:{self.path}?mode=ro"
+
+    def _conn(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+            con.execute("PRAGMA query_only = 1")
+            self._local.con = con
+        return con
+
+    def get(self, z: int, x: int, y: int) -> Optional[Tile]:
+        tms_y = (1 << z) - 1 - y
+        row = (
+            self._conn()
+            .execute(
+                "SELECT tile_data FROM tiles "
+                "WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (z, x, tms_y),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        data = bytes(row[0])
+        return Tile(data, make_etag(data))
+
+    def iter_tiles(self, max_zoom: int) -> Iterator[Tuple[int, int, int, Tile]]:
+        """(z, x, xyz_y, tile) for zooms 0..max_zoom, lowest zoom first."""
+        rows = self._conn().execute(
+            "SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles "
+            "WHERE zoom_level <= ? ORDER BY zoom_level",
+            (max_zoom,),
+        )
+        for z, x, tms_y, blob in rows:
+            data = bytes(blob)
+            yield z, x, (1 << z) - 1 - tms_y, Tile(data, make_etag(data))
+
+    def metadata(self) -> Dict[str, Any]:
+        """metadata table as a dict, shaped like mb-util's metadata.json."""
+        rows = self._conn().execute("SELECT name, value FROM metadata").fetchall()
+        return {name: value for name, value in rows}
+
+    def metadata_json(self) -> bytes:
+        return json.dumps(self.metadata()).encode("utf-8")
@@ -1,9 +1,12 @@
 from __future__ import annotations
 import hashlib
 import datetime as dt
+import os
+from functools import partial
 from io import BytesIO
-from typing import Dict, Any, Iterable, List, Tuple, Optional
+from typing import Dict, Any, Iterable, List, NamedTuple, Tuple, Optional
 
+import numpy as np
 import requests
 import pandas as pd
 import geopandas as gpd
@@ -13,13 +16,32 @@ import streamlit as st
 from streamlit_folium import st_folium
 import folium
 from folium.features import GeoJson
-from folium.plugins import MarkerCluster
 from branca.element import Element, MacroElement
 from jinja2 import Template
 import json
-from folium.plugins import MarkerCluster, Fullscreen
-
+from folium.plugins import Fullscreen
+
+from utilis import http_cache
+from utilis.catalog_details import DetailShards
+from utilis.catalog_index import CatalogIndex, catalog_digest, load_catalog
+from utilis.catalog_refresh import CatalogRefresher
+from utilis.map_markers import (
+    CompactMarkers,
+    RecordPopups,
+    RenderedLayer,
+    compact_payload,
+    popup_placeholder,
+    render_layer,
+)
 from utilis.ui import inject_globalfont
+from utilis.viewport import (
+    Viewport,
+    aggregate,
+    default_viewport,
+    from_folium,
+    padded,
+    sample_rows,
+)
 from utilis.home_page import apply_page_style
 
 inject_globalfont(font_size_px=18, sidebar_font_size_px=22)
@@ -28,10 +50,39 @@ apply_page_style()
 # CONFIG
 BUCKET = "sdmlab"
 CORE_KEY = "FIM_Database/FIM_Viz/catalog_core.json"
+# typed copy from build_catalog.py; preferred when published
+CORE_PARQUET_KEY = "FIM_Database/FIM_Viz/catalog_core.parquet"
+# slim map/filter index + full records in details/{nn}.json (preferred over both)
+INDEX_KEY = "FIM_Database/FIM_Viz/catalog_index.parquet"
+DETAILS_KEY = "FIM_Database/FIM_Viz/details"
 TILES_KEY = "FIM_Database/FIM_Viz/tiles"
+# sizes and sha256 of the published JSON (fim_tiles.py upload_json_file)
+JSON_MANIFEST_KEY = "FIM_Database/FIM_Viz/json_manifest.json"
+# mutable pointer to the current immutable tiles/v/{hash}/ tileset
+TILE_MANIFEST_KEY = f"{TILES_KEY}/manifest.json"
+# legacy unversioned layout only: set when that tiles/ root was published with
+# fim_tiles.py --split-tiers (tiles/{tier}/{z}/{x}/{y}.pbf); versioned
+# tilesets advertise their per-tier template in the manifest instead
+PER_TIER_TILES = False
+# tile server /filtered/{z}/{x}/{y}.pbf endpoint (fim_viz/viewtile_locally);
+# when set, tiles arrive already filtered by tier/date/return period
+FILTERED_TILES_URL = os.environ.get("FIM_FILTERED_TILES_URL")
+
+# background catalog poll (conditional GET; a 304 when nothing changed)
+CATALOG_REFRESH_SECONDS = 180
+# memory-map the Parquet catalog from an Arrow file in the http_cache dir,
+# shared by every server process on the host ("0" keeps it in process memory)
+CATALOG_MMAP = os.environ.get("FIM_CATALOG_MMAP", "1") != "0"
 
 # Max features to draw at once
 BASE_FEATURE_CAP = 10
+# "viewport": Python-built markers for the current view, capped by zoom;
+# "compact": every filtered site as one array, markers built client-side
+MARKER_MODE = os.environ.get("FIM_MARKER_MODE", "viewport")
+# rendered marker layers kept across sessions (LRU)
+MAP_CACHE_ENTRIES = 64
+# FIM extent layer renderer: "canvas" (one bitmap per tile) or "svg"
+EXTENT_RENDERER = os.environ.get("FIM_EXTENT_RENDERER", "canvas")
 
 TIER_COLORS = {
     "Tier_1": "#D3143E",
@@ -65,17 +116,164 @@ def http_url(key: str) -> str:
     return f"https://{BUCKET}.s3.amazonaws.com/{quote(key, safe='/')}"
 
 
-@st.cache_data(show_spinner=False, ttl=86400)
-def fetch_json(url: str) -> Dict[str, Any]:
-    r = requests.get(url, timeout=120)
+def encoded_variants(url: str) -> List[str]:
+    """
+    Pre-compressed copies published next to the JSON (Content-Encoding br/gzip),
+    best first; requests decodes them transparently. br only if urllib3 can.
+    """
+    from urllib3.util.request import ACCEPT_ENCODING
+
+    variants = [f"{url}.gz", url]
+    if "br" in ACCEPT_ENCODING:
+        variants.insert(0, f"{url}.br")
+    return variants
+
+
+def json_manifest() -> Dict[str, Any]:
+    """json_manifest.json ({key_name: {sha256, ...}}); {} if absent or unreadable."""
+    try:
+        body = http_cache.conditional_get(
+            http_url(JSON_MANIFEST_KEY), timeout=30, allow_missing=True
+        )
+        return json.loads(body) if body else {}
+    except (requests.RequestException, ValueError):
+        return {}
+
+
+def fetch_bytes(url: str, sha256: Optional[str] = None) -> bytes:
+    """
+    Best encoded variant that decodes and matches `sha256` (the digest the
+    JSON was published with; without one, it must at least look like a JSON
+    object). A stale or corrupt .br/.gz falls through to the next variant.
+    """
+    # disk cache shared across restarts/workers; unchanged objects cost a 304
+    for variant in encoded_variants(url)[:-1]:
+        try:
+            body = http_cache.conditional_get(variant, timeout=120, allow_missing=True)
+        except requests.RequestException:
+            continue
+        if body is None:
+            continue
+        if sha256 is not None:
+            if hashlib.sha256(body).hexdigest() == sha256:
+                return body
+        elif body.lstrip()[:1] == b"{" and body.rstrip()[-1:] == b"}":
+            return body
+    return http_cache.conditional_get(url, timeout=120)
+
+
+def fetch_catalog_bytes(parquet_urls: Tuple[str, ...], json_url: str) -> bytes:
+    """
+    First of parquet_urls built from the published JSON (its catalog_sha256
+    stamp matches json_manifest.json), else the JSON catalog itself.
+    """
+    published = json_manifest().get(json_url.rsplit("/", 1)[-1], {}).get("sha256")
+    if published:
+        for url in parquet_urls:
+            body = http_cache.conditional_get(url, timeout=120, allow_missing=True)
+            if body is not None and catalog_digest(body) == published:
+                return body
+    return fetch_bytes(json_url, published)
+
+
+@st.cache_resource(show_spinner=False)
+def catalog_refresher(parquet_urls: Tuple[str, ...], json_url: str) -> CatalogRefresher:
+    """
+    One per process: polls the catalog in the background, shared by all
+    sessions. Each version is parsed straight into the columnar CatalogIndex,
+    the only copy of the catalog in the process (sessions keep its version).
+    """
+    return CatalogRefresher(
+        lambda: fetch_catalog_bytes(parquet_urls, json_url),
+        interval_s=CATALOG_REFRESH_SECONDS,
+        parse=partial(
+            load_catalog, arrow_dir=http_cache.cache_dir() if CATALOG_MMAP else None
+        ),
+    ).start()
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def detail_store(version: str, shards: int) -> DetailShards:
+    """Detail shards of one catalog version, fetched on demand for all sessions."""
+    return DetailShards(
+        http_url(DETAILS_KEY) + "/{shard}.json",
+        shards,
+        lambda url: http_cache.conditional_get(url, timeout=60, allow_missing=True),
+    )
+
+
+@st.cache_data(show_spinner=False, ttl=300)
+def fetch_tile_manifest(url: str) -> Dict[str, Any]:
+    """
+    Current tileset version; {} if none is published (legacy layout). Other
+    failures raise, so they are not cached for the ttl.
+    """
+    r = requests.get(url, timeout=15)
+    if r.status_code in (403, 404):
+        return {}
     r.raise_for_status()
     return r.json()
 
 
-@st.cache_data(show_spinner=False)
-def fingerprint_ids(ids: Iterable[str]) -> str:
-    arr = sorted([str(x) for x in ids])
-    return hashlib.sha1(("\n".join(arr)).encode("utf-8")).hexdigest()
+@st.cache_resource(show_spinner=False)
+def last_tile_manifest() -> Dict[str, Any]:
+    """Last manifest fetched successfully (per process), used while S3 errors."""
+    return {}
+
+
+def resolve_tile_urls() -> Optional[Tuple[str, Optional[str], int]]:
+    """
+    (tiles_url, tier_tiles_url, max_native_zoom) for the current tileset;
+    None if the manifest cannot be read and none was read before.
+    """
+    last = last_tile_manifest()
+    try:
+        manifest = fetch_tile_manifest(http_url(TILE_MANIFEST_KEY))
+    except (requests.RequestException, ValueError):
+        if "manifest" not in last:
+            return None
+        manifest = last["manifest"]
+    else:
+        last["manifest"] = manifest
+    if manifest.get("url_template"):
+        return (
+            manifest["url_template"],
+            manifest.get("tier_url_template"),
+            int(manifest.get("max_zoom") or 14),
+        )
+    tiles_root = f"https://{BUCKET}.s3.amazonaws.com/{TILES_KEY}"
+    return (
+        f"{tiles_root}/{{z}}/{{x}}/{{y}}.pbf",
+        f"{tiles_root}/{{tier}}/{{z}}/{{x}}/{{y}}.pbf" if PER_TIER_TILES else None,
+        14,
+    )
+
+
+def filtered_tiles_url(
+    base: str,
+    tiers: Iterable[str],
+    date_min: int,
+    date_max: int,
+    rps: Optional[Iterable[Any]],
+) -> str:
+    """Tile URL template asking the server for the current filter only."""
+    from urllib.parse import urlencode
+
+    q = {
+        "tiers": ",".join(sorted(str(t) for t in tiers)),
+        "date_min": date_min,
+        "date_max": date_max,
+    }
+    if rps is not None:
+        q["rp"] = ",".join(str(v) for v in sorted(rps))
+    return f"{base}?{urlencode(q, safe=',')}"
+
+
+def fingerprint_rows(version: str, rows: np.ndarray) -> str:
+    """Identity of a filter result: catalog version + selected row numbers."""
+    h = hashlib.sha1(version.encode("utf-8"))
+    h.update(rows.astype(np.int64).tobytes())
+    return h.hexdigest()
 
 
 # Custom vector grid layer for folium
@@ -83,6 +281,8 @@ class VectorGridProtobuf(MacroElement):
     _template = Template(
         """
         {% macro script(this, kwargs) %}
+        // a remounted map must not receive filters meant for the old grids
+        window.__fimApplyFilter = null;
         (function ensureVectorGrid(cb){
           if (window.L && L.vectorGrid) { cb(); return; }
           var s = document.createElement('script');
@@ -95,11 +295,17 @@ class VectorGridProtobuf(MacroElement):
           var colorMap  = {{ this.tier_colors|safe }};
           var defaultC  = {{ this.default_color|tojson }};
           var maxNative = {{ this.max_native }};
-
-          // filters coming from Python
-          var TIER_SET  = new Set({{ this.allowed_tiers|safe }});
-          var DATE_MIN  = {{ this.date_min }};
-          var DATE_MAX  = {{ this.date_max }};
+          var tierUrlTpl = {{ this.tier_tiles_url|tojson }};
+          // canvas: one <canvas> per tile instead of one SVG path per feature
+          var renderer  = {{ this.renderer|tojson }} === "svg" ? L.svg.tile : L.canvas.tile;
+
+          // filters pushed from Python through FilterState (see below);
+          // the latest push may have arrived before this library loaded
+          var pending   = window.__fimPendingFilter || {};
+          var TIER_SET  = new Set(pending.tiers || []);
+          var DATE_MIN  = ("date_min" in pending) ? pending.date_min : 0;
+          var DATE_MAX  = ("date_max" in pending) ? pending.date_max : 99999999;
+          var currentUrl = pending.tiles_url || urlTpl;
 
           function matches(props){
             // 1) Tier
@@ -114,10 +320,13 @@ class VectorGridProtobuf(MacroElement):
             return true;
         }
 
+            // canvas hit-testing ignores paint, so hidden features must also
+            // stop being interactive or they still catch clicks
+            var HIDDEN = { stroke:false, fill:false, opacity:0, fillOpacity:0, weight:0, interactive:false };
             var style = {};
             style[lyrId] = function(props){
             if (!matches(props)) {
-                return { stroke:false, fill:false, opacity:0, fillOpacity:0, weight:0 };
+                return HIDDEN;
             }
 
             // Tier-dependent border color
@@ -136,29 +345,120 @@ class VectorGridProtobuf(MacroElement):
                 fillOpacity: 0.6,
                 lineCap: 'round',
                 lineJoin: 'round',
-                smoothFactor: 10.0
+                smoothFactor: 10.0,
+                interactive: true
             };
         };
 
-          var grid = L.vectorGrid.protobuf(urlTpl, {
-            vectorTileLayerStyles: style,
-            interactive: true,
-            maxNativeZoom: maxNative,
-            maxZoom: 22,
-            rendererFactory: L.svg.tile
-          })
-          .on('click', function(e){
+          function popupHtml(p){
+            return "<div style='font:13px system-ui'><b>"+(p.tier||"")+
+                   "</b> — "+(p.site_id||"")+
+                   "<br/>ID: "+(p.feature_id||"")+
+                   (p.event_date ? "<br/>Date: "+p.event_date : "") +
+                   "</div>";
+          }
+
+          function onClick(e){
             var p = (e.layer && e.layer.properties) || {};
-            var html = "<div style='font:13px system-ui'><b>"+(p.tier||"")+
-                       "</b> — "+(p.site_id||"")+
-                       "<br/>ID: "+(p.feature_id||"")+
-                       (p.event_date ? "<br/>Date: "+p.event_date : "") +
-                       "</div>";
-            L.popup().setLatLng(e.latlng).setContent(html).openOn(map);
-          })
-          .addTo(map);
-
-          window.__fimGrid = grid;
+            if (!matches(p)) return;
+            var popup = L.popup().setLatLng(e.latlng).setContent(popupHtml(p)).openOn(map);
+            // low-zoom tiles only carry feature_id/tier/event_ts
+            if (!p.site_id || !p.event_date) {
+              // shared, cached catalog lookup (RecordPopups)
+              var lookup = window.__fimRecord || function(){ return Promise.resolve(null); };
+              lookup(p.feature_id).then(function(rec){
+                if (!rec) return;
+                var q = Object.assign({}, p);
+                q.site_id = q.site_id || rec.site_id || rec.site;
+                q.event_date = q.event_date || rec.date_ymd;
+                popup.setContent(popupHtml(q));
+              }, function(){ /* keep the tile's own properties */ });
+            }
+          }
+
+          // features are keyed by feature_id so a filter change can restyle
+          // them one by one (setFeatureStyle) in every tile they appear in;
+          // seen/shown remember each id's properties and current visibility
+          var featureSeq = 0;
+          var seen = {};
+          var shown = {};
+          function featureId(f){
+            var p = f.properties || {};
+            var id = (p.feature_id !== undefined && p.feature_id !== null)
+              ? String(p.feature_id) : "_" + (++featureSeq);
+            seen[id] = p;
+            if (!(id in shown)) shown[id] = matches(p);
+            return id;
+          }
+
+          function makeGrid(url){
+            return L.vectorGrid.protobuf(url, {
+              vectorTileLayerStyles: style,
+              interactive: true,
+              maxNativeZoom: maxNative,
+              maxZoom: 22,
+              rendererFactory: renderer,
+              getFeatureId: featureId
+            })
+            .on('click', onClick)
+            .addTo(map);
+          }
+
+          // only features whose visibility flipped are touched; the override
+          // also covers tiles of that feature loaded later
+          function restyle(){
+            Object.keys(seen).forEach(function(id){
+              var p = seen[id];
+              var vis = matches(p);
+              if (shown[id] === vis) return;
+              shown[id] = vis;
+              var grid = grids[String(p.tier || "")] || grids["*"];
+              if (grid) grid.setFeatureStyle(id, vis ? style[lyrId](p) : HIDDEN);
+            });
+          }
+
+          // per-tier tilesets: only the selected tiers are ever requested
+          var grids = {};
+          function syncTierGrids(){
+            TIER_SET.forEach(function(t){
+              if (!grids[t]) {
+                grids[t] = makeGrid(tierUrlTpl.replace("{tier}", encodeURIComponent(t)));
+              } else if (!map.hasLayer(grids[t])) {
+                grids[t].addTo(map);
+              }
+            });
+            Object.keys(grids).forEach(function(t){
+              if (!TIER_SET.has(t) && map.hasLayer(grids[t])) map.removeLayer(grids[t]);
+            });
+          }
+          if (tierUrlTpl) {
+            syncTierGrids();
+          } else {
+            grids["*"] = makeGrid(currentUrl);
+          }
+
+          function publish(){
+            window.__fimGrids = grids;
+            window.__fimGrid = grids["*"] || grids[Object.keys(grids)[0]];
+          }
+          publish();
+
+          // new filter values: restyle the tiles already on the map instead
+          // of rebuilding the layer (keeps the viewport and the tile cache);
+          // only a server-side filtered URL needs new tiles
+          window.__fimApplyFilter = function(f){
+            TIER_SET = new Set(f.tiers || []);
+            DATE_MIN = f.date_min;
+            DATE_MAX = f.date_max;
+            if (tierUrlTpl) {
+              syncTierGrids();
+            } else if (f.tiles_url && f.tiles_url !== currentUrl) {
+              currentUrl = f.tiles_url;
+              grids["*"].setUrl(currentUrl);
+            }
+            restyle();
+            publish();
+          };
         });
         {% endmacro %}
     """
@@ -170,11 +470,12 @@ class VectorGridProtobuf(MacroElement):
         layer_name: str = "fim_extents",
         tier_colors: Optional[Dict[str, str]] = None,
         max_native: int = 14,
-        allowed_tiers: Optional[List[str]] = None,
-        date_min: int = 0,
-        date_max: int = 99999999,
+        tier_tiles_url: Optional[str] = None,
+        renderer: str = "canvas",
     ):
         super().__init__()
+        if renderer not in ("canvas", "svg"):
+            raise ValueError(f"renderer must be 'canvas' or 'svg', got {renderer!r}")
         if tier_colors is None:
             tier_colors = TIER_COLORS
         self.tiles_url = tiles_url
@@ -182,9 +483,50 @@ class VectorGridProtobuf(MacroElement):
         self.tier_colors = json.dumps(tier_colors)
         self.default_color = DEFAULT_TIER_COLOR
         self.max_native = max_native
-        self.allowed_tiers = json.dumps([str(x) for x in (allowed_tiers or [])])
-        self.date_min = int(date_min)
-        self.date_max = int(date_max)
+        # URL template with a {tier} placeholder; one layer per allowed tier
+        self.tier_tiles_url = tier_tiles_url
+        self.renderer = renderer
+
+
+class FilterState(MacroElement):
+    """
+    Current tier/date filter (and legend) pushed to the browser through
+    st_folium's feature_group_to_add channel, which is evaluated in the
+    mounted map without reloading it. VectorGridProtobuf picks the values
+    up via window.__fimApplyFilter (or __fimPendingFilter before it loads).
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+        (function(){
+          var f = {{ this.state|tojson }};
+          window.__fimPendingFilter = f;
+          var legend = document.getElementById("fim-legend-items");
+          if (legend) legend.innerHTML = f.legend_html;
+          if (window.__fimApplyFilter) window.__fimApplyFilter(f);
+        })();
+        {% endmacro %}
+    """
+    )
+
+    def __init__(
+        self,
+        tiers: List[str],
+        date_min: int,
+        date_max: int,
+        legend_html: str,
+        tiles_url: Optional[str] = None,
+    ):
+        super().__init__()
+        self._name = "FilterState"
+        self.state = {
+            "tiers": sorted(str(t) for t in tiers),
+            "date_min": int(date_min),
+            "date_max": int(date_max),
+            "legend_html": legend_html,
+            "tiles_url": tiles_url,
+        }
 
 
 # Streamlit page boot
@@ -206,24 +548,44 @@ if "filters_changed" not in ss:
 if "map_built_once" not in ss:
     ss.map_built_once = False
 
+refresher = catalog_refresher(
+    (http_url(INDEX_KEY), http_url(CORE_PARQUET_KEY)), http_url(CORE_KEY)
+)
+
+
+@st.fragment(run_every=CATALOG_REFRESH_SECONDS)
+def watch_catalog():
+    # rerun the page once the background refresher has swapped in a new version
+    if refresher.snapshot().version != ss.get("catalog_version"):
+        st.rerun()
+
+
 # Sidebar cache control
 with st.sidebar:
     st.header("Data")
     if st.button("Reload Data", use_container_width=True):
-        fetch_json.clear()
-        for k in ("catalog_records", "core_errors"):
-            ss.pop(k, None)
-        ss.filters_changed = True
-        st.success("Cache cleared. Data will reload now.")
+        try:
+            reloaded = refresher.refresh_now()
+        except Exception as e:  # keep serving the current snapshot
+            st.error(f"Could not reload the catalog: {e}")
+        else:
+            if reloaded:
+                st.success("New catalog version loaded.")
+            else:
+                st.success("Catalog is up to date.")
+
+# Current catalog snapshot (swapped in by the background refresher)
+snapshot = refresher.snapshot()
+if ss.get("catalog_version") != snapshot.version:
+    ss.catalog_version = snapshot.version
+    ss.filters_changed = True
 
-# Load catalog
-if "catalog_records" not in ss:
-    core = fetch_json(http_url(CORE_KEY))
-    ss.catalog_records = core.get("records", [])
-    ss.core_errors = core.get("errors", [])
+with st.sidebar:
+    watch_catalog()
 
-records: List[Dict[str, Any]] = ss.catalog_records
-load_errors = ss.get("core_errors", [])
+# read-only and shared by every session of this process
+index: CatalogIndex = snapshot.data
+load_errors = index.errors
 
 if load_errors:
     with st.expander(
@@ -235,28 +597,14 @@ if load_errors:
         if len(load_errors) > 50:
             st.caption(f"...and {len(load_errors)-50} more")
 
-if not records:
-    st.warning("No records found in catalog_core.json.")
+if not len(index):
+    st.warning("No records found in the catalog.")
     st.stop()
 
 # Filters
-all_tiers = sorted({r.get("tier", "Unknown_Tier") for r in records})
-dates_all = sorted(
-    [
-        r["date_ymd"]
-        for r in records
-        if (r.get("tier") != "Tier_4") and r.get("date_ymd")
-    ]
-)
-min_date = dt.date.fromisoformat(dates_all[0]) if dates_all else dt.date(2000, 1, 1)
-max_date = dt.date.fromisoformat(dates_all[-1]) if dates_all else dt.date.today()
-rp_all = sorted(
-    {
-        r.get("return_period")
-        for r in records
-        if r.get("tier") == "Tier_4" and r.get("return_period") is not None
-    }
-)
+all_tiers = index.tiers
+min_date, max_date = index.date_bounds or (dt.date(2000, 1, 1), dt.date.today())
+rp_all = index.return_periods
 
 with st.sidebar:
     st.header("Filters")
@@ -306,38 +654,16 @@ else:
     start_date, end_date = min_date, max_date
 
 
-def in_date_range(r) -> bool:
-    iso = r.get("date_ymd")
-    if not iso:
-        return False
-    try:
-        d = dt.date.fromisoformat(iso)
-    except Exception:
-        return False
-    return start_date <= d <= end_date
-
-
-def pass_filters(r) -> bool:
-    rtier = r.get("tier")
-    if rtier not in sel_tiers:
-        return False
-    if rtier == "Tier_4":
-        if sel_rps is None:
-            return True
-        rp = r.get("return_period")
-        return (rp in sel_rps) if (rp is not None) else False
-    else:
-        if dr is None:
-            return True
-        return in_date_range(r)
-
-
 if apply_filters:
     ss.filters_changed = True
 
-filtered = [r for r in records if pass_filters(r)]
-filtered_ids = [str(r["id"]) for r in filtered]
-ids_key = fingerprint_ids(filtered_ids)
+filter_mask = index.mask(
+    sel_tiers,
+    date_range=(start_date, end_date) if dr is not None else None,
+    rps=sel_rps,
+)
+filter_rows = index.rows(filter_mask)
+ids_key = fingerprint_rows(ss.catalog_version, filter_rows)
 
 
 # Map helpers
@@ -353,6 +679,88 @@ def feature_cap_by_zoom(zoom: float) -> int:
     return BASE_FEATURE_CAP
 
 
+class MarkerLayer(NamedTuple):
+    js: str  # rendered children of the marker FeatureGroup (RenderedLayer)
+    shown: int
+    grouped: int
+    outside: int
+
+
+@st.cache_resource(show_spinner=False, max_entries=MAP_CACHE_ENTRIES)
+def marker_layer(
+    ids_key: str,
+    box: Optional[Viewport],
+    cap: int,
+    _index: CatalogIndex,
+    _filter_mask: np.ndarray,
+) -> MarkerLayer:
+    """
+    Rendered marker layer for one filter result (ids_key) and padded viewport,
+    shared by all sessions; box=None is the compact all-sites layer.
+    """
+    filter_rows = _index.rows(_filter_mask)
+    fg = folium.FeatureGroup()
+
+    if box is None:
+        # every filtered site in one columnar array, markers built in the browser
+        CompactMarkers(
+            compact_payload(
+                _index.ids,
+                _index.lon,
+                _index.lat,
+                _index.tier_code,
+                _index.tiers,
+                _index.site_code,
+                _index.sites,
+                filter_rows,
+            ),
+            TIER_COLORS,
+            DEFAULT_TIER_COLOR,
+        ).add_to(fg)
+        return MarkerLayer(render_layer(fg), len(filter_rows), 0, 0)
+
+    # Only markers inside the padded viewport, capped by zoom; the rest of
+    # the in-view sites become count bubbles
+    in_box = _index.grid.query(box)
+    in_box = in_box[_filter_mask[in_box]]
+    shown = sample_rows(in_box, cap)
+    grouped = np.setdiff1d(in_box, shown, assume_unique=True)
+
+    for i, r in zip(shown.tolist(), _index.take(shown)):
+        color = TIER_COLORS.get(r.get("tier"), DEFAULT_TIER_COLOR)
+        folium.CircleMarker(
+            location=[float(_index.lat[i]), float(_index.lon[i])],
+            radius=8,
+            color="black",
+            weight=1.5,
+            fill=True,
+            fill_color=color,
+            fill_opacity=0.9,
+            tooltip=f"{r.get('tier')} — {r.get('site')}",
+            popup=folium.Popup(popup_placeholder(_index.ids[i]), max_width=500),
+        ).add_to(fg)
+
+    for lat, lon, count in aggregate(_index.lon, _index.lat, grouped, box):
+        folium.Marker(
+            location=[lat, lon],
+            tooltip=f"{count:,} more sites here — zoom in to see them",
+            icon=folium.DivIcon(
+                icon_size=(38, 38),
+                icon_anchor=(19, 19),
+                html=(
+                    "<div style='width:38px;height:38px;border-radius:19px;"
+                    "background:rgba(38,135,200,0.75);border:2px solid #fff;"
+                    "color:#fff;font:600 12px/34px system-ui,sans-serif;"
+                    f"text-align:center'>{count:,}</div>"
+                ),
+            ),
+        ).add_to(fg)
+
+    return MarkerLayer(
+        render_layer(fg), len(shown), len(grouped), len(filter_rows) - len(in_box)
+    )
+
+
 @st.fragment
 def render_map():
     # Base map
@@ -371,6 +779,13 @@ def render_map():
         force_separate_button=True,
     ).add_to(m)
 
+    # on-demand popup details for markers and extents (one cached catalog fetch)
+    RecordPopups(
+        http_url(CORE_KEY),
+        details_url=http_url(DETAILS_KEY) if index.detail_shards else None,
+        shards=index.detail_shards,
+    ).add_to(m)
+
     bm = BASEMAPS[basemap_choice]
     folium.TileLayer(
         tiles=bm["tiles"],
@@ -380,158 +795,49 @@ def render_map():
         show=True,
     ).add_to(m)
 
-    # Markers
-    def popup_html(r: dict) -> str:
-        tif_url = r.get("tif_url")
-        gpkg_url = r.get("gpkg_url") or r.get("gpkgurl")
-        json_url = r.get("json_url") or r.get("metadata_url")
-
-        # Prefer new names
-        basin = r.get("basin") or r.get("river_basin")
-        date_disp = r.get("date_ymd") or r.get("date_of_flood")
-
-        # HUC ID preference (8→12→6→4→2)
-        hucid = (
-            r.get("huc8")
-            or r.get("huc12")
-            or r.get("huc6")
-            or r.get("huc4")
-            or r.get("huc2")
-        )
-
-        fields = [
-            ("File Name", r.get("file_name")),
-            ("Resolution (m)", r.get("resolution_m")),
-            ("State", r.get("state")),
-            ("Description", r.get("description")),
-            ("River Basin Name", basin),
-            ("Source", r.get("source")),
-            ("Date", date_disp),
-            (
-                "Return Period (years)",
-                r.get("return_period") if r.get("tier") == "Tier_4" else None,
-            ),
-            ("Quality", r.get("quality")),
-            ("HUC ID", hucid),  # NEW
-        ]
-        rows = "".join(
-            f"<tr><th style='text-align:left;vertical-align:top;padding-right:8px'>{k}</th>"
-            f"<td style='text-align:left'>{'' if v is None else v}</td></tr>"
-            for k, v in fields
-        )
-
-        refs = r.get("references") or []
-        refs_html = ""
-        if refs:
-            refs_html = "<div style='margin-top:6px'><b>References</b><div style='margin:4px 0;padding-left:12px'>"
-            for ref in refs:
-                refs_html += f"<div style='margin-bottom:6px'>{ref}</div>"
-            refs_html += "</div></div>"
-
-        # Two-column buttons: left (TIF + JSON), right (GPKG)
-        left_btns = ""
-        if tif_url:
-            left_btns += f"""
-            <a href="{tif_url}" target="_blank" rel="noopener"
-            style="text-decoration:none;display:block;background:#2563eb;color:#fff;
-                    padding:8px 10px;border-radius:6px;font-weight:600;margin:0 0 8px;">
-            ⬇ Download Benchmark FIM (.tif)
-            </a>"""
-        if json_url:
-            left_btns += f"""
-            <a href="{json_url}" target="_blank" rel="noopener"
-            style="text-decoration:none;display:block;background:#059669;color:#fff;
-                    padding:8px 10px;border-radius:6px;font-weight:600;">
-            ⬇ Download Metadata (.json)
-            </a>"""
-
-        right_btn = ""
-        if gpkg_url:
-            right_btn = f"""
-            <a href="{gpkg_url}" target="_blank" rel="noopener"
-            style="text-decoration:none;display:block;background:#374151;color:#fff;
-                    padding:8px 10px;border-radius:6px;font-weight:600;">
-            ⬇ Download Benchmark FIM (.gpkg)
-            </a>"""
-
-        buttons_html = ""
-        if left_btns or right_btn:
-            buttons_html = f"""
-            <div style="display:flex;gap:10px;margin-top:6px;">
-            <div style="flex:1;min-width:0;">{left_btns}</div>
-            <div style="flex:1;min-width:0;">{right_btn}</div>
-            </div>
-            """
-
-        return f"""
-        <div style="font-family:system-ui,-apple-system,Segoe UI,Roboto,Arial,sans-serif; font-size:13px; max-width:520px">
-            <table>{rows}</table>
-            {'<hr style="margin:6px 0" />' if refs_html or buttons_html else ''}
-            {refs_html}
-            {buttons_html}
-        </div>
-        """
-
-    markers_fg = MarkerCluster(
-        name="Benchmark FIM Sites", show=True, disableClusteringAtZoom=10
-    )
-
-    for r in filtered:
-        # Robust centroid handling
-        cl = r.get("centroid")
-        if not cl:
-            lon_fb = r.get("centroid_lon")
-            lat_fb = r.get("centroid_lat")
-            if lon_fb is not None and lat_fb is not None:
-                cl = [lon_fb, lat_fb]
-
-        # final guard
-        if (
-            not isinstance(cl, (list, tuple))
-            or len(cl) < 2
-            or cl[0] is None
-            or cl[1] is None
-        ):
-            cl = [0.0, 0.0]
-
-        lon = float(cl[0] or 0.0)
-        lat = float(cl[1] or 0.0)
-
-        color = TIER_COLORS.get(r.get("tier"), DEFAULT_TIER_COLOR)
-        folium.CircleMarker(
-            location=[lat, lon],
-            radius=8,
-            color="black",
-            weight=1.5,
-            fill=True,
-            fill_color=color,
-            fill_opacity=0.9,
-            tooltip=f"{r.get('tier')} — {r.get('site')}",
-            popup=folium.Popup(popup_html(r), max_width=500),
-        ).add_to(markers_fg)
-
-    markers_fg.add_to(m)
-
-    # Vector tiles hosting from s3
-    if ss.fim_show:
-        allowed_tiers = list(set(sel_tiers))
-        date_min = int((start_date or dt.date(1900, 1, 1)).strftime("%Y%m%d"))
-        date_max = int((end_date or dt.date(2100, 1, 1)).strftime("%Y%m%d"))
-
+    # passed to st_folium separately so panning never re-mounts the map
+    if MARKER_MODE == "compact":
+        box, cap = None, 0
+    else:
+        view = ss.get("map_view") or default_viewport(ss.saved_center, ss.saved_zoom)
+        box, cap = padded(view), feature_cap_by_zoom(view.zoom)
+
+    # rendered once per (filter result, viewport box, cap) across sessions;
+    # passed to st_folium separately so panning never re-mounts the map
+    layer = marker_layer(ids_key, box, cap, index, filter_mask)
+    markers_fg = folium.FeatureGroup(name="Benchmark FIM Sites", show=True)
+    RenderedLayer(layer.js).add_to(markers_fg)
+
+    allowed_tiers = list(set(sel_tiers))
+    date_min = int((start_date or dt.date(1900, 1, 1)).strftime("%Y%m%d"))
+    date_max = int((end_date or dt.date(2100, 1, 1)).strftime("%Y%m%d"))
+    filtered_url = None
+
+    # Vector tiles hosting from s3; filters are not baked in (FilterState)
+    tile_urls = resolve_tile_urls() if ss.fim_show else None
+    if ss.fim_show and tile_urls is None:
+        st.warning("FIM extent tiles are unavailable right now (tile manifest unreachable).")
+    if tile_urls is not None:
         # Put the vector grid into a FeatureGroup so it appears in LayerControl
         vg_group = folium.FeatureGroup(name="Benchmark FIM Extents", show=True)
+        tiles_url, tier_tiles_url, max_native = tile_urls
+        if FILTERED_TILES_URL:
+            filtered_url = filtered_tiles_url(
+                FILTERED_TILES_URL, allowed_tiers, date_min, date_max, sel_rps
+            )
+            # the grid is built on the bare endpoint; the filtered URL is pushed
+            tiles_url, tier_tiles_url = FILTERED_TILES_URL, None
         vg = VectorGridProtobuf(
-            tiles_url="https://sdmlab.s3.amazonaws.com/FIM_Database/FIM_Viz/tiles/{z}/{x}/{y}.pbf",
+            tiles_url=tiles_url,
+            tier_tiles_url=tier_tiles_url,
             layer_name="fim_extents",
-            max_native=14,
-            allowed_tiers=allowed_tiers,
-            date_min=date_min,
-            date_max=date_max,
+            max_native=max_native,
+            renderer=EXTENT_RENDERER,
         )
         vg_group.add_child(vg)
         vg_group.add_to(m)
 
-    # Legend
+    # Legend (items are filled in by FilterState)
     legend_items = "".join(
         (
             lambda color: f"<div style='display:flex;align-items:center;margin-bottom:6px'>"
@@ -542,22 +848,53 @@ def render_map():
             f"margin-right:8px'></span>"
             f"<span style='font-size:14px'>{t}</span></div>"
         )(TIER_COLORS.get(t, DEFAULT_TIER_COLOR))
-        for t in sorted(set(r.get("tier") for r in filtered))
+        for t in (index.tiers[c] for c in np.unique(index.tier_code[filter_rows]))
     )
 
-    legend_html = f"""
+    legend_html = """
     <div style="position:fixed; z-index:9999; bottom:20px; right:20px; background:rgba(255,255,255,0.95);
                 padding:12px 14px; border-radius:10px; box-shadow:0 2px 6px rgba(0,0,0,0.3);">
       <div style="font-weight:600; font-size:14px; margin-bottom:8px">FIM Tiers</div>
-      {legend_items if legend_items else '<div style="font-size:13px;color:#666">No FIMs with this filter in any Tier</div>'}
+      <div id="fim-legend-items"></div>
     </div>
     """
     m.get_root().html.add_child(Element(legend_html))
 
-    folium.LayerControl(collapsed=False).add_to(m)
+    # filter channel: re-evaluated in place on every rerun, the map stays mounted
+    filter_fg = folium.FeatureGroup(name="Filters", control=False)
+    FilterState(
+        allowed_tiers,
+        date_min,
+        date_max,
+        legend_items
+        or '<div style="font-size:13px;color:#666">No FIMs with this filter in any Tier</div>',
+        tiles_url=filtered_url,
+    ).add_to(filter_fg)
 
     # Render in Streamlit
-    st_folium(m, width=None, height=720, key="fim_map", returned_objects=[])
+    out = st_folium(
+        m,
+        width=None,
+        height=720,
+        key="fim_map",
+        returned_objects=["bounds", "zoom"] if box is not None else [],
+        feature_group_to_add=[markers_fg, filter_fg],
+        layer_control=folium.LayerControl(collapsed=False),
+    )
+
+    # the map moved far enough to change the marker set: redraw the markers
+    reported = from_folium(out) if box is not None else None
+    if reported is not None:
+        ss.map_view = reported
+        if padded(reported) != box:
+            st.rerun(scope="fragment")
+
+    if layer.shown < len(filter_rows):
+        st.caption(
+            f"Showing {layer.shown:,} of {len(filter_rows):,} sites as markers — "
+            f"{layer.grouped:,} grouped in view, {layer.outside:,} outside the view. "
+            "Zoom in or pan to see more."
+        )
 
     if ss.filters_changed or not ss.map_built_once:
         ss.map_built_once = True
@@ -584,26 +921,6 @@ def dash(x):
     return x
 
 
-def to_date_key(r: dict) -> int:
-    ets = r.get("event_ts")
-    if isinstance(ets, (int, float)) and int(ets) > 0:
-        return int(ets)
-    for k in ("event_date", "date_ymd"):
-        v = r.get(k)
-        if isinstance(v, str) and v:
-            try:
-                d = dt.date.fromisoformat(v)
-                return int(d.strftime("%Y%m%d"))
-            except Exception:
-                pass
-    v = r.get("date_raw")
-    if isinstance(v, (int, float)) and int(v) > 0:
-        return int(v)
-    if isinstance(v, str) and v.isdigit():
-        return int(v)
-    return 0
-
-
 def nice_date_and_year(r: dict) -> tuple[str, str]:
     for k in ("event_date", "date_ymd"):
         v = r.get(k)
@@ -645,28 +962,62 @@ def row_from_record(r: dict) -> dict:
         "Platform": platform,
         "Download FIM (TIF)": dash(r.get("tif_url")),
         "Metadata (JSON)": dash(r.get("json_url") or r.get("metadata_url")),
-        "_DateKey": to_date_key(r),
     }
 
 
-table_rows = [row_from_record(r) for r in filtered]
-df_full = pd.DataFrame(table_rows)
+TABLE_COLUMNS = [
+    "River/Basin",
+    "State",
+    "Year",
+    "Date",
+    "Resolution (m)",
+    "HUC8",
+    "Quality",
+    "Platform",
+    "Download FIM (TIF)",
+    "Metadata (JSON)",
+]
+
+
+@st.cache_resource(show_spinner=False, max_entries=MAP_CACHE_ENTRIES)
+def table_order(
+    ids_key: str, _index: CatalogIndex, _filter_mask: np.ndarray
+) -> np.ndarray:
+    """
+    Filtered rows, newest first, shared by all sessions with the same filter;
+    the date order itself is computed once per catalog version
+    (CatalogIndex.date_order).
+    """
+    rows = _index.newest_first(_filter_mask)
+    rows.setflags(write=False)
+    return rows
 
-if not df_full.empty:
-    df_full = df_full.sort_values("_DateKey", ascending=False, kind="mergesort")
-    df_display = df_full.drop(columns=["_DateKey"])
-else:
-    df_display = df_full
+
+def full_records(rows: np.ndarray) -> List[Dict[str, Any]]:
+    """Records for rows, completed from the detail shards for the slim index."""
+    recs = index.take(rows)
+    if index.detail_shards:
+        recs = detail_store(ss.catalog_version, index.detail_shards).complete(recs)
+    return recs
+
+
+table_rows = table_order(ids_key, index, filter_mask)
 
 # Pagination
 ROWS_PER_PAGE = 50
 if "table_page" not in ss:
     ss.table_page = 0
 
-total_pages = max(1, (len(df_display) + ROWS_PER_PAGE - 1) // ROWS_PER_PAGE)
+total_pages = max(1, (len(table_rows) + ROWS_PER_PAGE - 1) // ROWS_PER_PAGE)
+ss.table_page = min(ss.table_page, total_pages - 1)
 start_idx = ss.table_page * ROWS_PER_PAGE
-end_idx = min(start_idx + ROWS_PER_PAGE, len(df_display))
-df_page = df_display.iloc[start_idx:end_idx]
+end_idx = min(start_idx + ROWS_PER_PAGE, len(table_rows))
+
+# only the visible page is turned into table rows
+df_page = pd.DataFrame(
+    [row_from_record(r) for r in full_records(table_rows[start_idx:end_idx])],
+    columns=TABLE_COLUMNS,
+)
 
 # Show current page
 st.markdown("# Benchmark FIM Records on Tabular View")
@@ -726,7 +1077,7 @@ with c3:
         st.rerun()
 
 st.caption(
-    f"Page {ss.table_page + 1} of {total_pages} — Showing {len(df_page):,} of {len(df_display):,} records"
+    f"Page {ss.table_page + 1} of {total_pages} — Showing {len(df_page):,} of {len(table_rows):,} records"
 )
 
 
@@ -737,13 +1088,16 @@ with st.sidebar:
     with colA:
         if st.button("Zoom −", use_container_width=True):
             ss.saved_zoom = max(2.0, float(ss.saved_zoom) - 1.0)
+            ss.map_view = None
             ss.filters_changed = True
     with colB:
         if st.button("Zoom +", use_container_width=True):
             ss.saved_zoom = min(18.0, float(ss.saved_zoom) + 1.0)
+            ss.map_view = None
             ss.filters_changed = True
 
     if st.button("Center on USA", use_container_width=True):
         ss.saved_center = [39.8283, -98.5795]
         ss.saved_zoom = 5.0
+        ss.map_view = None
         ss.filters_changed = True
@@ -0,0 +1,91 @@
+"""
+Per-record detail shards for the slim catalog index.
+
+build_catalog.py can publish the catalog as a slim catalog_index.parquet
+(what the map and the filters need) plus details/{nn}.json shards holding
+the full records. A record lives in shard detail_shard(id): FNV-1a (32-bit)
+of the UTF-8 id modulo the shard count, as two hex digits. The browser
+(map_markers.RecordPopups) computes the same hash.
+
+DetailShards fetches shards on demand (in parallel, through the disk-backed
+http_cache) and keeps the most recently used ones parsed in memory; one
+instance per catalog version is shared by all sessions. A shard that could
+not be fetched or parsed is not cached, so the next page retries it.
+"""
+
+from __future__ import annotations
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+FNV_OFFSET = 0x811C9DC5
+FNV_PRIME = 0x01000193
+DEFAULT_CACHED_SHARDS = 64
+FETCH_WORKERS = 8
+
+
+def detail_shard(record_id: Any, shards: int) -> str:
+    """Shard name ("00".."ff") of a record id; same hash as build_catalog.py."""
+    h = FNV_OFFSET
+    for b in str(record_id).encode("utf-8"):
+        h = ((h ^ b) * FNV_PRIME) & 0xFFFFFFFF
+    return f"{h % shards:02x}"
+
+
+class DetailShards:
+    def __init__(
+        self,
+        url_template: str,
+        shards: int,
+        fetch_bytes: Callable[[str], Optional[bytes]],
+        max_cached: int = DEFAULT_CACHED_SHARDS,
+    ):
+        """url_template has a {shard} placeholder; fetch_bytes returns None if missing."""
+        self.url_template = url_template
+        self.shards = shards
+        self._fetch_bytes = fetch_bytes
+        self.max_cached = max_cached
+        self._cache: "OrderedDict[str, Dict[str, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, shard: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Parsed shard; None if it could not be fetched or parsed (not cached)."""
+        try:
+            body = self._fetch_bytes(self.url_template.format(shard=shard))
+            return json.loads(body) if body else None
+        except Exception:  # the page still shows the slim record
+            return None
+
+    def _shards(self, names: Iterable[str]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        out: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        missing: List[str] = []
+        with self._lock:
+            for name in names:
+                if name in self._cache:
+                    self._cache.move_to_end(name)
+                    out[name] = self._cache[name]
+                elif name not in missing:
+                    missing.append(name)
+        if missing:
+            with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+                loaded = dict(zip(missing, pool.map(self._load, missing)))
+            with self._lock:
+                for name, shard in loaded.items():
+                    if shard is not None:  # failures are retried next time
+                        self._cache[name] = shard
+                        self._cache.move_to_end(name)
+                while len(self._cache) > self.max_cached:
+                    self._cache.popitem(last=False)
+            out.update((name, shard or {}) for name, shard in loaded.items())
+        return out
+
+    def complete(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """records (from the slim index) with their full detail record merged in."""
+        names = [detail_shard(r.get("id"), self.shards) for r in records]
+        shards = self._shards(names)
+        return [
+            {**r, **shards[name].get(str(r.get("id")), {})}
+            for r, name in zip(records, names)
+        ]
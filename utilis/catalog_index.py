@@ -0,0 +1,469 @@
+"""
+Columnar view of the catalog records for the map page filters.
+
+Built once per catalog version (the page holds it with st.cache_resource),
+so a rerun never walks the record dicts or parses dates again:
+
+- tier_code: int16 index into `tiers` (missing tier -> "Unknown_Tier")
+- site_code: int32 index into `sites` (missing site -> "")
+- event_ts: int32 YYYYMMDD from date_ymd, 0 when missing/invalid
+- rp_code: int16 index into `return_periods` (Tier_4 only), -1 when missing
+- lon / lat: float64 centroid (0, 0 when missing), with a lazily built
+  viewport.GridIndex for bounds queries
+- date_order: rows sorted newest first by the table's date key
+  (event_ts, else event_date/date_ymd, else date_raw), ties in catalog order
+- ids / records: row -> record mapping
+
+Filters are evaluated as NumPy boolean masks; the date range is resolved
+with searchsorted over a pre-sorted copy of event_ts.
+
+load_catalog() builds the index from catalog_index.parquet / catalog_core.parquet
+(CatalogIndex.from_arrow, no per-record dicts; rows are converted only when
+the page asks for them) or from catalog_core.json. catalog_digest() reads
+the JSON digest a Parquet copy was stamped with, so the page only uses a
+copy built from the published JSON. The slim catalog_index
+carries only the map/filter columns; detail_shards > 0 says the full records
+are in catalog_details shards.
+
+An index is shared by every session of the process, so it is read-only:
+the arrays are flagged non-writeable and the record/tier/return period
+sequences are tuples (or an Arrow table). With arrow_dir, a Parquet catalog
+is memory-mapped from an Arrow IPC file so all server processes on the host
+share one page-cache copy of the records.
+"""
+
+from __future__ import annotations
+import datetime as dt
+import hashlib
+import json
+import os
+import tempfile
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from utilis.viewport import GridIndex
+
+UNKNOWN_TIER = "Unknown_Tier"
+SYNTHETIC_TIER = "Tier_4"
+PARQUET_MAGIC = b"PAR1"
+
+
+def _ymd_int(iso: Any) -> int:
+    if not iso:
+        return 0
+    try:
+        d = dt.date.fromisoformat(iso)
+    except (TypeError, ValueError):
+        return 0
+    return d.year * 10000 + d.month * 100 + d.day
+
+
+def _centroid(r: Dict[str, Any]) -> tuple:
+    cl = r.get("centroid")
+    if not cl:
+        lon_fb = r.get("centroid_lon")
+        lat_fb = r.get("centroid_lat")
+        if lon_fb is not None and lat_fb is not None:
+            cl = [lon_fb, lat_fb]
+    if (
+        not isinstance(cl, (list, tuple))
+        or len(cl) < 2
+        or cl[0] is None
+        or cl[1] is None
+    ):
+        return 0.0, 0.0
+    try:
+        return float(cl[0] or 0.0), float(cl[1] or 0.0)
+    except (TypeError, ValueError):
+        return 0.0, 0.0
+
+
+def _date_key(r: Dict[str, Any]) -> int:
+    ets = r.get("event_ts")
+    if isinstance(ets, (int, float)) and int(ets) > 0:
+        return int(ets)
+    for k in ("event_date", "date_ymd"):
+        v = r.get(k)
+        if isinstance(v, str) and v:
+            key = _ymd_int(v)
+            if key:
+                return key
+    v = r.get("date_raw")
+    if isinstance(v, (int, float)) and int(v) > 0:
+        return int(v)
+    if isinstance(v, str) and v.isdigit():
+        return int(v)
+    return 0
+
+
+def _ymd_date(v: int) -> dt.date:
+    return dt.date(v // 10000, v // 100 % 100, v % 100)
+
+
+def _arrow_column(table: pa.Table, name: str, type_: pa.DataType) -> pa.Array:
+    if name not in table.column_names:
+        return pa.nulls(table.num_rows, type_)
+    return table.column(name).combine_chunks().cast(type_)
+
+
+def _arrow_ymd_int(col: pa.Array) -> np.ndarray:
+    """_ymd_int over a string column."""
+    ts = pc.strptime(col, format="%Y-%m-%d", unit="s", error_is_null=True)
+    ymd = pc.add(
+        pc.add(pc.multiply(pc.year(ts), 10000), pc.multiply(pc.month(ts), 100)),
+        pc.day(ts),
+    )
+    return pc.fill_null(ymd, 0).to_numpy().astype(np.int32)
+
+
+class ArrowRecords(Sequence):
+    """Read-only record dicts over an Arrow table, converted on access."""
+
+    def __init__(self, table: pa.Table):
+        self.table = table
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.take(np.arange(len(self))[i])
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.table.slice(i, 1).to_pylist()[0]
+
+    def take(self, rows: np.ndarray) -> List[Dict[str, Any]]:
+        return self.table.take(pa.array(rows, pa.int64())).to_pylist()
+
+
+class CatalogIndex:
+    def __init__(
+        self,
+        records: Sequence[Dict[str, Any]],
+        errors: Optional[List[Any]] = None,
+    ):
+        self.records: Sequence[Dict[str, Any]] = tuple(records)
+        self.errors: Sequence[Any] = tuple(errors or ())
+        self.detail_shards = 0
+        n = len(self.records)
+
+        tier_names = [r.get("tier") or UNKNOWN_TIER for r in self.records]
+        tiers = sorted(set(tier_names))
+        tier_pos = {t: i for i, t in enumerate(tiers)}
+        tier_code = np.fromiter(
+            (tier_pos[t] for t in tier_names), dtype=np.int16, count=n
+        )
+
+        site_names = [str(r.get("site") or "") for r in self.records]
+        sites = sorted(set(site_names))
+        site_pos = {v: i for i, v in enumerate(sites)}
+        site_code = np.fromiter(
+            (site_pos[v] for v in site_names), dtype=np.int32, count=n
+        )
+
+        event_ts = np.fromiter(
+            (_ymd_int(r.get("date_ymd")) for r in self.records),
+            dtype=np.int32,
+            count=n,
+        )
+
+        synthetic = tier_code == tier_pos.get(SYNTHETIC_TIER, -1)
+        rps = [
+            r.get("return_period") if s else None
+            for r, s in zip(self.records, synthetic.tolist())
+        ]
+        return_periods = sorted({v for v in rps if v is not None})
+        rp_pos = {v: i for i, v in enumerate(return_periods)}
+        rp_code = np.fromiter(
+            (rp_pos.get(v, -1) if v is not None else -1 for v in rps),
+            dtype=np.int16,
+            count=n,
+        )
+
+        xy = np.array([_centroid(r) for r in self.records], dtype=np.float64)
+        xy = xy.reshape(n, 2)
+
+        ids = np.array([str(r.get("id")) for r in self.records], dtype=object)
+
+        date_key = np.fromiter(
+            (_date_key(r) for r in self.records), dtype=np.int64, count=n
+        )
+        self._set_columns(
+            tiers,
+            tier_code,
+            sites,
+            site_code,
+            synthetic,
+            event_ts,
+            return_periods,
+            rp_code,
+            xy[:, 0],
+            xy[:, 1],
+            ids,
+            date_key,
+        )
+
+    @classmethod
+    def from_arrow(cls, table: pa.Table) -> "CatalogIndex":
+        """
+        Same index from a catalog table (catalog_core.parquet) with Arrow
+        compute kernels; the records stay in the table (ArrowRecords).
+        Errors come from the "errors" schema metadata entry.
+        """
+        self = cls.__new__(cls)
+        self.records = ArrowRecords(table)
+        meta = table.schema.metadata or {}
+        self.errors = tuple(json.loads(meta.get(b"errors", b"[]")))
+        self.detail_shards = int(json.loads(meta.get(b"detail_shards", b"0")))
+        n = table.num_rows
+
+        tier = _arrow_column(table, "tier", pa.string())
+        tier = pc.if_else(pc.fill_null(pc.equal(tier, ""), True), UNKNOWN_TIER, tier)
+        enc = pc.dictionary_encode(tier)
+        names = enc.dictionary.to_pylist()
+        tiers = sorted(names)
+        remap = np.array([tiers.index(t) for t in names], dtype=np.int16)
+        tier_code = remap[enc.indices.to_numpy()] if n else np.zeros(0, np.int16)
+
+        site = pc.fill_null(_arrow_column(table, "site", pa.string()), "")
+        enc = pc.dictionary_encode(site)
+        sites = enc.dictionary.to_pylist()
+        site_code = (
+            enc.indices.to_numpy().astype(np.int32) if n else np.zeros(0, np.int32)
+        )
+
+        # the slim index has event_ts (YYYYMMDD of date_ymd) but no date_ymd
+        event_ts = _arrow_ymd_int(_arrow_column(table, "date_ymd", pa.string()))
+        ets = pc.fill_null(_arrow_column(table, "event_ts", pa.int64()), 0).to_numpy()
+        event_ts = np.where(event_ts > 0, event_ts, ets).astype(np.int32)
+
+        synthetic = tier_code == (
+            tiers.index(SYNTHETIC_TIER) if SYNTHETIC_TIER in tiers else -1
+        )
+        rp = _arrow_column(table, "return_period", pa.int64())
+        rp_ok = synthetic & pc.is_valid(rp).to_numpy(zero_copy_only=False)
+        rp_vals = pc.fill_null(rp, 0).to_numpy()[rp_ok]
+        uniq = np.unique(rp_vals)
+        rp_code = np.full(n, -1, dtype=np.int16)
+        rp_code[rp_ok] = np.searchsorted(uniq, rp_vals)
+
+        lon = np.zeros(n, dtype=np.float64)
+        lat = np.zeros(n, dtype=np.float64)
+        cen = _arrow_column(table, "centroid", pa.list_(pa.float64()))
+        ok = pc.fill_null(pc.list_value_length(cen), 0).to_numpy() >= 2
+        if ok.any():
+            start = cen.offsets.to_numpy()[:-1][ok]
+            vals = cen.values.to_numpy(zero_copy_only=False)
+            lon[ok] = vals[start]
+            lat[ok] = vals[start + 1]
+        if {"centroid_lon", "centroid_lat"} <= set(table.column_names):
+            fb_lon = _arrow_column(table, "centroid_lon", pa.float64())
+            fb_lat = _arrow_column(table, "centroid_lat", pa.float64())
+            fb = ~ok & pc.and_(pc.is_valid(fb_lon), pc.is_valid(fb_lat)).to_numpy(
+                zero_copy_only=False
+            )
+            lon[fb] = fb_lon.to_numpy(zero_copy_only=False)[fb]
+            lat[fb] = fb_lat.to_numpy(zero_copy_only=False)[fb]
+        lon = np.nan_to_num(lon, nan=0.0)
+        lat = np.nan_to_num(lat, nan=0.0)
+
+        ids = pc.fill_null(_arrow_column(table, "id", pa.string()), "None")
+        ids = ids.to_numpy(zero_copy_only=False).astype(object)
+
+        date_key = ets
+        for name in ("event_date", "date_ymd"):
+            if name in table.column_names:
+                alt = _arrow_ymd_int(_arrow_column(table, name, pa.string()))
+                date_key = np.where(date_key > 0, date_key, alt)
+
+        self._set_columns(
+            tiers,
+            tier_code,
+            sites,
+            site_code,
+            synthetic,
+            event_ts,
+            uniq.tolist(),
+            rp_code,
+            lon,
+            lat,
+            ids,
+            date_key,
+        )
+        return self
+
+    def _set_columns(
+        self,
+        tiers: List[str],
+        tier_code: np.ndarray,
+        sites: List[str],
+        site_code: np.ndarray,
+        synthetic: np.ndarray,
+        event_ts: np.ndarray,
+        return_periods: List[Any],
+        rp_code: np.ndarray,
+        lon: np.ndarray,
+        lat: np.ndarray,
+        ids: np.ndarray,
+        date_key: np.ndarray,
+    ):
+        self.tiers: Sequence[str] = tuple(tiers)
+        self.tier_code = tier_code
+        self.sites: Sequence[str] = tuple(sites)
+        self.site_code = site_code
+        self.event_ts = event_ts
+        self.return_periods: Sequence[Any] = tuple(return_periods)
+        self.rp_code = rp_code
+        self.synthetic = synthetic
+        self.lon = np.ascontiguousarray(lon, dtype=np.float64)
+        self.lat = np.ascontiguousarray(lat, dtype=np.float64)
+        self.ids = ids
+        self.date_order = np.argsort(-date_key, kind="stable")
+
+        # non-synthetic rows with a usable date, sorted for range lookups
+        dated = np.flatnonzero(~synthetic & (self.event_ts > 0))
+        order = np.argsort(self.event_ts[dated], kind="stable")
+        self.date_rows = dated[order]
+        self.date_sorted = self.event_ts[self.date_rows]
+
+        for a in (
+            self.tier_code,
+            self.site_code,
+            self.synthetic,
+            self.event_ts,
+            self.rp_code,
+            self.lon,
+            self.lat,
+            self.ids,
+            self.date_order,
+            self.date_rows,
+            self.date_sorted,
+        ):
+            a.setflags(write=False)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @cached_property
+    def grid(self) -> GridIndex:
+        return GridIndex(self.lon, self.lat)
+
+    @property
+    def date_bounds(self) -> Optional[tuple]:
+        """(min, max) event date of the non-synthetic records, or None."""
+        if not len(self.date_sorted):
+            return None
+        return _ymd_date(int(self.date_sorted[0])), _ymd_date(int(self.date_sorted[-1]))
+
+    def date_mask(self, start: dt.date, end: dt.date) -> np.ndarray:
+        lo = start.year * 10000 + start.month * 100 + start.day
+        hi = end.year * 10000 + end.month * 100 + end.day
+        i = np.searchsorted(self.date_sorted, lo, side="left")
+        j = np.searchsorted(self.date_sorted, hi, side="right")
+        mask = np.zeros(len(self.records), dtype=bool)
+        mask[self.date_rows[i:j]] = True
+        return mask
+
+    def _codes(self, names: Iterable[Any], values: Sequence[Any]) -> np.ndarray:
+        pos = {v: i for i, v in enumerate(values)}
+        return np.array([pos[v] for v in names if v in pos], dtype=np.int16)
+
+    def mask(
+        self,
+        tiers: Iterable[str],
+        date_range: Optional[tuple] = None,
+        rps: Optional[Iterable[Any]] = None,
+    ) -> np.ndarray:
+        """
+        Rows passing the page filters: selected tier, then return period for
+        Tier_4 (None = any) or date_range (start, end) for the rest (None = any).
+        """
+        keep = np.isin(self.tier_code, self._codes(tiers, self.tiers))
+        if rps is not None:
+            rp_ok = np.isin(self.rp_code, self._codes(rps, self.return_periods))
+            keep &= ~self.synthetic | rp_ok
+        if date_range is not None:
+            keep &= self.synthetic | self.date_mask(*date_range)
+        return keep
+
+    def rows(self, mask: np.ndarray) -> np.ndarray:
+        return np.flatnonzero(mask)
+
+    def newest_first(self, mask: np.ndarray) -> np.ndarray:
+        """Rows of mask in table order (newest first)."""
+        order = self.date_order
+        return order[mask[order]]
+
+    def take(self, rows: np.ndarray) -> List[Dict[str, Any]]:
+        recs = self.records
+        if isinstance(recs, ArrowRecords):
+            return recs.take(rows)
+        return [recs[i] for i in rows.tolist()]
+
+
+def _mapped_table(body: bytes, arrow_dir: Path) -> pa.Table:
+    """
+    The Parquet catalog as an uncompressed Arrow IPC file in arrow_dir (one
+    per content digest, written once with an atomic rename), memory-mapped.
+    """
+    digest = hashlib.blake2b(body, digest_size=12).hexdigest()
+    path = arrow_dir / f"catalog-{digest}.arrow"
+    if not path.exists():
+        table = pq.read_table(pa.BufferReader(body))
+        # the IPC file format allows one dictionary per column
+        table = table.unify_dictionaries().combine_chunks()
+        fd, tmp = tempfile.mkstemp(dir=arrow_dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f, pa.ipc.new_file(f, table.schema) as w:
+                w.write_table(table)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        # processes still mapping an old version keep their pages
+        for old in arrow_dir.glob("catalog-*.arrow"):
+            if old != path:
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
+    return pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+
+
+def catalog_digest(body: bytes) -> Optional[str]:
+    """
+    sha256 of the catalog_core.json a Parquet catalog was built with (the
+    "catalog_sha256" schema metadata from build_catalog.py); None for JSON
+    bodies, unstamped and unreadable files.
+    """
+    if body[:4] != PARQUET_MAGIC:
+        return None
+    try:
+        meta = pq.read_schema(pa.BufferReader(body)).metadata or {}
+    except pa.ArrowException:
+        return None
+    value = meta.get(b"catalog_sha256")
+    return json.loads(value) if value else None
+
+
+def load_catalog(body: bytes, arrow_dir: Optional[Path] = None) -> CatalogIndex:
+    """Index from catalog_core.parquet or catalog_core.json bytes."""
+    if body[:4] == PARQUET_MAGIC:
+        if arrow_dir is not None:
+            table = _mapped_table(body, Path(arrow_dir))
+        else:
+            table = pq.read_table(pa.BufferReader(body))
+        return CatalogIndex.from_arrow(table)
+    data = json.loads(body)
+    return CatalogIndex(data.get("records", []), data.get("errors", []))
@@ -0,0 +1,95 @@
+"""
+Stale-while-revalidate catalog for the Streamlit app.
+
+One CatalogRefresher per process (held with st.cache_resource) polls the
+catalog on an interval in a daemon thread. Each poll is a conditional GET
+(see utilis.http_cache), so an unchanged catalog costs a 304 and no parse.
+When the bytes change, the new catalog is parsed off the request path (by
+`parse`, json.loads unless given) and swapped in as a new immutable
+CatalogSnapshot in a single assignment.
+
+Sessions read snapshot() and never block on the network once the first
+snapshot exists; a session notices a new version by comparing
+snapshot().version with the version it last rendered.
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, NamedTuple, Optional
+
+log = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL_S = 180.0
+
+
+class CatalogSnapshot(NamedTuple):
+    version: str  # digest of the catalog bytes
+    fetched_at: float
+    data: Any  # parse(body)
+
+
+class CatalogRefresher:
+    def __init__(
+        self,
+        fetch_bytes: Callable[[], bytes],
+        interval_s: float = DEFAULT_INTERVAL_S,
+        parse: Callable[[bytes], Any] = json.loads,
+    ):
+        self._fetch_bytes = fetch_bytes
+        self._parse = parse
+        self.interval_s = interval_s
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_error: Optional[str] = None
+        self.last_checked: Optional[float] = None
+
+    def start(self) -> "CatalogRefresher":
+        """Load the first snapshot (blocking, once per process) and start polling."""
+        if self._snapshot is None:
+            self.refresh_now()
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="catalog-refresh", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self) -> CatalogSnapshot:
+        snap = self._snapshot
+        if snap is None:
+            # start() failed earlier; try once more on the caller's thread
+            self.refresh_now()
+            snap = self._snapshot
+        return snap
+
+    def refresh_now(self) -> bool:
+        """Poll immediately; True if a new version was swapped in."""
+        with self._refresh_lock:
+            body = self._fetch_bytes()
+            self.last_checked = time.time()
+            version = hashlib.blake2b(body, digest_size=12).hexdigest()
+            current = self._snapshot
+            if current is not None and current.version == version:
+                return False
+            data = self._parse(body)
+            self._snapshot = CatalogSnapshot(version, time.time(), data)
+            return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            try:
+                if self.refresh_now():
+                    log.info("catalog updated to %s", self._snapshot.version)
+                self.last_error = None
+            except Exception as e:  # keep serving the current snapshot
+                self.last_error = str(e)
+                log.warning("catalog refresh failed: %s", e)
@@ -0,0 +1,111 @@
+"""
+Disk-backed cache for the catalog JSON, shared by every process on the host.
+
+Each URL is stored as one file: a JSON header line (url, etag,
+last_modified, saved_at) followed by the raw body. Writes go to a temp file
+in the same directory and are swapped in with os.replace, so concurrent
+Streamlit workers never see a half-written entry.
+
+conditional_get() revalidates a cached entry with If-None-Match /
+If-Modified-Since; an unchanged object costs a 304 with no body. If the
+origin is unreachable or answers 5xx the cached body is served stale.
+
+Location: $FIM_CACHE_DIR, else ~/.cache/fimbench.
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import requests
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+def cache_dir() -> Path:
+    root = os.environ.get("FIM_CACHE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "fimbench"
+    )
+    path = Path(root)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _entry_path(url: str) -> Path:
+    return cache_dir() / (hashlib.sha1(url.encode("utf-8")).hexdigest() + ".cache")
+
+
+def load(url: str) -> Optional[CachedBody]:
+    try:
+        with open(_entry_path(url), "rb") as f:
+            header = json.loads(f.readline())
+            body = f.read()
+    except (OSError, ValueError):
+        return None
+    if header.get("url") != url:
+        return None
+    return CachedBody(body, header.get("etag"), header.get("last_modified"))
+
+
+def store(url: str, body: bytes, etag: Optional[str], last_modified: Optional[str]):
+    header = {
+        "url": url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "saved_at": time.time(),
+    }
+    path = _entry_path(url)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            f.write(body)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def conditional_get(
+    url: str, timeout: float = 120, allow_missing: bool = False
+) -> Optional[bytes]:
+    """
+    Body of `url` (decoded if served with Content-Encoding), from the disk
+    cache when the origin answers 304 (or fails with a 5xx). With
+    allow_missing, 403/404 return None (S3 answers 403 for missing keys when
+    listing is not public).
+    """
+    cached = load(url)
+    headers = {}
+    if cached is not None:
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+
+    try:
+        r = requests.get(url, headers=headers, timeout=timeout)
+    except requests.RequestException:
+        if cached is not None:
+            return cached.body
+        raise
+
+    if cached is not None and (r.status_code == 304 or r.status_code >= 500):
+        return cached.body
+    if allow_missing and r.status_code in (403, 404):
+        return None
+    r.raise_for_status()
+    store(url, r.content, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+    return r.content
@@ -0,0 +1,327 @@
+"""
+Marker rendering for the map page.
+
+- popup_placeholder / RecordPopups: popups carry only the record id; the
+  details (table, references, download buttons) are looked up in the
+  browser when a popup opens, through one cached lookup shared with the
+  VectorGrid click handler (one detail shard per lookup when the catalog
+  is published as a slim index, see utilis.catalog_details)
+- render_layer / RenderedLayer: a marker layer's children rendered to JS
+  once, so the page can memoize it and re-attach it to each rerun's map
+- compact_payload / CompactMarkers: every filtered site sent once as a
+  columnar array (id, lon, lat, tier and site codes); the markers are
+  created in the browser as L.circleMarker on one shared canvas renderer,
+  so Python build time and HTML size stay a few bytes per site instead of
+  a full CircleMarker + popup each
+"""
+
+from __future__ import annotations
+import html
+import json
+from typing import Any, Dict, Optional, Sequence
+
+import folium
+import numpy as np
+from branca.element import MacroElement
+from jinja2 import Template
+from streamlit_folium import generate_leaflet_string
+
+# ~1 m at the equator; plenty for a site marker
+COORD_DECIMALS = 5
+# how a pre-rendered layer's children refer to their FeatureGroup
+LAYER_ID = "fimlayer"
+
+
+def popup_placeholder(fid: Any) -> str:
+    """Popup body carrying only the record id; RecordPopups fills it on open."""
+    return (
+        f"<div data-fim-id=\"{html.escape(str(fid), quote=True)}\" "
+        "style='font:13px system-ui;min-width:160px'>Loading details…</div>"
+    )
+
+
+class RecordPopups(MacroElement):
+    """
+    Shared lazy record lookup for the map, added once to the folium.Map.
+
+    window.__fimRecord(fid) fetches the record's details/{nn}.json shard
+    when details_url is set (same FNV-1a hash as catalog_details), else the
+    whole catalog (gzip variant first) indexed by feature_id/id; either is
+    cached for the page, so marker popups and the VectorGrid click handler
+    share the downloads. A failed download is not cached: the promise
+    rejects and the next lookup fetches again.
+    Any popup whose content is a popup_placeholder() is filled with the
+    full record (table, references, download buttons) when it opens.
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+        (function(){
+          var map        = {{ this._parent.get_name() }};
+          var catalogUrl = {{ this.catalog_url|tojson }};
+          var detailsUrl = {{ this.details_url|tojson }};
+          var shards     = {{ this.shards }};
+          var catalogIdx = null;
+          var shardRecs  = {};
+
+          function shardName(fid){
+            // FNV-1a (32-bit) of the UTF-8 id, like catalog_details.detail_shard
+            var bytes = new TextEncoder().encode(String(fid));
+            var h = 0x811c9dc5;
+            for (var i = 0; i < bytes.length; i++) {
+              h = Math.imul(h ^ bytes[i], 0x01000193) >>> 0;
+            }
+            var n = h % shards;
+            return (n < 16 ? "0" : "") + n.toString(16);
+          }
+
+          function shardRecord(fid){
+            var name = shardName(fid);
+            if (!shardRecs[name]) {
+              shardRecs[name] = fetch(detailsUrl + "/" + name + ".json")
+                .then(function(r){
+                  if (r.ok) return r.json();
+                  delete shardRecs[name];  // not cached: the next lookup asks again
+                  if (r.status === 403 || r.status === 404) return {};
+                  throw new Error("HTTP " + r.status);
+                })
+                .catch(function(err){ delete shardRecs[name]; throw err; });
+            }
+            return shardRecs[name].then(function(recs){ return recs[String(fid)] || null; });
+          }
+
+          window.__fimRecord = function(fid){
+            if (fid === undefined || fid === null) return Promise.resolve(null);
+            if (detailsUrl && shards) return shardRecord(fid);
+            if (!catalogUrl) return Promise.resolve(null);
+            if (!catalogIdx) {
+              catalogIdx = fetch(catalogUrl + ".gz")
+                .then(function(r){ return r.ok ? r : fetch(catalogUrl); })
+                .then(function(r){ return r.json(); })
+                .then(function(core){
+                  var idx = {};
+                  (core.records || []).forEach(function(r){
+                    if (r.id !== undefined) idx[String(r.id)] = r;
+                    if (r.feature_id !== undefined) idx[String(r.feature_id)] = r;
+                  });
+                  return idx;
+                })
+                .catch(function(err){ catalogIdx = null; throw err; });
+            }
+            return catalogIdx.then(function(idx){ return idx[String(fid)] || null; });
+          };
+
+          function v(x){ return (x === undefined || x === null) ? "" : x; }
+
+          function button(href, label, bg, last){
+            return '<a href="' + href + '" target="_blank" rel="noopener" ' +
+              'style="text-decoration:none;display:block;background:' + bg + ';color:#fff;' +
+              'padding:8px 10px;border-radius:6px;font-weight:600;' + (last ? '' : 'margin:0 0 8px;') + '">' +
+              label + '</a>';
+          }
+
+          window.__fimPopupHtml = function(r){
+            var tifUrl  = r.tif_url;
+            var gpkgUrl = r.gpkg_url || r.gpkgurl;
+            var jsonUrl = r.json_url || r.metadata_url;
+            var fields = [
+              ["File Name", r.file_name],
+              ["Resolution (m)", r.resolution_m],
+              ["State", r.state],
+              ["Description", r.description],
+              ["River Basin Name", r.basin || r.river_basin],
+              ["Source", r.source],
+              ["Date", r.date_ymd || r.date_of_flood],
+              ["Return Period (years)", r.tier === "Tier_4" ? r.return_period : null],
+              ["Quality", r.quality],
+              ["HUC ID", r.huc8 || r.huc12 || r.huc6 || r.huc4 || r.huc2]
+            ];
+            var rows = fields.map(function(f){
+              return "<tr><th style='text-align:left;vertical-align:top;padding-right:8px'>" + f[0] +
+                     "</th><td style='text-align:left'>" + v(f[1]) + "</td></tr>";
+            }).join("");
+
+            var refs = r.references || [];
+            var refsHtml = "";
+            if (refs.length) {
+              refsHtml = "<div style='margin-top:6px'><b>References</b><div style='margin:4px 0;padding-left:12px'>" +
+                refs.map(function(ref){ return "<div style='margin-bottom:6px'>" + ref + "</div>"; }).join("") +
+                "</div></div>";
+            }
+
+            // Two-column buttons: left (TIF + JSON), right (GPKG)
+            var left = "";
+            if (tifUrl) left += button(tifUrl, "⬇ Download Benchmark FIM (.tif)", "#2563eb", false);
+            if (jsonUrl) left += button(jsonUrl, "⬇ Download Metadata (.json)", "#059669", true);
+            var right = gpkgUrl ? button(gpkgUrl, "⬇ Download Benchmark FIM (.gpkg)", "#374151", true) : "";
+            var buttonsHtml = (left || right)
+              ? '<div style="display:flex;gap:10px;margin-top:6px;">' +
+                '<div style="flex:1;min-width:0;">' + left + '</div>' +
+                '<div style="flex:1;min-width:0;">' + right + '</div></div>'
+              : "";
+
+            return '<div style="font-family:system-ui,-apple-system,Segoe UI,Roboto,Arial,sans-serif; font-size:13px; max-width:520px">' +
+              "<table>" + rows + "</table>" +
+              ((refsHtml || buttonsHtml) ? '<hr style="margin:6px 0" />' : "") +
+              refsHtml + buttonsHtml + "</div>";
+          };
+
+          map.on("popupopen", function(e){
+            var el = e.popup.getElement && e.popup.getElement();
+            var holder = el && el.querySelector("[data-fim-id]");
+            if (!holder || holder.getAttribute("data-loaded")) return;
+            var fid = holder.getAttribute("data-fim-id");
+            window.__fimRecord(fid).then(function(rec){
+              holder.setAttribute("data-loaded", "1");
+              holder.innerHTML = rec ? window.__fimPopupHtml(rec) : "No details found for " + fid;
+              e.popup.update();
+            }, function(){
+              // not marked loaded: reopening the popup retries the lookup
+              holder.innerHTML = "Could not load details for " + fid + " — reopen to retry.";
+              e.popup.update();
+            });
+          });
+        })();
+        {% endmacro %}
+    """
+    )
+
+    def __init__(
+        self,
+        catalog_url: Optional[str],
+        details_url: Optional[str] = None,
+        shards: int = 0,
+    ):
+        super().__init__()
+        self._name = "RecordPopups"
+        self.catalog_url = catalog_url
+        self.details_url = details_url
+        self.shards = int(shards)
+
+
+def compact_payload(
+    ids: np.ndarray,
+    lon: np.ndarray,
+    lat: np.ndarray,
+    tier_code: np.ndarray,
+    tiers: Sequence[str],
+    site_code: np.ndarray,
+    sites: Sequence[str],
+    rows: np.ndarray,
+) -> Dict[str, Any]:
+    """
+    Columnar marker data for rows (CatalogIndex columns). Sites are
+    dictionary-coded like tiers, restricted to the ones rows refer to.
+    """
+    used, site = np.unique(site_code[rows], return_inverse=True)
+    return {
+        "tiers": list(tiers),
+        "sites": [sites[c] for c in used.tolist()],
+        "id": ids[rows].tolist(),
+        "lon": np.round(lon[rows], COORD_DECIMALS).tolist(),
+        "lat": np.round(lat[rows], COORD_DECIMALS).tolist(),
+        "tier": tier_code[rows].tolist(),
+        "site": site.reshape(-1).tolist(),
+    }
+
+
+class CompactMarkers(MacroElement):
+    """Builds the markers of a compact_payload client-side, into the parent layer."""
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+        (function(){
+          var layer    = {{ this._parent.get_name() }};
+          var data     = {{ this.payload|safe }};
+          var colorMap = {{ this.tier_colors|safe }};
+          var defaultC = {{ this.default_color|tojson }};
+          var renderer = L.canvas({ padding: 0.5 });
+
+          var fill = data.tiers.map(function(t){ return colorMap[t] || defaultC; });
+          for (var i = 0; i < data.id.length; i++) {
+            var mk = L.circleMarker([data.lat[i], data.lon[i]], {
+              renderer: renderer,
+              radius: {{ this.radius }},
+              color: "black",
+              weight: 1,
+              fill: true,
+              fillColor: fill[data.tier[i]],
+              fillOpacity: 0.9
+            });
+            mk.options.fid = data.id[i];
+            mk.options.tier = data.tiers[data.tier[i]];
+            mk.options.site = data.sites[data.site[i]];
+            layer.addLayer(mk);
+          }
+
+          // popups only carry the id; RecordPopups fills them on open
+          layer.on("click", function(e){
+            var mk = e.layer;
+            if (!mk || !mk.options.fid) return;
+            var holder = document.createElement("div");
+            holder.setAttribute("data-fim-id", mk.options.fid);
+            holder.style.cssText = "font:13px system-ui;min-width:160px";
+            holder.textContent = "Loading details…";
+            L.popup({ maxWidth: 500 }).setLatLng(e.latlng).setContent(holder).openOn(layer._map);
+          });
+
+          // tooltips are bound on first hover instead of once per marker
+          layer.on("mouseover", function(e){
+            var mk = e.layer;
+            if (!mk || mk.getTooltip()) return;
+            var label = mk.options.site || mk.options.fid;
+            mk.bindTooltip(mk.options.tier + " — " + label).openTooltip(e.latlng);
+          });
+        })();
+        {% endmacro %}
+    """
+    )
+
+    def __init__(
+        self,
+        payload: Dict[str, Any],
+        tier_colors: Dict[str, str],
+        default_color: str,
+        radius: int = 6,
+    ):
+        super().__init__()
+        self._name = "CompactMarkers"
+        self.payload = json.dumps(payload, separators=(",", ":"))
+        self.tier_colors = json.dumps(tier_colors)
+        self.default_color = default_color
+        self.radius = int(radius)
+
+
+def render_layer(fg: folium.FeatureGroup) -> str:
+    """
+    JS of fg's children, referring to the group as feature_group_{LAYER_ID}.
+    Consumes fg (its ids are rewritten); wrap the result in RenderedLayer.
+    """
+    fg._id = LAYER_ID
+    return "\n".join(
+        generate_leaflet_string(child, base_id=f"{LAYER_ID}_{i}")
+        for i, child in enumerate(fg._children.values())
+    )
+
+
+class RenderedLayer(MacroElement):
+    """Replays render_layer() output into the parent FeatureGroup."""
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+        (function(){
+          var feature_group_{{ this.layer_id }} = {{ this._parent.get_name() }};
+          {{ this.js }}
+        })();
+        {% endmacro %}
+    """
+    )
+
+    def __init__(self, js: str):
+        super().__init__()
+        self._name = "RenderedLayer"
+        self.layer_id = LAYER_ID
+        self.js = js
@@ -1,16 +1,29 @@
 from __future__ import annotations
 import json, re, datetime as dt
-from typing import Dict, List, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Any, Optional, Tuple
 import boto3
 from botocore import UNSIGNED
 from botocore.config import Config
+from botocore.exceptions import ClientError
 import streamlit as st
 
+from utilis import http_cache
+
+
+# concurrent get_object calls in build_catalog; the client's connection pool
+# is sized to match so workers never wait on a connection
+FETCH_WORKERS = 16
+
 
 # CACHED RESOURCES
 @st.cache_resource
 def _s3_client():
-    return boto3.client("s3", config=Config(signature_version=UNSIGNED))
+    # boto3 clients are thread-safe; one is shared by all fetch workers
+    return boto3.client(
+        "s3",
+        config=Config(signature_version=UNSIGNED, max_pool_connections=FETCH_WORKERS),
+    )
 
 
 # HELPERS
@@ -66,16 +79,41 @@ def _lenient_json_parse(raw: str) -> Dict[str, Any]:
     return json.loads(text)
 
 
-def _fetch_json(bucket: str, key: str) -> Dict[str, Any]:
+def _get_object_cached(s3, bucket: str, key: str) -> bytes:
+    """
+    Object body via the shared disk cache (utilis.http_cache): a cached copy
+    is revalidated with IfNoneMatch and reused on 304 Not Modified.
+    """
+    cache_key = f"s3://{bucket}/{key}"
+    cached = http_cache.load(cache_key)
+    kwargs = {"IfNoneMatch": cached.etag} if cached is not None and cached.etag else {}
+    try:
+        resp = s3.get_object(Bucket=bucket, Key=key, **kwargs)
+    except ClientError as e:
+        status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        if cached is not None and status == 304:
+            return cached.body
+        raise
+    body = resp["Body"].read()
+    last_modified = resp.get("LastModified")
+    http_cache.store(
+        cache_key,
+        body,
+        resp.get("ETag"),
+        last_modified.isoformat() if last_modified is not None else None,
+    )
+    return body
+
+
+def _fetch_json(bucket: str, key: str, s3=None) -> Dict[str, Any]:
     """
     Fetch JSON from S3 and parse it.
     - Try strict JSON first.
     - If that fails, attempt a lenient repair (HUC* fix + trailing commas).
     - If still failing, raise ValueError with file context for display.
     """
-    s3 = _s3_client()
-    resp = s3.get_object(Bucket=bucket, Key=key)
-    raw = resp["Body"].read().decode("utf-8", errors="replace")
+    s3 = s3 or _s3_client()
+    raw = _get_object_cached(s3, bucket, key).decode("utf-8", errors="replace")
 
     try:
         return json.loads(raw)
@@ -93,14 +131,127 @@ def _fetch_json(bucket: str, key: str) -> Dict[str, Any]:
             ) from e2
 
 
+def _fetch_record(
+    bucket: str, key: str, s3=None
+) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Fetch one *_metadata.json and normalize it (runs in a worker thread).
+    Returns (record, None), or (None, message) for malformed JSON.
+    """
+    parts = key.split("/")
+    tier = (
+        next((p for p in parts if p.lower().startswith("tier_")), None)
+        or "Unknown_Tier"
+    )
+    site = parts[-2] if len(parts) >= 2 else "Unknown_Site"
+
+    try:
+        meta = _fetch_json(bucket, key, s3)
+    except ValueError as ve:
+        return None, str(ve)
+
+    # Normalize fields
+    file_name = meta.get("File_Name") or meta.get("File Name")
+    res_m = meta.get("Resolution in meter")
+    dtype = meta.get("Datatype") or meta.get("Data type")
+    state = meta.get("State")
+    desc = meta.get("Description")
+    basin = meta.get("River Basin Name") or meta.get("River Basin")
+    source = meta.get("Source")
+    quality = meta.get("Quality") or tier
+
+    date_raw = (
+        meta.get("Date of Flood /Synthetic Flooding Event (return period (years))")
+        or ""
+    )
+    ymd_compact = _extract_ymd(date_raw) or _extract_ymd(file_name or "")
+    date_iso = None
+    if ymd_compact:
+        try:
+            date_iso = (
+                dt.datetime.strptime(ymd_compact, "%Y%m%d").date().isoformat()
+            )
+        except Exception:
+            date_iso = None
+
+    lon = lat = None
+    centroid = meta.get("Location of the centroid of the flood map") or []
+    if isinstance(centroid, list) and len(centroid) >= 2:
+        try:
+            lon, lat = float(centroid[0]), float(centroid[1])
+        except Exception:
+            lon = lat = None
+    if lon is None or lat is None:
+        ex = meta.get("Extent") or {}
+        xmin, ymin, xmax, ymax = (
+            ex.get("xmin"),
+            ex.get("ymin"),
+            ex.get("xmax"),
+            ex.get("ymax"),
+        )
+        try:
+            if all(v is not None for v in (xmin, ymin, xmax, ymax)):
+                lon = (float(xmin) + float(xmax)) / 2.0
+                lat = (float(ymin) + float(ymax)) / 2.0
+        except Exception:
+            lon = lat = None
+    if lon is None or lat is None:
+        lon, lat = 0.0, 0.0
+
+    refs = meta.get("References") or []
+    if isinstance(refs, str):
+        refs = [refs]
+    elif isinstance(refs, list):
+        refs = [str(x) for x in refs]
+    else:
+        refs = [str(refs)]
+    huc = {}
+    for k in ("HUC2", "HUC4", "HUC6", "HUC8", "HUC10", "HUC12"):
+        if k in meta and meta[k] is not None:
+            huc[k.lower()] = str(meta[k])
+
+    return (
+        {
+            "tier": tier,
+            "site": site,
+            "s3_key": key,
+            "file_name": file_name,
+            "resolution_m": res_m,
+            "dtype": dtype,
+            "state": state,
+            "description": desc,
+            "river_basin": basin,
+            "source": source,
+            "date_raw": date_raw,
+            "date_ymd": date_iso,
+            "quality": quality,
+            "references": refs,
+            "centroid_lon": lon,
+            "centroid_lat": lat,
+            "geometry": meta.get("FIM_Geometry"),
+            "extent": meta.get("Extent"),
+            **huc,
+        },
+        None,
+    )
+
+
 # PUBLIC: build_catalog
 @st.cache_data(show_spinner=False)
-def build_catalog(bucket: str, root_prefix: str) -> Dict[str, Any]:
+def build_catalog(
+    bucket: str,
+    root_prefix: str,
+    _progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
     """
     Cached: lists all *_metadata.json under root_prefix (across Tier_*/*),
     fetches and normalizes fields. Cache invalidates when (bucket, root_prefix) change
     or you manually clear it from the app.
 
+    Keys are fetched concurrently (FETCH_WORKERS). `_progress(done, total)` is
+    called from the calling thread as keys complete, e.g. to drive
+    st.progress; the leading underscore keeps it out of the cache key.
+
     Returns:
         {
           "records": [ ...normalized dicts... ],
@@ -108,105 +259,32 @@ def build_catalog(bucket: str, root_prefix: str) -> Dict[str, Any]:
         }
     """
     keys = _list_metadata_objects(bucket, root_prefix)
-    records: List[Dict[str, Any]] = []
-    errors: List[Tuple[str, str]] = []
+    total = len(keys)
+    if _progress is not None:
+        _progress(0, total)
 
-    for key in keys:
-        parts = key.split("/")
-        tier = (
-            next((p for p in parts if p.lower().startswith("tier_")), None)
-            or "Unknown_Tier"
-        )
-        site = parts[-2] if len(parts) >= 2 else "Unknown_Site"
+    # fetch + normalize concurrently; results are collected by position so
+    # records/errors keep the listing order
+    # resolve the cached client here, not inside the worker threads
+    s3 = _s3_client()
+    results: List[Any] = [None] * total
+    with ThreadPoolExecutor(max_workers=max(1, min(FETCH_WORKERS, total))) as pool:
+        futures = {
+            pool.submit(_fetch_record, bucket, key, s3): i for i, key in enumerate(keys)
+        }
+        for done, fut in enumerate(as_completed(futures), start=1):
+            results[futures[fut]] = fut
+            if _progress is not None:
+                _progress(done, total)
 
-        try:
-            meta = _fetch_json(bucket, key)
-        except ValueError as ve:
-            errors.append((key, str(ve)))
-            continue
-
-        # Normalize fields
-        file_name = meta.get("File_Name") or meta.get("File Name")
-        res_m = meta.get("Resolution in meter")
-        dtype = meta.get("Datatype") or meta.get("Data type")
-        state = meta.get("State")
-        desc = meta.get("Description")
-        basin = meta.get("River Basin Name") or meta.get("River Basin")
-        source = meta.get("Source")
-        quality = meta.get("Quality") or tier
-
-        date_raw = (
-            meta.get("Date of Flood /Synthetic Flooding Event (return period (years))")
-            or ""
-        )
-        ymd_compact = _extract_ymd(date_raw) or _extract_ymd(file_name or "")
-        date_iso = None
-        if ymd_compact:
-            try:
-                date_iso = (
-                    dt.datetime.strptime(ymd_compact, "%Y%m%d").date().isoformat()
-                )
-            except Exception:
-                date_iso = None
-
-        lon = lat = None
-        centroid = meta.get("Location of the centroid of the flood map") or []
-        if isinstance(centroid, list) and len(centroid) >= 2:
-            try:
-                lon, lat = float(centroid[0]), float(centroid[1])
-            except Exception:
-                lon = lat = None
-        if lon is None or lat is None:
-            ex = meta.get("Extent") or {}
-            xmin, ymin, xmax, ymax = (
-                ex.get("xmin"),
-                ex.get("ymin"),
-                ex.get("xmax"),
-                ex.get("ymax"),
-            )
-            try:
-                if all(v is not None for v in (xmin, ymin, xmax, ymax)):
-                    lon = (float(xmin) + float(xmax)) / 2.0
-                    lat = (float(ymin) + float(ymax)) / 2.0
-            except Exception:
-                lon = lat = None
-        if lon is None or lat is None:
-            lon, lat = 0.0, 0.0
-
-        refs = meta.get("References") or []
-        if isinstance(refs, str):
-            refs = [refs]
-        elif isinstance(refs, list):
-            refs = [str(x) for x in refs]
+    records: List[Dict[str, Any]] = []
+    errors: List[Tuple[str, str]] = []
+    for key, fut in zip(keys, results):
+        # re-raises unexpected errors (e.g. S3 access) in listing order
+        record, error = fut.result()
+        if error is not None:
+            errors.append((key, error))
         else:
-            refs = [str(refs)]
-        huc = {}
-        for k in ("HUC2", "HUC4", "HUC6", "HUC8", "HUC10", "HUC12"):
-            if k in meta and meta[k] is not None:
-                huc[k.lower()] = str(meta[k])
-
-        records.append(
-            {
-                "tier": tier,
-                "site": site,
-                "s3_key": key,
-                "file_name": file_name,
-                "resolution_m": res_m,
-                "dtype": dtype,
-                "state": state,
-                "description": desc,
-                "river_basin": basin,
-                "source": source,
-                "date_raw": date_raw,
-                "date_ymd": date_iso,
-                "quality": quality,
-                "references": refs,
-                "centroid_lon": lon,
-                "centroid_lat": lat,
-                "geometry": meta.get("FIM_Geometry"),
-                "extent": meta.get("Extent"),
-                **huc,
-            }
-        )
+            records.append(record)
 
     return {"records": records, "errors": errors}
@@ -0,0 +1,170 @@
+"""
+Viewport culling for the map page markers.
+
+st_folium reports the map bounds and zoom after every pan/zoom. The page
+pads and snaps those bounds (so small pans keep the same marker set), asks
+a GridIndex over the record centroids for the rows inside, keeps at most
+feature_cap_by_zoom(zoom) of them as individual markers and reduces the
+rest to a few count bubbles. What is sent to the browser therefore depends
+on the viewport and the cap, not on the catalog size.
+"""
+
+from __future__ import annotations
+import math
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+TILE_PX = 256
+# assumed map size in pixels before st_folium has reported real bounds
+DEFAULT_SIZE_PX = (1200, 720)
+
+
+class Viewport(NamedTuple):
+    south: float
+    west: float
+    north: float
+    east: float
+    zoom: int
+
+    def contains(self, lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+        return (
+            (lon >= self.west)
+            & (lon <= self.east)
+            & (lat >= self.south)
+            & (lat <= self.north)
+        )
+
+
+def _clamp(vp: Viewport) -> Viewport:
+    return Viewport(
+        max(vp.south, -90.0),
+        max(vp.west, -180.0),
+        min(vp.north, 90.0),
+        min(vp.east, 180.0),
+        vp.zoom,
+    )
+
+
+def default_viewport(
+    center: Tuple[float, float], zoom: float, size_px: Tuple[int, int] = DEFAULT_SIZE_PX
+) -> Viewport:
+    """Approximate bounds of a map of size_px centred on (lat, lon)."""
+    lat, lon = center
+    deg_per_px = 360.0 / (TILE_PX * 2 ** float(zoom))
+    half_w = size_px[0] / 2 * deg_per_px
+    half_h = size_px[1] / 2 * deg_per_px * math.cos(math.radians(lat))
+    return _clamp(
+        Viewport(lat - half_h, lon - half_w, lat + half_h, lon + half_w, int(zoom))
+    )
+
+
+def from_folium(out: Optional[Dict[str, Any]]) -> Optional[Viewport]:
+    """Viewport from st_folium's returned "bounds"/"zoom", if it has reported any."""
+    if not out:
+        return None
+    try:
+        sw = out["bounds"]["_southWest"]
+        ne = out["bounds"]["_northEast"]
+        vp = Viewport(
+            float(sw["lat"]),
+            float(sw["lng"]),
+            float(ne["lat"]),
+            float(ne["lng"]),
+            int(out["zoom"]),
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
+    return _clamp(vp)
+
+
+def padded(vp: Viewport, frac: float = 0.5, steps: int = 4) -> Viewport:
+    """
+    Grow vp by frac on every side and snap the edges outward to a grid of
+    1/steps of the view size, so pans smaller than that return the same box.
+    """
+    step_x = max((vp.east - vp.west) / steps, 1e-6)
+    step_y = max((vp.north - vp.south) / steps, 1e-6)
+    pad_x = (vp.east - vp.west) * frac
+    pad_y = (vp.north - vp.south) * frac
+    return _clamp(
+        Viewport(
+            math.floor((vp.south - pad_y) / step_y) * step_y,
+            math.floor((vp.west - pad_x) / step_x) * step_x,
+            math.ceil((vp.north + pad_y) / step_y) * step_y,
+            math.ceil((vp.east + pad_x) / step_x) * step_x,
+            vp.zoom,
+        )
+    )
+
+
+class GridIndex:
+    """Rows bucketed into cell_deg x cell_deg cells, sorted by cell id."""
+
+    def __init__(self, lon: np.ndarray, lat: np.ndarray, cell_deg: float = 1.0):
+        self.lon = lon
+        self.lat = lat
+        self.cell_deg = cell_deg
+        self.ncols = int(math.ceil(360.0 / cell_deg)) + 1
+        self.nrows = int(math.ceil(180.0 / cell_deg)) + 1
+        cells = self._cell(lon, lat)
+        self.order = np.argsort(cells, kind="stable")
+        self.cells = cells[self.order]
+
+    def _col(self, lon):
+        return np.clip(((lon + 180.0) // self.cell_deg).astype(np.int64), 0, self.ncols - 1)
+
+    def _row(self, lat):
+        return np.clip(((lat + 90.0) // self.cell_deg).astype(np.int64), 0, self.nrows - 1)
+
+    def _cell(self, lon, lat):
+        return self._row(lat) * self.ncols + self._col(lon)
+
+    def query(self, vp: Viewport) -> np.ndarray:
+        """Rows whose centroid falls inside vp, in ascending row order."""
+        x0, x1 = self._col(np.array([vp.west, vp.east]))
+        y0, y1 = self._row(np.array([vp.south, vp.north]))
+        parts = []
+        for y in range(int(y0), int(y1) + 1):
+            lo = np.searchsorted(self.cells, y * self.ncols + x0, side="left")
+            hi = np.searchsorted(self.cells, y * self.ncols + x1, side="right")
+            if hi > lo:
+                parts.append(self.order[lo:hi])
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        rows = np.concatenate(parts)
+        rows = rows[vp.contains(self.lon[rows], self.lat[rows])]
+        rows.sort()
+        return rows
+
+
+def sample_rows(rows: np.ndarray, cap: int) -> np.ndarray:
+    """At most cap rows, evenly strided so the sample stays spread out."""
+    if len(rows) <= cap:
+        return rows
+    if cap <= 0:
+        return rows[:0]
+    pick = np.linspace(0, len(rows) - 1, cap).round().astype(np.int64)
+    return rows[np.unique(pick)]
+
+
+def aggregate(
+    lon: np.ndarray, lat: np.ndarray, rows: np.ndarray, vp: Viewport, bins: int = 6
+) -> List[Tuple[float, float, int]]:
+    """(lat, lon, count) per occupied cell of a bins x bins grid over vp."""
+    if not len(rows):
+        return []
+    x = lon[rows]
+    y = lat[rows]
+    w = max(vp.east - vp.west, 1e-9) / bins
+    h = max(vp.north - vp.south, 1e-9) / bins
+    cx = np.clip(((x - vp.west) // w).astype(np.int64), 0, bins - 1)
+    cy = np.clip(((y - vp.south) // h).astype(np.int64), 0, bins - 1)
+    cell = cy * bins + cx
+    counts = np.bincount(cell, minlength=bins * bins)
+    sum_x = np.bincount(cell, weights=x, minlength=bins * bins)
+    sum_y = np.bincount(cell, weights=y, minlength=bins * bins)
+    return [
+        (float(sum_y[c] / counts[c]), float(sum_x[c] / counts[c]), int(counts[c]))
+        for c in np.flatnonzero(counts)
+    ]